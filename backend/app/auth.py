@@ -1,22 +1,47 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
+import secrets
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from decouple import config
-from database import get_db
-from models import Usuario, Empleado, Rol
+from database import get_db, get_async_db, SessionLocal
+from models import Usuario, Empleado, RefreshToken
+from cache import TTLCache, ExpiringSet
+from hashing import hashing_pool, PoolSaturadoError
+from ultimo_acceso import registro_ultimo_acceso
+from tareas import TareaPeriodica
 import schemas
 
 # Configuración de seguridad
 SECRET_KEY = config('SECRET_KEY')
 ALGORITHM = config('ALGORITHM', default='HS256')
 ACCESS_TOKEN_EXPIRE_MINUTES = config('ACCESS_TOKEN_EXPIRE_MINUTES', default=30, cast=int)
+REFRESH_TOKEN_EXPIRE_HOURS = config('REFRESH_TOKEN_EXPIRE_HOURS', default=12, cast=int)
 
-# Context para hash de passwords
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Versión vigente de token por username; se consulta a la BD solo al expirar
+# la entrada o cuando el token trae una versión distinta.
+# La cache es por proceso: un cambio o reseteo de password la limpia en el
+# worker que lo atendió, pero los demás siguen aceptando los access tokens
+# anteriores hasta AUTH_TOKEN_VERSION_TTL_SECONDS (o hasta que el token
+# expire, si es antes). Bajar el TTL acorta esa ventana a cambio de más
+# consultas; los refresh tokens sí quedan revocados en la BD de inmediato.
+token_version_cache = TTLCache(
+    maxsize=config('AUTH_CACHE_MAX_ENTRIES', default=1024, cast=int),
+    ttl=config('AUTH_TOKEN_VERSION_TTL_SECONDS', default=300, cast=int)
+)
+
+# Context para hash de passwords; los hashes con otro costo se actualizan al
+# iniciar sesión (ver authenticate_user)
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 # Security scheme
 security = HTTPBearer()
@@ -25,13 +50,53 @@ security = HTTPBearer()
 # FUNCIONES DE HASHING
 # =============================================
 
+# bcrypt se ejecuta en un pool dedicado (hashing.py); si la cola está llena
+# se responde 503 para que el cliente reintente en lugar de acumular trabajo.
+
+def _pool_saturado_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, try again",
+        headers={"Retry-After": "1"},
+    )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar password plano contra hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return hashing_pool.run_sync("verify", pwd_context.verify, plain_password, hashed_password)
+    except PoolSaturadoError:
+        raise _pool_saturado_exception()
 
 def get_password_hash(password: str) -> str:
     """Generar hash de password"""
-    return pwd_context.hash(password)
+    try:
+        return hashing_pool.run_sync("hash", pwd_context.hash, password)
+    except PoolSaturadoError:
+        raise _pool_saturado_exception()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verificar password sin ocupar el threadpool de FastAPI"""
+    try:
+        return await hashing_pool.run("verify", pwd_context.verify, plain_password, hashed_password)
+    except PoolSaturadoError:
+        raise _pool_saturado_exception()
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    """Verificar password y, si el hash usa otro costo, devolver uno nuevo.
+
+    Retorna (valido, nuevo_hash); nuevo_hash es None si no hace falta migrar.
+    """
+    try:
+        return await hashing_pool.run("verify", pwd_context.verify_and_update, plain_password, hashed_password)
+    except PoolSaturadoError:
+        raise _pool_saturado_exception()
+
+async def get_password_hash_async(password: str) -> str:
+    """Generar hash sin ocupar el threadpool de FastAPI"""
+    try:
+        return await hashing_pool.run("hash", pwd_context.hash, password)
+    except PoolSaturadoError:
+        raise _pool_saturado_exception()
 
 # =============================================
 # FUNCIONES JWT
@@ -46,77 +111,290 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def decode_access_token(token: str):
-    """Decodificar token JWT"""
+def create_user_token(user: Usuario, expires_delta: Optional[timedelta] = None):
+    """Crear token JWT con los claims necesarios para autorizar sin consultar la BD"""
+    return create_access_token(
+        data={
+            "sub": user.username,
+            "uid": user.id_usuario,
+            "emp": user.id_empleado,
+            "rol": user.rol.nombre_rol if user.rol else None,
+            "ver": user.token_version or 0
+        },
+        expires_delta=expires_delta
+    )
+
+def decode_token_payload(token: str):
+    """Decodificar token JWT y devolver todos sus claims"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             return None
-        return username
+        return payload
     except JWTError:
         return None
 
+def decode_access_token(token: str):
+    """Decodificar token JWT"""
+    payload = decode_token_payload(token)
+    if payload is None:
+        return None
+    return payload["sub"]
+
+# =============================================
+# REFRESH TOKENS Y REVOCACIÓN
+# =============================================
+
+# jti de access tokens revocados (logout) hasta su expiración natural.
+# Es por proceso: los access tokens son de vida corta y los refresh tokens
+# revocados quedan marcados en la BD.
+tokens_revocados = ExpiringSet()
+
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_refresh_token(db: Session, user: Usuario) -> str:
+    """Emitir refresh token; en la BD solo se guarda su hash"""
+    token = secrets.token_urlsafe(48)
+    db.add(RefreshToken(
+        id_usuario=user.id_usuario,
+        token_hash=_hash_refresh_token(token),
+        fecha_expiracion=datetime.utcnow() + timedelta(hours=REFRESH_TOKEN_EXPIRE_HOURS)
+    ))
+    db.commit()
+    return token
+
+def _revocar_refresh_tokens_usuario(db: Session, user_id: int):
+    db.query(RefreshToken).filter(
+        RefreshToken.id_usuario == user_id,
+        RefreshToken.revocado == False
+    ).update({"revocado": True}, synchronize_session=False)
+
+def rotate_refresh_token(db: Session, refresh_token: str):
+    """Canjear un refresh token por uno nuevo (sin bcrypt). Retorna (usuario, nuevo_token)"""
+    refresh_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    token_hash = _hash_refresh_token(refresh_token)
+    
+    # Canjear con un UPDATE condicional: de dos peticiones simultáneas con el
+    # mismo token solo una lo encuentra sin revocar
+    canjeado = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == token_hash,
+        RefreshToken.revocado == False,
+        RefreshToken.fecha_expiracion > datetime.utcnow()
+    ).update({"revocado": True}, synchronize_session=False)
+    
+    db_token = db.query(RefreshToken.id_usuario, RefreshToken.revocado).filter(
+        RefreshToken.token_hash == token_hash
+    ).first()
+    if db_token is None:
+        raise refresh_exception
+    
+    if not canjeado:
+        if db_token.revocado:
+            # Un token ya canjeado que se vuelve a usar indica robo: cerrar todas las sesiones
+            _revocar_refresh_tokens_usuario(db, db_token.id_usuario)
+            db.commit()
+        raise refresh_exception
+    
+    user = db.query(Usuario).options(joinedload(Usuario.rol)).filter(
+        Usuario.id_usuario == db_token.id_usuario,
+        Usuario.activo == True
+    ).first()
+    if user is None:
+        db.rollback()
+        raise refresh_exception
+    
+    return user, create_refresh_token(db, user)
+
+def logout_user(db: Session, access_token: str, refresh_token: Optional[str] = None):
+    """Revocar el access token actual y, si se envía, el refresh token"""
+    payload = decode_token_payload(access_token)
+    if payload and payload.get("jti"):
+        tokens_revocados.add(payload["jti"], payload["exp"])
+    
+    if refresh_token and payload:
+        id_usuario = db.query(Usuario.id_usuario).filter(
+            Usuario.username == payload["sub"]
+        ).scalar_subquery()
+        db.query(RefreshToken).filter(
+            RefreshToken.token_hash == _hash_refresh_token(refresh_token),
+            RefreshToken.id_usuario == id_usuario
+        ).update({"revocado": True}, synchronize_session=False)
+        db.commit()
+
+def purgar_tokens_expirados():
+    """Limpiar revocaciones vencidas y refresh tokens expirados"""
+    tokens_revocados.purge()
+    db = SessionLocal()
+    try:
+        db.query(RefreshToken).filter(
+            RefreshToken.fecha_expiracion <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+barrido_tokens = TareaPeriodica(
+    "barrido-tokens",
+    config('TOKEN_SWEEP_SECONDS', default=300, cast=float),
+    purgar_tokens_expirados
+)
+
+# =============================================
+# SESIÓN DESDE CLAIMS Y CACHE DE VERSIÓN DE TOKEN
+# =============================================
+
+def _sesion_desde_claims(payload: dict) -> schemas.UsuarioSesion:
+    return schemas.UsuarioSesion(
+        id_usuario=payload["uid"],
+        username=payload["sub"],
+        id_empleado=payload.get("emp"),
+        nombre_rol=payload.get("rol"),
+        activo=True
+    )
+
+def invalidar_sesiones(username: str):
+    """Descartar la versión de token cacheada de un usuario en este proceso"""
+    token_version_cache.pop(username)
+
+def _version_en_cache(username: str, version_token: int) -> bool:
+    version = token_version_cache.get(username)
+    return version is not None and version == version_token
+
+def _consulta_version_token(username: str):
+    return select(Usuario.token_version).where(
+        Usuario.username == username,
+        Usuario.activo == True
+    )
+
+def _guardar_version_token(username: str, row):
+    if row is None:
+        token_version_cache.pop(username)
+        return None
+    
+    version = row.token_version or 0
+    token_version_cache.set(username, version)
+    return version
+
+def _version_token_vigente(db: Session, username: str, version_token: int):
+    """Versión vigente del usuario (None si no existe o está inactivo).
+
+    Solo se consulta la BD cuando no hay versión en cache o cuando no coincide
+    con la del token, por si otro proceso ya la incrementó.
+    """
+    if _version_en_cache(username, version_token):
+        return version_token
+    return _guardar_version_token(username, db.execute(_consulta_version_token(username)).first())
+
+async def _version_token_vigente_async(db: AsyncSession, username: str, version_token: int):
+    """Igual que _version_token_vigente, con la AsyncSession de las lecturas async"""
+    if _version_en_cache(username, version_token):
+        return version_token
+    return _guardar_version_token(username, (await db.execute(_consulta_version_token(username))).first())
+
 # =============================================
 # AUTENTICACIÓN DE USUARIOS
 # =============================================
 
-def authenticate_user(db: Session, username: str, password: str):
-    """Autenticar usuario con username y password"""
-    user = db.query(Usuario).filter(
+def _get_usuario_activo(db: Session, username: str):
+    return db.query(Usuario).options(joinedload(Usuario.rol)).filter(
         Usuario.username == username,
         Usuario.activo == True
     ).first()
+
+def _get_usuario(db: Session, user_id: int):
+    user = db.query(Usuario).filter(Usuario.id_usuario == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
+def _actualizar_hash(db: Session, user: Usuario, nuevo_hash: str):
+    user.password_hash = nuevo_hash
+    db.commit()
+
+async def authenticate_user(db: Session, username: str, password: str):
+    """Autenticar usuario con username y password"""
+    user = await run_in_threadpool(_get_usuario_activo, db, username)
     
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    valido, nuevo_hash = await verify_and_update_password_async(password, user.password_hash)
+    if not valido:
         return False
     
-    # Actualizar último acceso
-    user.ultimo_acceso = datetime.utcnow()
-    db.commit()
+    # Migrar el hash si tenía un costo distinto a BCRYPT_ROUNDS
+    if nuevo_hash:
+        await run_in_threadpool(_actualizar_hash, db, user, nuevo_hash)
+    
+    # El último acceso se escribe en lote, fuera de la petición
+    registro_ultimo_acceso.registrar(user.id_usuario)
     
     return user
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """Obtener usuario actual desde token JWT"""
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _claims_del_token(token: str) -> dict:
+    payload = decode_token_payload(token)
+    if payload is None or payload.get("jti") in tokens_revocados:
+        raise _credentials_exception()
     
-    try:
-        token = credentials.credentials
-        username = decode_access_token(token)
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(Usuario).filter(
-        Usuario.username == username,
-        Usuario.activo == True
-    ).first()
-    
-    if user is None:
-        raise credentials_exception
-    
-    return user
+    # Se autoriza con los claims del token sin cargar el usuario; un token sin
+    # ellos (emitido antes de incluirlos) no se puede revocar por versión
+    if "ver" not in payload or "uid" not in payload:
+        raise _credentials_exception()
+    return payload
 
-def get_current_active_user(current_user: Usuario = Depends(get_current_user)):
-    """Verificar que el usuario esté activo"""
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Obtener usuario actual desde token JWT"""
+    payload = _claims_del_token(credentials.credentials)
+    if _version_token_vigente(db, payload["sub"], payload["ver"]) != payload["ver"]:
+        raise _credentials_exception()
+    return _sesion_desde_claims(payload)
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """get_current_user para las rutas async def: no ocupa un hilo del threadpool
+    ni una conexión del pool síncrono"""
+    payload = _claims_del_token(credentials.credentials)
+    if await _version_token_vigente_async(db, payload["sub"], payload["ver"]) != payload["ver"]:
+        raise _credentials_exception()
+    return _sesion_desde_claims(payload)
+
+def _verificar_activo(current_user: schemas.UsuarioSesion):
     if not current_user.activo:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+def get_current_active_user(current_user: schemas.UsuarioSesion = Depends(get_current_user)):
+    """Verificar que el usuario esté activo"""
+    return _verificar_activo(current_user)
+
+async def get_current_active_user_async(current_user: schemas.UsuarioSesion = Depends(get_current_user_async)):
+    """Verificar que el usuario esté activo (rutas async def)"""
+    return _verificar_activo(current_user)
+
 # =============================================
 # AUTORIZACIÓN POR ROLES
 # =============================================
@@ -125,8 +403,8 @@ class RoleChecker:
     def __init__(self, allowed_roles: list):
         self.allowed_roles = allowed_roles
 
-    def __call__(self, current_user: Usuario = Depends(get_current_active_user)):
-        if current_user.rol.nombre_rol not in self.allowed_roles:
+    def __call__(self, current_user: schemas.UsuarioSesion = Depends(get_current_active_user)):
+        if current_user.nombre_rol not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Operation not permitted"
@@ -179,45 +457,45 @@ def create_user(db: Session, user_data: schemas.UsuarioCreate) -> Usuario:
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    invalidar_sesiones(db_user.username)
     
     return db_user
 
-def change_password(db: Session, user_id: int, old_password: str, new_password: str):
+def _guardar_password(db: Session, user: Usuario, password_hash: str):
+    # Los access tokens anteriores dejan de valer en este proceso ya; en los
+    # demás workers al expirar su token_version_cache
+    user.password_hash = password_hash
+    user.token_version = (user.token_version or 0) + 1
+    _revocar_refresh_tokens_usuario(db, user.id_usuario)
+    db.commit()
+    invalidar_sesiones(user.username)
+
+async def change_password(db: Session, user_id: int, old_password: str, new_password: str):
     """Cambiar password de usuario"""
-    user = db.query(Usuario).filter(Usuario.id_usuario == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    user = await run_in_threadpool(_get_usuario, db, user_id)
     
-    if not verify_password(old_password, user.password_hash):
+    if not await verify_password_async(old_password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
         )
     
-    user.password_hash = get_password_hash(new_password)
-    db.commit()
+    password_hash = await get_password_hash_async(new_password)
+    await run_in_threadpool(_guardar_password, db, user, password_hash)
     
     return {"message": "Password updated successfully"}
 
-def reset_password(db: Session, user_id: int, new_password: str, admin_user: Usuario):
+async def reset_password(db: Session, user_id: int, new_password: str, admin_user: schemas.UsuarioSesion):
     """Resetear password (solo admin)"""
-    if admin_user.rol.nombre_rol != "Administrador":
+    if admin_user.nombre_rol != "Administrador":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only administrators can reset passwords"
         )
     
-    user = db.query(Usuario).filter(Usuario.id_usuario == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    user = await run_in_threadpool(_get_usuario, db, user_id)
     
-    user.password_hash = get_password_hash(new_password)
-    db.commit()
+    password_hash = await get_password_hash_async(new_password)
+    await run_in_threadpool(_guardar_password, db, user, password_hash)
     
     return {"message": "Password reset successfully"}
\ No newline at end of file
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+_FALTANTE = object()
+
+
+class TTLCache:
+    """Cache en memoria acotada (LRU) con expiración por tiempo.
+
+    Es segura para hilos: los endpoints síncronos de FastAPI corren en el
+    threadpool, así que varias peticiones pueden consultarla a la vez.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Se incrementa en cada invalidación: un cálculo que empezó antes no
+        # guarda su resultado
+        self._generacion = 0
+        self._calculos = {}
+        self._tareas = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _vigente(self, key):
+        # Llamar con self._lock tomado
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            return _FALTANTE
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def get(self, key, default=None):
+        """Obtener valor vigente; cuenta acierto o fallo"""
+        with self._lock:
+            value = self._vigente(key)
+            if value is _FALTANTE:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """Guardar valor, descartando el menos usado si se excede el tamaño"""
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expira, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _set_si_vigente(self, generacion: int, key, value, ttl: float = None):
+        with self._lock:
+            if generacion != self._generacion:
+                return
+        self.set(key, value, ttl)
+
+    def get_or_compute(self, key, compute, ttl: float = None):
+        """Valor vigente o el resultado de compute().
+
+        Si varias peticiones fallan a la vez con la misma llave solo una
+        ejecuta compute(); las demás esperan y reciben su resultado
+        (single-flight).
+        """
+        value = self.get(key, _FALTANTE)
+        if value is not _FALTANTE:
+            return value
+        with self._lock:
+            calculo = self._calculos.setdefault(key, threading.Lock())
+        try:
+            with calculo:
+                with self._lock:
+                    value = self._vigente(key)
+                    generacion = self._generacion
+                if value is _FALTANTE:
+                    value = compute()
+                    self._set_si_vigente(generacion, key, value, ttl)
+                return value
+        finally:
+            with self._lock:
+                if self._calculos.get(key) is calculo:
+                    del self._calculos[key]
+
+    async def get_or_compute_async(self, key, compute, ttl: float = None):
+        """get_or_compute para endpoints async: compute() retorna una corrutina.
+
+        Las tareas en curso solo se comparten dentro del mismo event loop.
+        """
+        value = self.get(key, _FALTANTE)
+        if value is not _FALTANTE:
+            return value
+        tarea = self._tareas.get(key)
+        if tarea is None:
+            with self._lock:
+                generacion = self._generacion
+            tarea = asyncio.ensure_future(compute())
+            self._tareas[key] = tarea
+
+            def terminar(t):
+                if self._tareas.get(key) is t:
+                    del self._tareas[key]
+                if not t.cancelled() and t.exception() is None:
+                    self._set_si_vigente(generacion, key, t.result(), ttl)
+
+            tarea.add_done_callback(terminar)
+        return await asyncio.shield(tarea)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            self._generacion += 1
+        return entry[1] if entry else None
+
+    def invalidate_if(self, predicate) -> int:
+        """Eliminar las entradas cuya llave cumpla el predicado"""
+        with self._lock:
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                del self._data[k]
+            self._generacion += 1
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generacion += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "entradas": size,
+            "max_entradas": self.maxsize,
+            "ttl_segundos": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None
+        }
+
+
+class ExpiringSet:
+    """Conjunto de llaves que dejan de contar al llegar su propia expiración.
+
+    Las expiraciones son timestamps epoch (como el claim exp de un JWT).
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, expira: float):
+        with self._lock:
+            self._data[key] = expira
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            expira = self._data.get(key)
+        return expira is not None and expira > time.time()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def purge(self) -> int:
+        """Eliminar las llaves expiradas; retorna cuántas se eliminaron"""
+        ahora = time.time()
+        with self._lock:
+            expiradas = [k for k, expira in self._data.items() if expira <= ahora]
+            for k in expiradas:
+                del self._data[k]
+        return len(expiradas)
@@ -0,0 +1,44 @@
+# calibrar_bcrypt.py
+# Mide el costo de bcrypt en este servidor para elegir BCRYPT_ROUNDS.
+# Uso: python calibrar_bcrypt.py [rounds_min] [rounds_max] [repeticiones]
+import sys
+import time
+from passlib.context import CryptContext
+from decouple import config
+
+
+def medir(rounds: int, repeticiones: int):
+    """Retorna (ms por hash, ms por verificación) para un costo dado"""
+    contexto = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    password = "calibracion-Taller-2025"
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        hashed = contexto.hash(password)
+    ms_hash = (time.perf_counter() - inicio) * 1000 / repeticiones
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        contexto.verify(password, hashed)
+    ms_verify = (time.perf_counter() - inicio) * 1000 / repeticiones
+
+    return ms_hash, ms_verify
+
+
+def calibrar(rounds_min: int = 10, rounds_max: int = 14, repeticiones: int = 5):
+    actual = config('BCRYPT_ROUNDS', default=12, cast=int)
+    workers = config('HASH_WORKERS', default=2, cast=int)
+
+    print(f"BCRYPT_ROUNDS actual: {actual} | HASH_WORKERS: {workers}")
+    print(f"{'rounds':>6} {'hash ms':>10} {'verify ms':>10} {'logins/s':>10}")
+    for rounds in range(rounds_min, rounds_max + 1):
+        ms_hash, ms_verify = medir(rounds, repeticiones)
+        # Un login es una verificación; cada worker atiende una a la vez
+        logins_segundo = workers * 1000 / ms_verify
+        marca = "  <- actual" if rounds == actual else ""
+        print(f"{rounds:>6} {ms_hash:>10.1f} {ms_verify:>10.1f} {logins_segundo:>10.1f}{marca}")
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:4]]
+    calibrar(*argumentos)
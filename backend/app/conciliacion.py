@@ -0,0 +1,35 @@
+import logging
+from decouple import config
+from database import SessionLocal
+from tareas import TareaPeriodica
+import crud
+
+logger = logging.getLogger(__name__)
+
+# Los totales de los tickets se mantienen con incrementos; esta tarea compara
+# periódicamente contra la suma de las líneas y corrige cualquier desfase
+TICKET_TOTALS_RECONCILE_SECONDS = config('TICKET_TOTALS_RECONCILE_SECONDS', default=3600, cast=float)
+
+
+def conciliar_totales_tickets() -> int:
+    """Corregir tickets cuyos totales no coinciden con sus líneas; retorna cuántos"""
+    db = SessionLocal()
+    try:
+        diferencias = crud.reconciliar_totales_tickets(db)
+    finally:
+        db.close()
+
+    for d in diferencias:
+        logger.warning(
+            "Totales desfasados en ticket %s: servicios %s (líneas %s), repuestos %s (líneas %s), general %s",
+            d["id_ticket"], d["total_servicios"], d["suma_servicios"],
+            d["total_repuestos"], d["suma_repuestos"], d["total_general"]
+        )
+    return len(diferencias)
+
+
+conciliacion_totales = TareaPeriodica("conciliacion-totales", TICKET_TOTALS_RECONCILE_SECONDS, conciliar_totales_tickets)
+
+def iniciar_conciliacion():
+    if TICKET_TOTALS_RECONCILE_SECONDS > 0:
+        conciliacion_totales.iniciar()
@@ -0,0 +1,53 @@
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from cache import TTLCache
+import models
+
+# =============================================
+# CACHE DE CONTADORES (DASHBOARD Y ESTADÍSTICAS)
+# =============================================
+
+# Los contadores se consultan en cada refresco de pantalla de todas las
+# terminales. Se guardan unos segundos y se descartan cuando una transacción
+# que escribió tickets, citas, repuestos, clientes o vehículos hace commit.
+# La cache es por proceso: la escritura hecha en otro worker se ve al expirar
+# la entrada.
+contadores_cache = TTLCache(
+    maxsize=64,
+    ttl=config('CONTADORES_CACHE_TTL_SECONDS', default=15, cast=float)
+)
+
+MODELOS_CONTADOS = (
+    models.TicketAtencion, models.Cita, models.Repuesto, models.Cliente, models.Vehiculo,
+)
+
+_ESCRIBIO_CONTADOS = "escribio_modelos_contados"
+
+
+@event.listens_for(Session, "before_flush")
+def _marcar_objetos(session, flush_context, instances):
+    if any(isinstance(obj, MODELOS_CONTADOS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_ESCRIBIO_CONTADOS] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _marcar_sentencias(estado):
+    # UPDATE/DELETE/INSERT ejecutados con db.execute() no pasan por el flush
+    if (estado.is_update or estado.is_delete or estado.is_insert) and estado.bind_mapper is not None \
+            and issubclass(estado.bind_mapper.class_, MODELOS_CONTADOS):
+        estado.session.info[_ESCRIBIO_CONTADOS] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar(session):
+    if session.info.pop(_ESCRIBIO_CONTADOS, False):
+        contadores_cache.clear()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_marca(session, transaction):
+    # Solo al terminar la transacción externa: deshacer un SAVEPOINT no
+    # descarta lo que la transacción ya escribió antes
+    if transaction.parent is None:
+        session.info.pop(_ESCRIBIO_CONTADOS, None)
@@ -1,10 +1,15 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, and_, or_, insert, select, extract, case, cast, literal_column, Integer
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from decimal import Decimal
 import models
 import schemas
+from secuencias import secuencia_tickets, secuencia_facturas
+import resumen_ventas
+from contadores import contadores_cache
+from paginacion import paginar
+from filtros import Filtros, rango_fechas, en_fecha
 
 # =============================================
 # CRUD BÁSICO GENÉRICO
@@ -75,7 +80,7 @@ def get_usuario_by_username(db: Session, username: str):
 # CLIENTES Y VEHÍCULOS
 # =============================================
 
-def get_clientes(db: Session, skip: int = 0, limit: int = 100, search: str = None):
+def get_clientes(db: Session, skip: int = 0, limit: int = 100, search: str = None, cursor: str = None):
     query = db.query(models.Cliente)
     
     if search:
@@ -88,7 +93,10 @@ def get_clientes(db: Session, skip: int = 0, limit: int = 100, search: str = Non
             )
         )
     
-    return query.offset(skip).limit(limit).all()
+    return paginar(
+        query, models.Cliente.fecha_registro, models.Cliente.id_cliente,
+        skip, limit, cursor, descendente=False
+    ).all()
 
 def get_cliente(db: Session, cliente_id: int):
     return db.query(models.Cliente).filter(models.Cliente.id_cliente == cliente_id).first()
@@ -227,54 +235,320 @@ def update_repuesto(db: Session, repuesto_id: int, repuesto_update: schemas.Repu
         db.refresh(db_repuesto)
     return db_repuesto
 
-def get_repuestos_stock_bajo(db: Session):
-    """Obtener repuestos con stock bajo el mínimo"""
-    return db.query(models.Repuesto).filter(
-        models.Repuesto.stock_actual <= models.Repuesto.stock_minimo,
+def condiciones_stock_bajo() -> list:
+    return [
+        models.Repuesto.stock_actual - models.Repuesto.stock_reservado <= models.Repuesto.stock_minimo,
         models.Repuesto.activo == True
-    ).all()
+    ]
 
-def actualizar_stock_repuesto(db: Session, repuesto_id: int, nueva_cantidad: int, tipo_movimiento_id: int, empleado_id: int, observaciones: str = None):
-    """Actualizar stock de repuesto y crear movimiento"""
-    repuesto = get_repuesto(db, repuesto_id)
-    if not repuesto:
-        return None
+def get_repuestos_stock_bajo(db: Session):
+    """Obtener repuestos con stock disponible bajo el mínimo"""
+    return db.query(models.Repuesto).filter(*condiciones_stock_bajo()).all()
+
+# Operaciones de stock sin leer-modificar-escribir en Python: la condición
+# viaja en el propio UPDATE y el rowcount indica si se aplicó.
+
+STOCK_MAX_REINTENTOS = 5
+
+class StockInsuficienteError(ValueError):
+    pass
+
+class ConflictoVersionError(ValueError):
+    pass
+
+def ajustar_stock(db: Session, repuesto_id: int, delta: int, consumir_reservado: int = 0):
+    """Sumar delta al stock con un UPDATE condicional atómico; retorna (stock_anterior, stock_nuevo).
+
+    El delta es con signo (entradas y correcciones); las ventas de un ticket
+    pasan por vender_stock. Un delta negativo solo se aplica si alcanza el
+    stock disponible (actual - reservado) más las unidades reservadas que se
+    consumen en la misma operación. No hace commit.
+    """
+    R = models.Repuesto
+    query = db.query(R).filter(R.id_repuesto == repuesto_id)
+    if delta < 0:
+        query = query.filter(R.stock_actual - R.stock_reservado + consumir_reservado >= -delta)
     
-    stock_anterior = repuesto.stock_actual
-    repuesto.stock_actual = nueva_cantidad
+    valores = {
+        R.stock_actual: R.stock_actual + delta,
+        R.version: R.version + 1
+    }
+    if consumir_reservado:
+        valores[R.stock_reservado] = R.stock_reservado - consumir_reservado
+    filas = query.update(valores, synchronize_session=False)
+    
+    # La fila queda bloqueada por el UPDATE hasta el commit, así que esta lectura es consistente
+    stock_nuevo = db.query(R.stock_actual).filter(R.id_repuesto == repuesto_id).scalar()
+    if stock_nuevo is None:
+        raise ValueError("Repuesto no encontrado")
+    if filas == 0:
+        raise StockInsuficienteError("Stock insuficiente")
+    return stock_nuevo - delta, stock_nuevo
+
+def vender_stock(db: Session, ticket_id: int, repuesto_id: int, cantidad: int):
+    """Descontar una venta del ticket, usando primero sus reservas; retorna (stock_anterior, stock_nuevo).
+
+    A diferencia de ajustar_stock, la cantidad vendida debe ser positiva. No hace commit.
+    """
+    if cantidad <= 0:
+        raise ValueError("La cantidad debe ser mayor que cero")
+    reservado = _consumir_reservas(db, ticket_id, repuesto_id, cantidad)
+    return ajustar_stock(db, repuesto_id, -cantidad, consumir_reservado=reservado)
+
+def establecer_stock(db: Session, repuesto_id: int, nueva_cantidad: int, version_esperada: int):
+    """Fijar el stock solo si nadie lo modificó desde que se leyó version_esperada. No hace commit.
+
+    El nuevo stock no puede quedar por debajo de las unidades reservadas.
+    """
+    R = models.Repuesto
+    filas = db.query(R).filter(
+        R.id_repuesto == repuesto_id,
+        R.version == version_esperada,
+        R.stock_reservado <= nueva_cantidad
+    ).update({
+        R.stock_actual: nueva_cantidad,
+        R.version: R.version + 1
+    }, synchronize_session=False)
+    if filas == 0:
+        actual = db.query(R.version, R.stock_reservado).filter(R.id_repuesto == repuesto_id).first()
+        if actual and actual.version == version_esperada:
+            raise StockInsuficienteError(
+                f"El stock no puede quedar por debajo de las unidades reservadas ({actual.stock_reservado})"
+            )
+        raise ConflictoVersionError("El stock fue modificado por otra operación")
+
+def ajustar_stock_repuesto(db: Session, repuesto_id: int, delta: int, tipo_movimiento_id: int, empleado_id: int, observaciones: str = None):
+    """Aplicar una entrada (delta > 0) o salida (delta < 0) de stock y crear movimiento"""
+    stock_anterior, stock_nuevo = ajustar_stock(db, repuesto_id, delta)
     
-    # Crear movimiento de inventario
     movimiento = models.MovimientoInventario(
         id_repuesto=repuesto_id,
         id_tipo_movimiento=tipo_movimiento_id,
-        cantidad=abs(nueva_cantidad - stock_anterior),
+        cantidad=abs(delta),
         stock_anterior=stock_anterior,
-        stock_nuevo=nueva_cantidad,
+        stock_nuevo=stock_nuevo,
         observaciones=observaciones,
         id_empleado=empleado_id
     )
     
     db.add(movimiento)
     db.commit()
-    db.refresh(repuesto)
+    return stock_nuevo
+
+def actualizar_stock_repuesto(db: Session, repuesto_id: int, nueva_cantidad: int, empleado_id: int, observaciones: str = None):
+    """Fijar el stock en nueva_cantidad (conteo físico) y crear el movimiento por la diferencia.
+
+    Usa la versión del repuesto: si otra operación cambia el stock entre la
+    lectura y el UPDATE se vuelve a leer, hasta STOCK_MAX_REINTENTOS veces.
+    """
+    R = models.Repuesto
+    for _ in range(STOCK_MAX_REINTENTOS):
+        actual = db.query(R.stock_actual, R.version).filter(R.id_repuesto == repuesto_id).first()
+        if not actual:
+            return None
+        
+        stock_anterior, version = actual
+        try:
+            establecer_stock(db, repuesto_id, nueva_cantidad, version)
+        except ConflictoVersionError:
+            db.rollback()
+            continue
+        
+        if nueva_cantidad == stock_anterior:
+            db.commit()
+            return get_repuesto(db, repuesto_id)
+        
+        # Crear movimiento de inventario: entrada o salida según el sentido de la corrección
+        movimiento = models.MovimientoInventario(
+            id_repuesto=repuesto_id,
+            id_tipo_movimiento=1 if nueva_cantidad > stock_anterior else 2,
+            cantidad=abs(nueva_cantidad - stock_anterior),
+            stock_anterior=stock_anterior,
+            stock_nuevo=nueva_cantidad,
+            observaciones=observaciones,
+            id_empleado=empleado_id
+        )
+        
+        db.add(movimiento)
+        db.commit()
+        return get_repuesto(db, repuesto_id)
     
-    return repuesto
+    raise ConflictoVersionError("El stock fue modificado por otra operación")
+
+# =============================================
+# RESERVAS DE STOCK
+# =============================================
+
+def get_reservas_ticket(db: Session, ticket_id: int, solo_activas: bool = True):
+    query = db.query(models.ReservaStock).filter(models.ReservaStock.id_ticket == ticket_id)
+    if solo_activas:
+        query = query.filter(models.ReservaStock.activa == True)
+    return query.order_by(models.ReservaStock.id_reserva).all()
+
+ESTADOS_TICKET_ABIERTO = [1, 2, 3, 4]
+
+def reservar_stock(db: Session, ticket_id: int, repuesto_id: int, cantidad: int, fecha_expiracion: datetime, empleado_id: int = None):
+    """Apartar unidades para un ticket abierto si hay stock disponible"""
+    if cantidad <= 0:
+        raise ValueError("La cantidad debe ser mayor que cero")
+    
+    # Bloquear el ticket: no puede cerrarse mientras se aparta el stock
+    estado = bloquear_ticket(db, ticket_id)
+    if estado is None:
+        db.rollback()
+        raise ValueError("Ticket no encontrado")
+    if estado not in ESTADOS_TICKET_ABIERTO:
+        db.rollback()
+        raise ValueError("No se puede reservar stock para un ticket entregado o cerrado")
+    
+    R = models.Repuesto
+    filas = db.query(R).filter(
+        R.id_repuesto == repuesto_id,
+        R.stock_actual - R.stock_reservado >= cantidad
+    ).update({R.stock_reservado: R.stock_reservado + cantidad}, synchronize_session=False)
+    
+    if filas == 0:
+        db.rollback()
+        if db.query(R.id_repuesto).filter(R.id_repuesto == repuesto_id).first() is None:
+            raise ValueError("Repuesto no encontrado")
+        raise StockInsuficienteError("Stock disponible insuficiente para reservar")
+    
+    reserva = models.ReservaStock(
+        id_repuesto=repuesto_id,
+        id_ticket=ticket_id,
+        cantidad=cantidad,
+        fecha_expiracion=fecha_expiracion,
+        id_empleado=empleado_id
+    )
+    db.add(reserva)
+    db.commit()
+    db.refresh(reserva)
+    return reserva
+
+def _descontar_reserva(db: Session, reserva_id: int, cantidad: int) -> bool:
+    """Restar unidades a una reserva activa; se desactiva al llegar a cero. No hace commit."""
+    RS = models.ReservaStock
+    filas = db.query(RS).filter(
+        RS.id_reserva == reserva_id,
+        RS.activa == True,
+        RS.cantidad >= cantidad
+    ).update({RS.cantidad: RS.cantidad - cantidad}, synchronize_session=False)
+    if filas != 1:
+        return False
+    # En un UPDATE aparte: MySQL evalúa las asignaciones de izquierda a derecha
+    db.query(RS).filter(RS.id_reserva == reserva_id, RS.cantidad == 0).update(
+        {RS.activa: False}, synchronize_session=False
+    )
+    return True
+
+def liberar_reserva(db: Session, ticket_id: int, reserva_id: int):
+    """Devolver al stock disponible las unidades de una reserva activa del ticket"""
+    reserva = db.query(models.ReservaStock).filter(
+        models.ReservaStock.id_reserva == reserva_id,
+        models.ReservaStock.id_ticket == ticket_id
+    ).first()
+    if not reserva or not reserva.activa:
+        return None
+    
+    cantidad = reserva.cantidad
+    if not _descontar_reserva(db, reserva_id, cantidad):
+        # La consumió o liberó otra operación entre la lectura y el UPDATE
+        db.rollback()
+        return None
+    
+    R = models.Repuesto
+    db.query(R).filter(R.id_repuesto == reserva.id_repuesto).update(
+        {R.stock_reservado: R.stock_reservado - cantidad}, synchronize_session=False
+    )
+    db.commit()
+    db.refresh(reserva)
+    return reserva
+
+def _consumir_reservas(db: Session, ticket_id: int, repuesto_id: int, cantidad: int) -> int:
+    """Tomar hasta `cantidad` unidades de las reservas activas del ticket; retorna cuántas. No hace commit."""
+    RS = models.ReservaStock
+    reservas = db.query(RS.id_reserva, RS.cantidad).filter(
+        RS.id_ticket == ticket_id,
+        RS.id_repuesto == repuesto_id,
+        RS.activa == True
+    ).order_by(RS.fecha_expiracion).with_for_update().all()
+    
+    consumido = 0
+    for id_reserva, reservado in reservas:
+        if consumido >= cantidad:
+            break
+        tomar = min(reservado, cantidad - consumido)
+        if _descontar_reserva(db, id_reserva, tomar):
+            consumido += tomar
+    return consumido
+
+def _desactivar_reservas(db: Session, reservas) -> None:
+    """Desactivar reservas ya bloqueadas y devolver sus unidades al stock disponible. No hace commit."""
+    RS = models.ReservaStock
+    R = models.Repuesto
+    db.query(RS).filter(RS.id_reserva.in_([r.id_reserva for r in reservas])).update(
+        {RS.activa: False}, synchronize_session=False
+    )
+    
+    por_repuesto = {}
+    for r in reservas:
+        por_repuesto[r.id_repuesto] = por_repuesto.get(r.id_repuesto, 0) + r.cantidad
+    for id_repuesto, cantidad in por_repuesto.items():
+        db.query(R).filter(R.id_repuesto == id_repuesto).update(
+            {R.stock_reservado: R.stock_reservado - cantidad}, synchronize_session=False
+        )
+
+def liberar_reservas_ticket(db: Session, ticket_id: int) -> int:
+    """Liberar todas las reservas activas del ticket; retorna cuántas. No hace commit."""
+    RS = models.ReservaStock
+    activas = db.query(RS.id_reserva, RS.id_repuesto, RS.cantidad).filter(
+        RS.id_ticket == ticket_id,
+        RS.activa == True
+    ).with_for_update().all()
+    if activas:
+        _desactivar_reservas(db, activas)
+    return len(activas)
+
+def bloquear_ticket(db: Session, ticket_id: int) -> Optional[int]:
+    """Bloquear la fila del ticket hasta el commit; retorna su estado o None si no existe"""
+    return db.query(models.TicketAtencion.id_estado).filter(
+        models.TicketAtencion.id_ticket == ticket_id
+    ).with_for_update().scalar()
+
+def liberar_reservas_vencidas(db: Session, lote: int = 500, ahora: datetime = None) -> int:
+    """Liberar en lotes las reservas activas vencidas; retorna cuántas se liberaron"""
+    RS = models.ReservaStock
+    ahora = ahora or datetime.utcnow()
+    liberadas = 0
+    
+    while True:
+        vencidas = db.query(RS.id_reserva, RS.id_repuesto, RS.cantidad).filter(
+            RS.activa == True,
+            RS.fecha_expiracion <= ahora
+        ).order_by(RS.fecha_expiracion).limit(lote).with_for_update().all()
+        if not vencidas:
+            break
+        
+        _desactivar_reservas(db, vencidas)
+        db.commit()
+        liberadas += len(vencidas)
+        if len(vencidas) < lote:
+            break
+    
+    return liberadas
 
 # =============================================
 # CITAS
 # =============================================
 
-def get_citas(db: Session, skip: int = 0, limit: int = 100, fecha_inicio: date = None, fecha_fin: date = None):
+def get_citas(db: Session, skip: int = 0, limit: int = 100, fecha_inicio: date = None, fecha_fin: date = None, estado: str = None):
     query = db.query(models.Cita).options(
         joinedload(models.Cita.cliente),
         joinedload(models.Cita.vehiculo),
         joinedload(models.Cita.empleado_asignado)
     )
     
-    if fecha_inicio:
-        query = query.filter(func.date(models.Cita.fecha_cita) >= fecha_inicio)
-    if fecha_fin:
-        query = query.filter(func.date(models.Cita.fecha_cita) <= fecha_fin)
+    query = Filtros().fechas(models.Cita.fecha_cita, fecha_inicio, fecha_fin).igual(models.Cita.estado_cita, estado).aplicar(query)
     
     return query.order_by(models.Cita.fecha_cita).offset(skip).limit(limit).all()
 
@@ -307,7 +581,7 @@ def get_citas_by_fecha(db: Session, fecha: date):
     return db.query(models.Cita).options(
         joinedload(models.Cita.cliente),
         joinedload(models.Cita.vehiculo)
-    ).filter(func.date(models.Cita.fecha_cita) == fecha).all()
+    ).filter(*en_fecha(models.Cita.fecha_cita, fecha)).all()
 
 # =============================================
 # TICKETS DE ATENCIÓN
@@ -316,20 +590,79 @@ def get_citas_by_fecha(db: Session, fecha: date):
 def get_estados_ticket(db: Session):
     return db.query(models.EstadoTicket).all()
 
-def get_tickets(db: Session, skip: int = 0, limit: int = 100, estado_id: int = None, cliente_id: int = None):
-    query = db.query(models.TicketAtencion).options(
-        joinedload(models.TicketAtencion.cliente),
-        joinedload(models.TicketAtencion.vehiculo),
-        joinedload(models.TicketAtencion.estado),
-        joinedload(models.TicketAtencion.empleado_asignado)
-    )
-    
+# selectinload parte su IN en lotes de este tamaño (valor fijo de SQLAlchemy)
+SELECTIN_LOTE = 500
+
+def opciones_ticket_completo():
+    """Carga anticipada de todo el grafo que declara schemas.TicketResponse.
+
+    Son 1 + k sentencias por cada SELECTIN_LOTE tickets, con k las relaciones
+    con selectinload que tienen filas: una página de 1000 hace dos lotes.
+    """
+    T = models.TicketAtencion
+    return [
+        joinedload(T.cliente),
+        joinedload(T.vehiculo).joinedload(models.Vehiculo.cliente),
+        selectinload(T.cita).options(
+            joinedload(models.Cita.cliente),
+            joinedload(models.Cita.vehiculo).joinedload(models.Vehiculo.cliente),
+            joinedload(models.Cita.empleado_asignado).joinedload(models.Empleado.puesto)
+        ),
+        joinedload(T.empleado_recepcion).joinedload(models.Empleado.puesto),
+        joinedload(T.empleado_asignado).joinedload(models.Empleado.puesto),
+        joinedload(T.estado),
+        selectinload(T.servicios).joinedload(models.TicketServicio.servicio).joinedload(models.Servicio.categoria),
+        selectinload(T.repuestos).joinedload(models.TicketRepuesto.repuesto).options(
+            joinedload(models.Repuesto.categoria),
+            joinedload(models.Repuesto.proveedor)
+        )
+    ]
+
+def filtrar_tickets(query, estado_id: int = None, cliente_id: int = None):
     if estado_id:
         query = query.filter(models.TicketAtencion.id_estado == estado_id)
     if cliente_id:
         query = query.filter(models.TicketAtencion.id_cliente == cliente_id)
+    return query
+
+def get_tickets(db: Session, skip: int = 0, limit: int = 100, estado_id: int = None, cliente_id: int = None, cursor: str = None):
+    query = db.query(models.TicketAtencion).options(*opciones_ticket_completo())
+    query = filtrar_tickets(query, estado_id, cliente_id)
     
-    return query.order_by(models.TicketAtencion.fecha_ingreso.desc()).offset(skip).limit(limit).all()
+    return paginar(
+        query, models.TicketAtencion.fecha_ingreso, models.TicketAtencion.id_ticket, skip, limit, cursor
+    ).all()
+
+def consulta_tickets_resumen(skip: int = 0, limit: int = 100, estado_id: int = None, cliente_id: int = None, cursor: str = None):
+    """SELECT de solo las columnas de TicketListItem; lo comparten las lecturas síncronas y asíncronas"""
+    T = models.TicketAtencion
+    query = select(
+        T.id_ticket,
+        T.numero_ticket,
+        T.fecha_ingreso,
+        T.fecha_estimada_entrega,
+        T.id_estado,
+        models.EstadoTicket.nombre_estado,
+        T.id_cliente,
+        models.Cliente.nombres.label("cliente_nombres"),
+        models.Cliente.apellidos.label("cliente_apellidos"),
+        T.id_vehiculo,
+        models.Vehiculo.placa,
+        models.Vehiculo.marca,
+        models.Vehiculo.modelo,
+        T.id_empleado_asignado,
+        models.Empleado.nombres.label("empleado_nombres"),
+        models.Empleado.apellidos.label("empleado_apellidos"),
+        T.total_general
+    ).select_from(T).outerjoin(T.estado).outerjoin(T.cliente).outerjoin(T.vehiculo).outerjoin(T.empleado_asignado)
+    query = filtrar_tickets(query, estado_id, cliente_id)
+    
+    return paginar(query, T.fecha_ingreso, T.id_ticket, skip, limit, cursor)
+
+def get_tickets_resumen(db: Session, skip: int = 0, limit: int = 100, estado_id: int = None, cliente_id: int = None, cursor: str = None):
+    """Listado liviano de tickets: una sola consulta, sin instanciar objetos ORM"""
+    filas = db.execute(consulta_tickets_resumen(skip, limit, estado_id, cliente_id, cursor))
+    return [schemas.TicketListItem.model_validate(fila._asdict()) for fila in filas]
 
 def get_ticket(db: Session, ticket_id: int):
     return db.query(models.TicketAtencion).options(
@@ -345,11 +678,7 @@ def get_ticket(db: Session, ticket_id: int):
 
 def create_ticket(db: Session, ticket: schemas.TicketCreate, empleado_recepcion_id: int):
     # Generar número de ticket
-    count = db.query(models.TicketAtencion).filter(
-        func.date(models.TicketAtencion.fecha_ingreso) == date.today()
-    ).count()
-    
-    numero_ticket = f"TK{datetime.now().strftime('%Y%m%d')}-{str(count + 1).zfill(3)}"
+    numero_ticket = secuencia_tickets.siguiente_numero()
     
     db_ticket = models.TicketAtencion(
         numero_ticket=numero_ticket,
@@ -362,15 +691,36 @@ def create_ticket(db: Session, ticket: schemas.TicketCreate, empleado_recepcion_
     return db_ticket
 
 def update_ticket(db: Session, ticket_id: int, ticket_update: schemas.TicketUpdate):
+    # Bloquear el ticket antes de leerlo para que no se aparte stock mientras se cierra
+    if bloquear_ticket(db, ticket_id) is None:
+        return None
     db_ticket = get_ticket(db, ticket_id)
     if db_ticket:
         update_data = ticket_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_ticket, key, value)
+        # Un ticket entregado o cerrado ya no va a consumir sus reservas
+        if db_ticket.id_estado not in ESTADOS_TICKET_ABIERTO:
+            liberar_reservas_ticket(db, ticket_id)
         db.commit()
         db.refresh(db_ticket)
     return db_ticket
 
+def ticket_existe(db: Session, ticket_id: int) -> bool:
+    """Verificación liviana, sin cargar el grafo del ticket"""
+    return db.query(models.TicketAtencion.id_ticket).filter(
+        models.TicketAtencion.id_ticket == ticket_id
+    ).first() is not None
+
+def _sumar_totales_ticket(db: Session, ticket_id: int, servicios=0, repuestos=0):
+    """Sumar los subtotales de líneas nuevas a los totales del ticket con un UPDATE atómico"""
+    T = models.TicketAtencion
+    db.query(T).filter(T.id_ticket == ticket_id).update({
+        T.total_servicios: func.coalesce(T.total_servicios, 0) + servicios,
+        T.total_repuestos: func.coalesce(T.total_repuestos, 0) + repuestos,
+        T.total_general: func.coalesce(T.total_general, 0) + servicios + repuestos
+    }, synchronize_session=False)
+
 def add_servicio_to_ticket(db: Session, ticket_id: int, servicio_data: schemas.TicketServicioCreate):
     """Agregar servicio a un ticket"""
     subtotal = servicio_data.precio_unitario * servicio_data.cantidad
@@ -384,14 +734,7 @@ def add_servicio_to_ticket(db: Session, ticket_id: int, servicio_data: schemas.T
     db.add(db_ticket_servicio)
     
     # Actualizar total del ticket
-    ticket = get_ticket(db, ticket_id)
-    if ticket:
-        total_servicios = db.query(func.sum(models.TicketServicio.subtotal)).filter(
-            models.TicketServicio.id_ticket == ticket_id
-        ).scalar() or 0
-        
-        ticket.total_servicios = total_servicios
-        ticket.total_general = ticket.total_servicios + ticket.total_repuestos
+    _sumar_totales_ticket(db, ticket_id, servicios=subtotal)
     
     db.commit()
     db.refresh(db_ticket_servicio)
@@ -401,12 +744,12 @@ def add_repuesto_to_ticket(db: Session, ticket_id: int, repuesto_data: schemas.T
     """Agregar repuesto a un ticket y actualizar stock"""
     subtotal = repuesto_data.precio_unitario * repuesto_data.cantidad
     
-    # Verificar stock disponible
-    repuesto = get_repuesto(db, repuesto_data.id_repuesto)
-    if not repuesto:
-        raise ValueError("Repuesto no encontrado")
-    if repuesto.stock_actual < repuesto_data.cantidad:
-        raise ValueError("Stock insuficiente")
+    # Descontar stock solo si alcanza (UPDATE condicional), usando primero lo reservado para el ticket
+    try:
+        stock_anterior, stock_nuevo = vender_stock(db, ticket_id, repuesto_data.id_repuesto, repuesto_data.cantidad)
+    except ValueError:
+        db.rollback()
+        raise
     
     db_ticket_repuesto = models.TicketRepuesto(
         id_ticket=ticket_id,
@@ -416,36 +759,154 @@ def add_repuesto_to_ticket(db: Session, ticket_id: int, repuesto_data: schemas.T
     
     db.add(db_ticket_repuesto)
     
-    # Actualizar stock
-    repuesto.stock_actual -= repuesto_data.cantidad
-    
     # Crear movimiento de inventario (tipo salida = 2)
     movimiento = models.MovimientoInventario(
         id_repuesto=repuesto_data.id_repuesto,
         id_tipo_movimiento=2,  # Venta
         cantidad=repuesto_data.cantidad,
         precio_unitario=repuesto_data.precio_unitario,
-        stock_anterior=repuesto.stock_actual + repuesto_data.cantidad,
-        stock_nuevo=repuesto.stock_actual,
+        stock_anterior=stock_anterior,
+        stock_nuevo=stock_nuevo,
         referencia_documento=f"TK-{ticket_id}",
         id_empleado=1  # Esto debería venir del usuario actual
     )
     db.add(movimiento)
     
     # Actualizar total del ticket
-    ticket = get_ticket(db, ticket_id)
-    if ticket:
-        total_repuestos = db.query(func.sum(models.TicketRepuesto.subtotal)).filter(
-            models.TicketRepuesto.id_ticket == ticket_id
-        ).scalar() or 0
-        
-        ticket.total_repuestos = total_repuestos
-        ticket.total_general = ticket.total_servicios + ticket.total_repuestos
+    _sumar_totales_ticket(db, ticket_id, repuestos=subtotal)
     
     db.commit()
     db.refresh(db_ticket_repuesto)
     return db_ticket_repuesto
 
+def add_lineas_to_ticket(db: Session, ticket_id: int, lineas: schemas.TicketLineasCreate, empleado_id: int):
+    """Agregar varios servicios y repuestos a un ticket en una sola transacción.
+
+    Los servicios se validan en una sola consulta. El stock se descuenta con un
+    UPDATE condicional por repuesto distinto (ajustar_stock), después de
+    consumir las reservas del ticket; las líneas y los movimientos se insertan
+    en lote. empleado_id es obligatorio si hay repuestos.
+    """
+    # Validar servicios en una sola consulta
+    ids_servicios = {s.id_servicio for s in lineas.servicios}
+    if ids_servicios:
+        encontrados = {id_ for (id_,) in db.query(models.Servicio.id_servicio).filter(
+            models.Servicio.id_servicio.in_(ids_servicios)
+        )}
+        faltantes = ids_servicios - encontrados
+        if faltantes:
+            raise ValueError(f"Servicios no encontrados: {sorted(faltantes)}")
+
+    # Descontar el total de cada repuesto con un UPDATE condicional; si alguno
+    # no alcanza se revierte toda la operación
+    requerido = {}
+    for r in lineas.repuestos:
+        if r.cantidad <= 0:
+            raise ValueError("La cantidad debe ser mayor que cero")
+        requerido[r.id_repuesto] = requerido.get(r.id_repuesto, 0) + r.cantidad
+    stock = {}
+    faltantes, insuficientes = [], []
+    for id_repuesto, cantidad in requerido.items():
+        try:
+            stock[id_repuesto], _ = vender_stock(db, ticket_id, id_repuesto, cantidad)
+        except StockInsuficienteError:
+            insuficientes.append(id_repuesto)
+        except ValueError:
+            faltantes.append(id_repuesto)
+    if faltantes or insuficientes:
+        db.rollback()
+        if faltantes:
+            raise ValueError(f"Repuestos no encontrados: {sorted(faltantes)}")
+        raise StockInsuficienteError(f"Stock insuficiente para repuestos: {sorted(insuficientes)}")
+
+    filas_servicios = [
+        dict(s.dict(), id_ticket=ticket_id, subtotal=s.precio_unitario * s.cantidad)
+        for s in lineas.servicios
+    ]
+    filas_repuestos = []
+    movimientos = []
+    for r in lineas.repuestos:
+        anterior = stock[r.id_repuesto]
+        stock[r.id_repuesto] = anterior - r.cantidad
+        filas_repuestos.append(dict(r.dict(), id_ticket=ticket_id, subtotal=r.precio_unitario * r.cantidad))
+        movimientos.append({
+            "id_repuesto": r.id_repuesto,
+            "id_tipo_movimiento": 2,  # Venta
+            "cantidad": r.cantidad,
+            "precio_unitario": r.precio_unitario,
+            "stock_anterior": anterior,
+            "stock_nuevo": stock[r.id_repuesto],
+            "referencia_documento": f"TK-{ticket_id}",
+            "id_empleado": empleado_id
+        })
+
+    # Inserciones en lote (executemany)
+    if filas_servicios:
+        db.execute(insert(models.TicketServicio), filas_servicios)
+    if filas_repuestos:
+        db.execute(insert(models.TicketRepuesto), filas_repuestos)
+        db.execute(insert(models.MovimientoInventario), movimientos)
+
+    total_servicios = sum((f["subtotal"] for f in filas_servicios), Decimal("0"))
+    total_repuestos = sum((f["subtotal"] for f in filas_repuestos), Decimal("0"))
+    _sumar_totales_ticket(db, ticket_id, servicios=total_servicios, repuestos=total_repuestos)
+    db.commit()
+
+    totales = db.query(
+        models.TicketAtencion.total_servicios,
+        models.TicketAtencion.total_repuestos,
+        models.TicketAtencion.total_general
+    ).filter(models.TicketAtencion.id_ticket == ticket_id).one()
+
+    return schemas.TicketLineasResponse(
+        id_ticket=ticket_id,
+        servicios_agregados=len(filas_servicios),
+        repuestos_agregados=len(filas_repuestos),
+        total_servicios=totales.total_servicios,
+        total_repuestos=totales.total_repuestos,
+        total_general=totales.total_general
+    )
+
+def reconciliar_totales_tickets(db: Session, corregir: bool = True) -> list:
+    """Comparar los totales guardados con la suma de las líneas; retorna los tickets con diferencias"""
+    T = models.TicketAtencion
+    suma_servicios = db.query(func.coalesce(func.sum(models.TicketServicio.subtotal), 0)).filter(
+        models.TicketServicio.id_ticket == T.id_ticket
+    ).scalar_subquery()
+    suma_repuestos = db.query(func.coalesce(func.sum(models.TicketRepuesto.subtotal), 0)).filter(
+        models.TicketRepuesto.id_ticket == T.id_ticket
+    ).scalar_subquery()
+    
+    diferencias = db.query(
+        T.id_ticket, T.total_servicios, suma_servicios, T.total_repuestos, suma_repuestos, T.total_general
+    ).filter(or_(
+        func.coalesce(T.total_servicios, 0) != suma_servicios,
+        func.coalesce(T.total_repuestos, 0) != suma_repuestos,
+        func.coalesce(T.total_general, 0) != suma_servicios + suma_repuestos
+    )).all()
+    
+    resultado = [
+        {
+            "id_ticket": id_ticket,
+            "total_servicios": total_servicios,
+            "suma_servicios": servicios,
+            "total_repuestos": total_repuestos,
+            "suma_repuestos": repuestos,
+            "total_general": total_general
+        }
+        for id_ticket, total_servicios, servicios, total_repuestos, repuestos, total_general in diferencias
+    ]
+    
+    if corregir and resultado:
+        db.query(T).filter(T.id_ticket.in_([d["id_ticket"] for d in resultado])).update({
+            T.total_servicios: suma_servicios,
+            T.total_repuestos: suma_repuestos,
+            T.total_general: suma_servicios + suma_repuestos
+        }, synchronize_session=False)
+        db.commit()
+    
+    return resultado
+
 # =============================================
 # FACTURACIÓN
 # =============================================
@@ -453,17 +914,54 @@ def add_repuesto_to_ticket(db: Session, ticket_id: int, repuesto_data: schemas.T
 def get_formas_pago(db: Session):
     return db.query(models.FormaPago).filter(models.FormaPago.activo == True).all()
 
-def get_facturas(db: Session, skip: int = 0, limit: int = 100, fecha_inicio: date = None, fecha_fin: date = None):
+def filtros_facturas(fecha_inicio: date = None, fecha_fin: date = None, estado_pago: str = None, cliente_id: int = None,
+                     forma_pago_id: int = None, monto_min: float = None, monto_max: float = None, texto: str = None) -> Filtros:
+    """Filtros comunes del listado y la búsqueda de facturas; texto requiere unir Cliente"""
+    F = models.Factura
+    return (
+        Filtros()
+        .fechas(F.fecha_factura, fecha_inicio, fecha_fin)
+        .igual(F.estado_pago, estado_pago)
+        .igual(F.id_cliente, cliente_id)
+        .igual(F.id_forma_pago, forma_pago_id)
+        .minimo(F.total, monto_min)
+        .maximo(F.total, monto_max)
+        .contiene(texto, F.numero_factura, models.Cliente.nombres, models.Cliente.apellidos)
+    )
+
+def opciones_listado_facturas():
+    """Carga anticipada de lo que declara schemas.FacturaListItem (el ticket solo con su estado)"""
+    F = models.Factura
+    return [
+        joinedload(F.cliente),
+        joinedload(F.ticket).joinedload(models.TicketAtencion.estado),
+        joinedload(F.forma_pago),
+        joinedload(F.empleado_factura).joinedload(models.Empleado.puesto),
+        selectinload(F.detalles)
+    ]
+
+def get_facturas(db: Session, skip: int = 0, limit: int = 100, fecha_inicio: date = None, fecha_fin: date = None,
+                 cursor: str = None, estado_pago: str = None, cliente_id: int = None):
+    query = db.query(models.Factura).options(*opciones_listado_facturas())
+    
+    query = filtros_facturas(fecha_inicio, fecha_fin, estado_pago, cliente_id).aplicar(query)
+    
+    return paginar(query, models.Factura.fecha_factura, models.Factura.id_factura, skip, limit, cursor).all()
+
+def buscar_facturas(db: Session, q: str = None, estado_pago: str = None, forma_pago_id: int = None,
+                    monto_min: float = None, monto_max: float = None, skip: int = 0, limit: int = 50):
+    """Búsqueda avanzada de facturas"""
     query = db.query(models.Factura).options(
         joinedload(models.Factura.cliente),
-        joinedload(models.Factura.ticket),
         joinedload(models.Factura.forma_pago)
     )
     
-    if fecha_inicio:
-        query = query.filter(func.date(models.Factura.fecha_factura) >= fecha_inicio)
-    if fecha_fin:
-        query = query.filter(func.date(models.Factura.fecha_factura) <= fecha_fin)
+    if q:
+        query = query.join(models.Cliente, models.Factura.id_cliente == models.Cliente.id_cliente)
+    
+    query = filtros_facturas(
+        estado_pago=estado_pago, forma_pago_id=forma_pago_id, monto_min=monto_min, monto_max=monto_max, texto=q
+    ).aplicar(query)
     
     return query.order_by(models.Factura.fecha_factura.desc()).offset(skip).limit(limit).all()
 
@@ -478,18 +976,14 @@ def get_factura(db: Session, factura_id: int):
 
 def create_factura(db: Session, factura_data: schemas.FacturaCreate, empleado_id: int):
     """Crear factura basada en un ticket"""
-    # Generar número de factura
-    count = db.query(models.Factura).filter(
-        func.date(models.Factura.fecha_factura) == date.today()
-    ).count()
-    
-    numero_factura = f"FC{datetime.now().strftime('%Y%m%d')}-{str(count + 1).zfill(4)}"
-    
     # Obtener datos del ticket
     ticket = get_ticket(db, factura_data.id_ticket)
     if not ticket:
         raise ValueError("Ticket no encontrado")
     
+    # Generar número de factura (después de validar, para no gastar números)
+    numero_factura = secuencia_facturas.siguiente_numero()
+    
     db_factura = models.Factura(
         numero_factura=numero_factura,
         id_cliente=ticket.id_cliente,
@@ -501,6 +995,7 @@ def create_factura(db: Session, factura_data: schemas.FacturaCreate, empleado_id
     db.flush()  # Para obtener el ID
     
     # Crear detalles de factura
+    detalles = []
     for detalle_data in factura_data.detalles:
         detalle = models.DetalleFactura(
             id_factura=db_factura.id_factura,
@@ -508,89 +1003,293 @@ def create_factura(db: Session, factura_data: schemas.FacturaCreate, empleado_id
             **detalle_data.dict()
         )
         db.add(detalle)
+        detalles.append(detalle)
+    
+    resumen_ventas.registrar_factura(db, db_factura, detalles)
     
     db.commit()
     db.refresh(db_factura)
     return db_factura
 
+def _cambiar_estado_factura(db: Session, db_factura: models.Factura, estado_nuevo):
+    """Cambiar estado_pago solo si sigue siendo el que se leyó y mover su aporte en ventas_diarias.
+
+    Con dos cambios simultáneos el segundo UPDATE no encuentra el estado
+    anterior y falla, en vez de volver a restar la factura del resumen.
+    """
+    F = models.Factura
+    filas = db.query(F).filter(
+        F.id_factura == db_factura.id_factura,
+        F.estado_pago == db_factura.estado_pago
+    ).update({F.estado_pago: estado_nuevo}, synchronize_session=False)
+    if filas != 1:
+        db.rollback()
+        raise ValueError("La factura fue modificada por otra operación; intente de nuevo")
+    resumen_ventas.cambiar_estado(db, db_factura, estado_nuevo)
+    db_factura.estado_pago = estado_nuevo
+
 def update_factura(db: Session, factura_id: int, factura_update: schemas.FacturaUpdate):
     db_factura = get_factura(db, factura_id)
     if db_factura:
         update_data = factura_update.dict(exclude_unset=True)
+        estado_nuevo = update_data.pop('estado_pago', None)
+        if estado_nuevo:
+            _cambiar_estado_factura(db, db_factura, estado_nuevo)
         for key, value in update_data.items():
             setattr(db_factura, key, value)
         db.commit()
         db.refresh(db_factura)
     return db_factura
 
+def marcar_factura_pagada(db: Session, factura_id: int, observaciones: str = None):
+    db_factura = get_factura(db, factura_id)
+    if db_factura:
+        _cambiar_estado_factura(db, db_factura, models.EstadoPago.pagada)
+        if observaciones:
+            db_factura.observaciones = (db_factura.observaciones or "") + f"\nPago registrado: {observaciones}"
+        db.commit()
+    return db_factura
+
+def anular_factura(db: Session, factura_id: int, motivo: str):
+    db_factura = get_factura(db, factura_id)
+    if db_factura:
+        if db_factura.estado_pago == models.EstadoPago.pagada:
+            raise ValueError("No se puede anular una factura pagada")
+        _cambiar_estado_factura(db, db_factura, models.EstadoPago.anulada)
+        db_factura.observaciones = (db_factura.observaciones or "") + f"\nAnulada el {datetime.now().strftime('%Y-%m-%d %H:%M')}: {motivo}"
+        db.commit()
+    return db_factura
+
 # =============================================
 # REPORTES Y ESTADÍSTICAS
 # =============================================
 
-def get_reporte_ventas(db: Session, fecha_inicio: date, fecha_fin: date):
-    """Generar reporte de ventas por período"""
-    facturas = db.query(models.Factura).filter(
-        func.date(models.Factura.fecha_factura) >= fecha_inicio,
-        func.date(models.Factura.fecha_factura) <= fecha_fin
-    ).all()
+def _sumar_si(condicion, valor=1):
+    return func.coalesce(func.sum(case((condicion, valor), else_=0)), 0)
+
+def get_reporte_ventas(db: Session, fecha_inicio: date, fecha_fin: date, granularidad: str = None):
+    """Generar reporte de ventas por período.
+
+    Una consulta agregada sobre ventas_diarias con sumas condicionales; con
+    granularidad se agrupa por día y las semanas se arman con esos días.
+    """
+    V = models.VentaDiaria
+    es_factura = V.tipo == resumen_ventas.TIPO_FACTURA
+    dia = [V.fecha.label('dia')] if granularidad else []
     
-    total_facturas = len(facturas)
-    total_ventas = sum(f.total for f in facturas)
-    facturas_pagadas = len([f for f in facturas if f.estado_pago == 'pagada'])
-    facturas_pendientes = len([f for f in facturas if f.estado_pago == 'pendiente'])
+    filas = db.query(
+        *dia,
+        _sumar_si(es_factura, V.cantidad).label('total_facturas'),
+        _sumar_si(es_factura, V.monto).label('total_ventas'),
+        _sumar_si(es_factura & (V.estado_pago == models.EstadoPago.pendiente), V.cantidad).label('facturas_pendientes'),
+        _sumar_si(es_factura & (V.estado_pago == models.EstadoPago.pagada), V.cantidad).label('facturas_pagadas'),
+        _sumar_si(V.tipo == models.TipoItem.servicio.value, V.monto).label('total_servicios'),
+        _sumar_si(~es_factura & (V.tipo != models.TipoItem.servicio.value), V.monto).label('total_repuestos')
+    ).filter(V.fecha >= fecha_inicio, V.fecha <= fecha_fin).group_by(*dia).all()
     
-    # Calcular totales por servicios y repuestos
-    total_servicios = 0
-    total_repuestos = 0
+    campos = ['total_facturas', 'total_ventas', 'facturas_pendientes', 'facturas_pagadas', 'total_servicios', 'total_repuestos']
+    periodos = {}
+    for fila in filas:
+        clave = None
+        if granularidad:
+            clave = fila.dia
+            if granularidad == schemas.GranularidadEnum.semana:
+                clave -= timedelta(days=clave.weekday())
+        periodo = periodos.setdefault(clave, dict.fromkeys(campos, 0))
+        for campo, valor in fila._asdict().items():
+            if campo != 'dia':
+                periodo[campo] += valor
     
-    for factura in facturas:
-        for detalle in factura.detalles:
-            if detalle.tipo_item == 'servicio':
-                total_servicios += detalle.subtotal
-            else:
-                total_repuestos += detalle.subtotal
+    totales = dict.fromkeys(campos, 0)
+    for periodo in periodos.values():
+        for campo in campos:
+            totales[campo] += periodo[campo]
     
     return schemas.ReporteVentas(
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
-        total_facturas=total_facturas,
-        total_ventas=total_ventas,
-        total_servicios=total_servicios,
-        total_repuestos=total_repuestos,
-        facturas_pendientes=facturas_pendientes,
-        facturas_pagadas=facturas_pagadas
+        **totales,
+        granularidad=granularidad,
+        periodos=[
+            schemas.ReporteVentasPeriodo(periodo=clave, **valores)
+            for clave, valores in sorted(periodos.items())
+        ] if granularidad else None
     )
 
-def get_estadisticas_generales(db: Session):
-    """Obtener estadísticas generales del sistema"""
-    total_clientes = db.query(models.Cliente).count()
-    total_vehiculos = db.query(models.Vehiculo).filter(models.Vehiculo.activo == True).count()
+def get_ventas_mensuales(db: Session, fecha_inicio: date, fecha_fin: date, por_estado: bool = False):
+    """Cantidad y total de facturas por mes (y opcionalmente por estado_pago) desde ventas_diarias.
+
+    Solo retorna los meses con facturas: filas (año, mes, estado_pago | None, cantidad, total).
+    """
+    V = models.VentaDiaria
+    año = extract('year', V.fecha).label('año')
+    mes = extract('month', V.fecha).label('mes')
+    columnas = [año, mes]
+    if por_estado:
+        columnas.append(V.estado_pago)
     
-    tickets_activos = db.query(models.TicketAtencion).filter(
-        models.TicketAtencion.id_estado.in_([1, 2, 3, 4])  # Estados activos
-    ).count()
+    filas = db.query(
+        *columnas,
+        func.coalesce(func.sum(V.cantidad), 0).label('cantidad'),
+        func.coalesce(func.sum(V.monto), 0).label('total')
+    ).filter(
+        V.tipo == resumen_ventas.TIPO_FACTURA, V.fecha >= fecha_inicio, V.fecha <= fecha_fin
+    ).group_by(*columnas).all()
     
-    tickets_completados = db.query(models.TicketAtencion).filter(
-        models.TicketAtencion.id_estado.in_([5, 6])  # Estados completados
-    ).count()
+    return [
+        (int(fila.año), int(fila.mes), fila.estado_pago.value if por_estado and fila.estado_pago else None, fila.cantidad, fila.total)
+        for fila in filas
+    ]
+
+def _horas_entre(dialecto: str, inicio, fin):
+    """Expresiones (horas, hora entera) entre dos columnas DateTime"""
+    if dialecto == "sqlite":
+        horas = (func.julianday(fin) - func.julianday(inicio)) * 24
+        return horas, cast(horas, Integer)
+    if dialecto == "postgresql":
+        horas = extract('epoch', fin - inicio) / 3600
+    else:
+        horas = func.timestampdiff(literal_column('SECOND'), inicio, fin) / 3600
+    return horas, func.floor(horas)
+
+def _acumular_hora(histograma: dict, hora: int, cantidad: int, minimo: float, maximo: float):
+    """Sumar un grupo al histograma {hora: [cantidad, mínimo, máximo]}"""
+    actual = histograma.get(hora)
+    if actual is None:
+        histograma[hora] = [cantidad, minimo, maximo]
+    else:
+        actual[0] += cantidad
+        actual[1] = min(actual[1], minimo)
+        actual[2] = max(actual[2], maximo)
+
+def _percentil(histograma: dict, p: float):
+    """Percentil p (0-1) de un histograma {hora: [cantidad, mínimo, máximo]}.
+
+    Se interpola dentro de la hora y se acota a los valores observados en
+    ella, así el resultado nunca queda fuera de los datos.
+    """
+    objetivo = p * sum(cantidad for cantidad, _, _ in histograma.values())
+    acumulado = 0
+    for hora in sorted(histograma):
+        cantidad, minimo, maximo = histograma[hora]
+        if acumulado + cantidad >= objetivo:
+            return min(max(hora + (objetivo - acumulado) / cantidad, minimo), maximo)
+        acumulado += cantidad
+    return None
+
+def _resumen_tiempos(histograma: dict, horas_totales: float) -> dict:
+    completados = sum(cantidad for cantidad, _, _ in histograma.values())
+    return {
+        "tickets_completados": completados,
+        "tiempo_promedio_horas": horas_totales / completados if completados else None,
+        "tiempo_p50_horas": _percentil(histograma, 0.5),
+        "tiempo_p90_horas": _percentil(histograma, 0.9)
+    }
+
+def get_estadisticas_tickets(db: Session, fecha_inicio: date = None, fecha_fin: date = None):
+    """Tickets por estado, tiempo de entrega (promedio, p50, p90) y desglose por mecánico.
+
+    Una consulta agrupada por estado, mecánico y hora entera del tiempo de
+    entrega (NULL si el ticket no se ha entregado). Los percentiles salen de
+    ese histograma, interpolados dentro de la hora y acotados al mínimo y
+    máximo observados en ella.
+    """
+    T = models.TicketAtencion
+    horas, hora = _horas_entre(db.get_bind().dialect.name, T.fecha_ingreso, T.fecha_entrega_real)
     
-    citas_programadas = db.query(models.Cita).filter(
-        models.Cita.estado_cita.in_(['programada', 'confirmada']),
-        models.Cita.fecha_cita >= datetime.now()
-    ).count()
+    filas = db.query(
+        models.EstadoTicket.nombre_estado,
+        T.id_empleado_asignado,
+        hora.label('hora'),
+        func.count(T.id_ticket).label('cantidad'),
+        func.sum(horas).label('horas'),
+        func.min(horas).label('horas_min'),
+        func.max(horas).label('horas_max')
+    ).join(models.EstadoTicket, T.id_estado == models.EstadoTicket.id_estado).filter(
+        *rango_fechas(T.fecha_ingreso, fecha_inicio, fecha_fin)
+    ).group_by(models.EstadoTicket.nombre_estado, T.id_empleado_asignado, hora).all()
     
-    stock_bajo_minimo = db.query(models.Repuesto).filter(
-        models.Repuesto.stock_actual <= models.Repuesto.stock_minimo,
-        models.Repuesto.activo == True
-    ).count()
-    
-    return schemas.EstadisticasGenerales(
-        total_clientes=total_clientes,
-        total_vehiculos=total_vehiculos,
-        tickets_activos=tickets_activos,
-        tickets_completados=tickets_completados,
-        citas_programadas=citas_programadas,
-        stock_bajo_minimo=stock_bajo_minimo
+    por_estado = {}
+    tickets_mecanico = {}
+    histograma, horas_totales = {}, 0.0
+    histogramas_mecanico, horas_mecanico = {}, {}
+    for fila in filas:
+        por_estado[fila.nombre_estado] = por_estado.get(fila.nombre_estado, 0) + fila.cantidad
+        tickets_mecanico[fila.id_empleado_asignado] = tickets_mecanico.get(fila.id_empleado_asignado, 0) + fila.cantidad
+        if fila.hora is None:
+            continue
+        grupo = (int(fila.hora), fila.cantidad, float(fila.horas_min), float(fila.horas_max))
+        _acumular_hora(histograma, *grupo)
+        horas_totales += float(fila.horas)
+        _acumular_hora(histogramas_mecanico.setdefault(fila.id_empleado_asignado, {}), *grupo)
+        horas_mecanico[fila.id_empleado_asignado] = horas_mecanico.get(fila.id_empleado_asignado, 0.0) + float(fila.horas)
+    
+    ids = [i for i in tickets_mecanico if i is not None]
+    nombres = {
+        e.id_empleado: e for e in db.query(
+            models.Empleado.id_empleado, models.Empleado.nombres, models.Empleado.apellidos
+        ).filter(models.Empleado.id_empleado.in_(ids))
+    } if ids else {}
+    
+    return {
+        "total_tickets": sum(por_estado.values()),
+        "tickets_por_estado": por_estado,
+        **_resumen_tiempos(histograma, horas_totales),
+        "por_mecanico": [
+            {
+                "id_empleado": id_empleado,
+                "nombres": nombres[id_empleado].nombres if id_empleado in nombres else None,
+                "apellidos": nombres[id_empleado].apellidos if id_empleado in nombres else None,
+                "total_tickets": total,
+                **_resumen_tiempos(histogramas_mecanico.get(id_empleado, {}), horas_mecanico.get(id_empleado, 0.0))
+            }
+            for id_empleado, total in sorted(tickets_mecanico.items(), key=lambda item: -item[1])
+        ]
+    }
+
+# Los contadores se calculan en una sola sentencia (un COUNT por subconsulta)
+# y se sirven desde contadores_cache; ver contadores.py para la invalidación.
+
+def _contar(model, *condiciones):
+    return select(func.count()).select_from(model).where(*condiciones).scalar_subquery()
+
+def consulta_dashboard(today: date):
+    return select(
+        _contar(models.Cita, *en_fecha(models.Cita.fecha_cita, today)).label('citas_hoy'),
+        _contar(models.TicketAtencion, models.TicketAtencion.id_estado.in_([1, 2, 3, 4])).label('tickets_activos'),  # Estados activos
+        _contar(models.TicketAtencion, *en_fecha(models.TicketAtencion.fecha_ingreso, today)).label('tickets_hoy'),
+        _contar(models.Repuesto, *condiciones_stock_bajo()).label('repuestos_stock_bajo')
+    )
+
+def armar_dashboard(fila, today: date) -> dict:
+    return {**fila._asdict(), "fecha": today.isoformat()}
+
+def get_dashboard(db: Session, today: date) -> dict:
+    """Contadores del dashboard principal"""
+    return contadores_cache.get_or_compute(
+        ("dashboard", today),
+        lambda: armar_dashboard(db.execute(consulta_dashboard(today)).one(), today)
+    )
+
+def consulta_estadisticas_generales():
+    return select(
+        _contar(models.Cliente).label('total_clientes'),
+        _contar(models.Vehiculo, models.Vehiculo.activo == True).label('total_vehiculos'),
+        _contar(models.TicketAtencion, models.TicketAtencion.id_estado.in_([1, 2, 3, 4])).label('tickets_activos'),  # Estados activos
+        _contar(models.TicketAtencion, models.TicketAtencion.id_estado.in_([5, 6])).label('tickets_completados'),  # Estados completados
+        _contar(
+            models.Cita,
+            models.Cita.estado_cita.in_(['programada', 'confirmada']),
+            models.Cita.fecha_cita >= datetime.now()
+        ).label('citas_programadas'),
+        _contar(models.Repuesto, *condiciones_stock_bajo()).label('stock_bajo_minimo')
+    )
+
+def get_estadisticas_generales(db: Session):
+    """Obtener estadísticas generales del sistema"""
+    return contadores_cache.get_or_compute(
+        ("estadisticas_generales",),
+        lambda: schemas.EstadisticasGenerales(**db.execute(consulta_estadisticas_generales()).one()._asdict())
     )
 
 # =============================================
@@ -600,7 +1299,7 @@ def get_estadisticas_generales(db: Session):
 def get_tipos_movimiento(db: Session):
     return db.query(models.TipoMovimientoInventario).all()
 
-def get_movimientos_inventario(db: Session, repuesto_id: int = None, fecha_inicio: date = None, fecha_fin: date = None, skip: int = 0, limit: int = 100):
+def get_movimientos_inventario(db: Session, repuesto_id: int = None, fecha_inicio: date = None, fecha_fin: date = None, skip: int = 0, limit: int = 100, cursor: str = None):
     query = db.query(models.MovimientoInventario).options(
         joinedload(models.MovimientoInventario.repuesto),
         joinedload(models.MovimientoInventario.tipo_movimiento),
@@ -611,19 +1310,15 @@ def get_movimientos_inventario(db: Session, repuesto_id: int = None, fecha_inici
         query = query.filter(models.MovimientoInventario.id_repuesto == repuesto_id)
 
     # Filtrar por rango de fechas (fecha_movimiento)
-    if fecha_inicio:
-        query = query.filter(func.date(models.MovimientoInventario.fecha_movimiento) >= fecha_inicio)
-    if fecha_fin:
-        query = query.filter(func.date(models.MovimientoInventario.fecha_movimiento) <= fecha_fin)
+    query = query.filter(*rango_fechas(models.MovimientoInventario.fecha_movimiento, fecha_inicio, fecha_fin))
     
-    return query.order_by(models.MovimientoInventario.fecha_movimiento.desc()).offset(skip).limit(limit).all()
+    return paginar(
+        query, models.MovimientoInventario.fecha_movimiento, models.MovimientoInventario.id_movimiento,
+        skip, limit, cursor
+    ).all()
 
 def create_movimiento_inventario(db: Session, movimiento: schemas.MovimientoInventarioCreate, empleado_id: int):
     """Crear movimiento de inventario y actualizar stock"""
-    repuesto = get_repuesto(db, movimiento.id_repuesto)
-    if not repuesto:
-        raise ValueError("Repuesto no encontrado")
-    
     tipo_mov = db.query(models.TipoMovimientoInventario).filter(
         models.TipoMovimientoInventario.id_tipo_movimiento == movimiento.id_tipo_movimiento
     ).first()
@@ -631,16 +1326,15 @@ def create_movimiento_inventario(db: Session, movimiento: schemas.MovimientoInve
     if not tipo_mov:
         raise ValueError("Tipo de movimiento no encontrado")
     
-    stock_anterior = repuesto.stock_actual
-    
-    if tipo_mov.tipo == 'entrada':
-        stock_nuevo = stock_anterior + movimiento.cantidad
-    else:
-        stock_nuevo = stock_anterior - movimiento.cantidad
-        if stock_nuevo < 0:
-            raise ValueError("Stock no puede ser negativo")
-    
-    repuesto.stock_actual = stock_nuevo
+    delta = movimiento.cantidad if tipo_mov.tipo == 'entrada' else -movimiento.cantidad
+    try:
+        stock_anterior, stock_nuevo = ajustar_stock(db, movimiento.id_repuesto, delta)
+    except StockInsuficienteError:
+        db.rollback()
+        raise ValueError("Stock no puede ser negativo")
+    except ValueError:
+        db.rollback()
+        raise
     
     db_movimiento = models.MovimientoInventario(
         stock_anterior=stock_anterior,
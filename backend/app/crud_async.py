@@ -0,0 +1,91 @@
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from datetime import date
+import models
+import schemas
+import crud
+import database
+from paginacion import paginar
+from contadores import contadores_cache
+
+# =============================================
+# CONSULTAS DE LECTURA ASÍNCRONAS
+# =============================================
+
+# Con AsyncSession no hay lazy loading implícito: cada listado declara el grafo
+# completo que necesita su schema de respuesta.
+
+async def get_tickets(db: AsyncSession, skip: int = 0, limit: int = 100, estado_id: int = None, cliente_id: int = None, cursor: str = None):
+    query = select(models.TicketAtencion).options(*crud.opciones_ticket_completo())
+    query = crud.filtrar_tickets(query, estado_id, cliente_id)
+    query = paginar(query, models.TicketAtencion.fecha_ingreso, models.TicketAtencion.id_ticket, skip, limit, cursor)
+    return (await db.execute(query)).unique().scalars().all()
+
+async def get_tickets_resumen(db: AsyncSession, skip: int = 0, limit: int = 100, estado_id: int = None, cliente_id: int = None, cursor: str = None):
+    filas = await db.execute(crud.consulta_tickets_resumen(skip, limit, estado_id, cliente_id, cursor))
+    return [schemas.TicketListItem.model_validate(fila._asdict()) for fila in filas]
+
+async def get_facturas(db: AsyncSession, skip: int = 0, limit: int = 100, fecha_inicio: date = None, fecha_fin: date = None,
+                       cursor: str = None, estado_pago: str = None, cliente_id: int = None):
+    query = select(models.Factura).options(*crud.opciones_listado_facturas())
+
+    query = crud.filtros_facturas(fecha_inicio, fecha_fin, estado_pago, cliente_id).aplicar(query)
+
+    query = paginar(query, models.Factura.fecha_factura, models.Factura.id_factura, skip, limit, cursor)
+    return (await db.execute(query)).unique().scalars().all()
+
+async def get_repuestos(db: AsyncSession, skip: int = 0, limit: int = 100, search: str = None, categoria_id: int = None):
+    query = select(models.Repuesto).options(
+        joinedload(models.Repuesto.categoria),
+        joinedload(models.Repuesto.proveedor)
+    ).where(models.Repuesto.activo == True)
+
+    if search:
+        query = query.where(
+            or_(
+                models.Repuesto.codigo_repuesto.contains(search),
+                models.Repuesto.nombre_repuesto.contains(search)
+            )
+        )
+
+    if categoria_id:
+        query = query.where(models.Repuesto.id_categoria_repuesto == categoria_id)
+
+    return (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+
+async def get_repuestos_stock_bajo(db: AsyncSession):
+    query = select(models.Repuesto).options(
+        joinedload(models.Repuesto.categoria),
+        joinedload(models.Repuesto.proveedor)
+    ).where(*crud.condiciones_stock_bajo())
+    return (await db.execute(query)).scalars().all()
+
+async def get_clientes(db: AsyncSession, skip: int = 0, limit: int = 100, search: str = None, cursor: str = None):
+    query = select(models.Cliente)
+
+    if search:
+        query = query.where(
+            or_(
+                models.Cliente.nombres.contains(search),
+                models.Cliente.apellidos.contains(search),
+                models.Cliente.dpi.contains(search),
+                models.Cliente.telefono.contains(search)
+            )
+        )
+
+    query = paginar(
+        query, models.Cliente.fecha_registro, models.Cliente.id_cliente,
+        skip, limit, cursor, descendente=False
+    )
+    return (await db.execute(query)).scalars().all()
+
+async def get_dashboard(today: date) -> dict:
+    # El cálculo se comparte entre las peticiones concurrentes, así que abre su
+    # propia sesión: si se cancela la petición que lo inició, la de los demás
+    # sigue siendo válida
+    async def calcular():
+        async with database.AsyncSessionLocal() as db:
+            return crud.armar_dashboard((await db.execute(crud.consulta_dashboard(today))).one(), today)
+
+    return await contadores_cache.get_or_compute_async(("dashboard", today), calcular)
@@ -1,21 +1,360 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from decouple import config
+from tareas import TareaPeriodica
 
 # Configuración de la base de datos
 DATABASE_URL = config('DATABASE_URL')
 
+# Configuración del pool de conexiones
+DB_POOL_SIZE = config('DB_POOL_SIZE', default=5, cast=int)
+DB_MAX_OVERFLOW = config('DB_MAX_OVERFLOW', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=30, cast=float)
+DB_POOL_RECYCLE = config('DB_POOL_RECYCLE', default=300, cast=int)
+# pre_ping agrega un round trip en cada checkout; al desactivarlo las
+# conexiones inactivas se validan en segundo plano cada DB_POOL_VALIDATION_SECONDS
+DB_POOL_PRE_PING = config('DB_POOL_PRE_PING', default=True, cast=bool)
+DB_POOL_VALIDATION_SECONDS = config('DB_POOL_VALIDATION_SECONDS', default=60, cast=float)
+
+# =============================================
+# MÉTRICAS DEL POOL
+# =============================================
+
+class PoolMetrics:
+    """Contadores de eventos del pool e histograma del tiempo de espera por conexión"""
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.conexiones_creadas = 0
+        self.invalidaciones = 0
+        self.timeouts = 0
+        self.max_checked_out = 0
+        self.espera_total_ms = 0.0
+        self.espera_max_ms = 0.0
+        self._histograma = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def registrar_espera(self, ms: float, timeout: bool = False):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            self.espera_total_ms += ms
+            self.espera_max_ms = max(self.espera_max_ms, ms)
+            for i, limite in enumerate(self.BUCKETS_MS):
+                if ms <= limite:
+                    self._histograma[i] += 1
+                    break
+            else:
+                self._histograma[-1] += 1
+
+    def registrar_checkout(self, checked_out: int):
+        with self._lock:
+            self.checkouts += 1
+            self.max_checked_out = max(self.max_checked_out, checked_out)
+
+    def incrementar(self, contador: str):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            esperas = sum(self._histograma)
+            histograma = {f"<={limite}ms": n for limite, n in zip(self.BUCKETS_MS, self._histograma)}
+            histograma[f">{self.BUCKETS_MS[-1]}ms"] = self._histograma[-1]
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "conexiones_creadas": self.conexiones_creadas,
+                "invalidaciones": self.invalidaciones,
+                "timeouts": self.timeouts,
+                "max_checked_out": self.max_checked_out,
+                "espera_promedio_ms": round(self.espera_total_ms / esperas, 3) if esperas else None,
+                "espera_max_ms": round(self.espera_max_ms, 3),
+                "espera_histograma": histograma
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def conectar_midiendo_espera(db):
+    """Tomar la conexión de la sesión midiendo cuánto se espera por el pool.
+
+    Se mide con la API pública (Session.connection) en vez de sobrescribir
+    métodos internos de QueuePool; el evento checkout del engine solo avisa
+    cuando la conexión ya se entregó.
+    """
+    inicio = time.perf_counter()
+    timeout = False
+    try:
+        db.connection()
+    except PoolTimeoutError:
+        timeout = True
+        raise
+    finally:
+        pool_metrics.registrar_espera((time.perf_counter() - inicio) * 1000, timeout)
+
+
+class SesionMedida(Session):
+    """Sesión que mide la espera por el pool solo cuando una transacción pide conexión.
+
+    Una petición que no consulta la base (p. ej. un acierto de cache) no toma
+    conexión del pool.
+    """
+
+    def get_bind(self, *args, **kwargs):
+        bind = super().get_bind(*args, **kwargs)
+        if not self.info.get("conexion_medida"):
+            # Marcar antes: connection() vuelve a llamar a get_bind
+            self.info["conexion_medida"] = True
+            conectar_midiendo_espera(self)
+        return bind
+
+
+@event.listens_for(SesionMedida, "after_transaction_end")
+def _on_fin_transaccion(session, transaction):
+    # Al cerrar la transacción raíz se devuelve la conexión; la próxima se vuelve a medir
+    if transaction.parent is None:
+        session.info.pop("conexion_medida", None)
+
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {
+        "echo": config('DEBUG', default=False, cast=bool),
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE
+    }
+    # SQLite en memoria usa su propio pool de una sola conexión
+    if ":memory:" not in url and url.rstrip("/") != "sqlite:":
+        kwargs.update(
+            poolclass=QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+    return kwargs
+
 # Crear el engine
-engine = create_engine(
-    DATABASE_URL,
-    echo=config('DEBUG', default=False, cast=bool),
-    pool_pre_ping=True,
-    pool_recycle=300
-)
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.incrementar("conexiones_creadas")
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    checked_out = engine.pool.checkedout() if hasattr(engine.pool, "checkedout") else 0
+    pool_metrics.registrar_checkout(checked_out)
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_metrics.incrementar("checkins")
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.incrementar("invalidaciones")
+
+def estado_pool() -> dict:
+    """Estado actual del pool y métricas acumuladas"""
+    pool = engine.pool
+    estado = {
+        "clase": type(pool).__name__,
+        "pre_ping": DB_POOL_PRE_PING,
+        "recycle_segundos": DB_POOL_RECYCLE
+    }
+    if isinstance(pool, QueuePool):
+        estado.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+            timeout_segundos=DB_POOL_TIMEOUT
+        )
+    estado["metricas"] = pool_metrics.snapshot()
+    return estado
+
+def validar_conexiones_pool() -> int:
+    """Ejecutar SELECT 1 sobre las conexiones inactivas e invalidar las caídas.
+
+    Se valida una conexión a la vez y se devuelve al pool enseguida, para no
+    dejar sin conexiones libres a las peticiones que llegan mientras tanto.
+    """
+    pool = engine.pool
+    inactivas = pool.checkedin() if isinstance(pool, QueuePool) else 1
+    invalidadas = 0
+    for _ in range(inactivas):
+        try:
+            conn = engine.connect()
+        except SQLAlchemyError:
+            invalidadas += 1
+            continue
+        try:
+            conn.exec_driver_sql("SELECT 1")
+        except SQLAlchemyError:
+            if not conn.invalidated:
+                conn.invalidate()
+            invalidadas += 1
+        finally:
+            conn.close()
+    return invalidadas
+
+# Validación periódica; solo se inicia si pre_ping está desactivado
+validacion_pool = TareaPeriodica("validacion-pool", DB_POOL_VALIDATION_SECONDS, validar_conexiones_pool)
+
+def iniciar_validacion_pool():
+    if not DB_POOL_PRE_PING and DB_POOL_VALIDATION_SECONDS > 0:
+        validacion_pool.iniciar()
 
 # Crear SessionLocal
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=SesionMedida)
+
+# =============================================
+# RÉPLICA DE LECTURA (OPCIONAL)
+# =============================================
+
+# Los reportes leen de DATABASE_REPLICA_URL mientras su retraso no supere
+# REPLICA_MAX_LAG_SECONDS; si no, o si la réplica falla, usan la primaria.
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5, cast=float)
+REPLICA_LAG_CHECK_SECONDS = config('REPLICA_LAG_CHECK_SECONDS', default=10, cast=float)
+
+replica_engine = create_engine(DATABASE_REPLICA_URL, **_engine_kwargs(DATABASE_REPLICA_URL)) if DATABASE_REPLICA_URL else None
+# Sesión sin medición: las métricas del pool son las de la primaria (ver estado_pool)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
+def medir_retraso_replica(conn) -> float:
+    """Segundos de retraso de la réplica; None si no se está replicando"""
+    dialecto = conn.dialect.name
+    if dialecto == "postgresql":
+        return conn.exec_driver_sql(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        ).scalar()
+    if dialecto == "mysql":
+        try:
+            fila = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+        except DBAPIError:
+            # MySQL < 8.0.22
+            fila = conn.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+        if fila is None:
+            return 0.0
+        retraso = fila.get("Seconds_Behind_Source", fila.get("Seconds_Behind_Master"))
+        return None if retraso is None else float(retraso)
+    # SQLite u otros: no hay replicación que medir, basta con que responda
+    conn.exec_driver_sql("SELECT 1")
+    return 0.0
+
+
+class EstadoReplica:
+    """Decide si las lecturas pueden ir a la réplica; la medición se cachea"""
+
+    def __init__(self, max_lag: float, intervalo: float):
+        self.max_lag = max_lag
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._proxima_medicion = 0.0
+        self.disponible = False
+        self.retraso = None
+        self.motivo = "sin réplica configurada"
+        self.lecturas_replica = 0
+        self.lecturas_primaria = 0
+
+    def _medir(self):
+        try:
+            with replica_engine.connect() as conn:
+                retraso = medir_retraso_replica(conn)
+        except SQLAlchemyError as e:
+            self.disponible, self.retraso, self.motivo = False, None, f"error: {e.__class__.__name__}"
+            return
+        self.retraso = retraso
+        if retraso is None:
+            self.disponible, self.motivo = False, "replicación detenida"
+        elif retraso > self.max_lag:
+            self.disponible, self.motivo = False, f"retraso {retraso:.1f}s > {self.max_lag}s"
+        else:
+            self.disponible, self.motivo = True, None
+
+    def usar_replica(self) -> bool:
+        if replica_engine is None:
+            return False
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora >= self._proxima_medicion:
+                self._medir()
+                self._proxima_medicion = ahora + self.intervalo
+            if self.disponible:
+                self.lecturas_replica += 1
+            else:
+                self.lecturas_primaria += 1
+            return self.disponible
+
+    def marcar_fallo(self, error: Exception):
+        """Enviar las lecturas a la primaria hasta la próxima medición"""
+        with self._lock:
+            self.disponible = False
+            self.motivo = f"error: {error.__class__.__name__}"
+            self._proxima_medicion = time.monotonic() + self.intervalo
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "configurada": replica_engine is not None,
+                "disponible": self.disponible,
+                "retraso_segundos": self.retraso,
+                "max_retraso_segundos": self.max_lag,
+                "motivo": self.motivo,
+                "lecturas_replica": self.lecturas_replica,
+                "lecturas_primaria": self.lecturas_primaria
+            }
+
+
+estado_replica = EstadoReplica(REPLICA_MAX_LAG_SECONDS, REPLICA_LAG_CHECK_SECONDS)
+
+# =============================================
+# CAPA ASÍNCRONA (OPCIONAL)
+# =============================================
+
+# Con ASYNC_DB_ENABLED los listados de lectura se sirven con AsyncSession
+# (ver routers/lecturas_async.py); el resto de la API sigue siendo síncrona.
+ASYNC_DB_ENABLED = config('ASYNC_DB_ENABLED', default=False, cast=bool)
+
+_DRIVERS_ASYNC = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def _url_async(url: str) -> str:
+    """Derivar la URL con driver asíncrono a partir de DATABASE_URL"""
+    esquema, separador, resto = url.partition("://")
+    return _DRIVERS_ASYNC.get(esquema, esquema) + separador + resto
+
+async_engine = None
+AsyncSessionLocal = None
+
+if ASYNC_DB_ENABLED:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    DATABASE_ASYNC_URL = config('DATABASE_ASYNC_URL', default=_url_async(DATABASE_URL))
+    async_kwargs = _engine_kwargs(DATABASE_ASYNC_URL)
+    # QueuePool es síncrono; el engine asíncrono usa su variante asyncio
+    if "poolclass" in async_kwargs:
+        async_kwargs["poolclass"] = AsyncAdaptedQueuePool
+    async_engine = create_async_engine(DATABASE_ASYNC_URL, **async_kwargs)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Base para los modelos
 Base = declarative_base()
@@ -28,7 +367,42 @@ def get_db():
     finally:
         db.close()
 
+# Dependency de solo lectura: réplica si está al día, primaria si no
+def get_read_db():
+    en_replica = estado_replica.usar_replica()
+    db = ReplicaSessionLocal() if en_replica else SessionLocal()
+    db.info["replica"] = en_replica
+    try:
+        yield db
+    except DBAPIError as e:
+        if en_replica:
+            estado_replica.marcar_fallo(e)
+        raise
+    finally:
+        db.close()
+
+def leer_con_respaldo(db, consulta):
+    """Ejecutar consulta(db); si db es de la réplica y falla, repetir una vez en la primaria.
+
+    La réplica queda marcada como no disponible hasta la próxima medición,
+    así las peticiones siguientes ya van a la primaria.
+    """
+    try:
+        return consulta(db)
+    except DBAPIError as e:
+        if not db.info.get("replica"):
+            raise
+        estado_replica.marcar_fallo(e)
+        db.rollback()
+    with SessionLocal() as primaria:
+        return consulta(primaria)
+
+# Dependency para obtener la sesión asíncrona
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Función para inicializar la base de datos
 def init_db():
     """Crear todas las tablas en la base de datos"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
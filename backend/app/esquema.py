@@ -0,0 +1,104 @@
+from sqlalchemy import inspect, select, update
+from sqlalchemy.exc import DBAPIError
+from database import engine, Base
+import models
+import resumen_ventas
+
+# Versión del esquema que esperan los modelos. Incrementarla en el mismo
+# cambio que agregue tablas, columnas o índices y ejecutar:
+#   python manage_db.py upgrade
+SCHEMA_VERSION = 10
+
+
+class EsquemaDesactualizadoError(RuntimeError):
+    pass
+
+
+def version_instalada(conn):
+    """Versión registrada en schema_version; None si la tabla no existe"""
+    try:
+        return conn.execute(
+            select(models.SchemaVersion.version).where(models.SchemaVersion.id == 1)
+        ).scalar()
+    except DBAPIError:
+        return None
+
+def verificar_esquema() -> int:
+    """Comprobación de arranque: una sola consulta, sin reflexión"""
+    with engine.connect() as conn:
+        version = version_instalada(conn)
+    if version != SCHEMA_VERSION:
+        raise EsquemaDesactualizadoError(
+            f"Esquema en versión {version}, se requiere {SCHEMA_VERSION}. "
+            "Ejecute: python manage_db.py upgrade"
+        )
+    return version
+
+def _default_ddl(columna, dialect) -> str:
+    default = columna.server_default
+    if default is None or not hasattr(default, "arg"):
+        return ""
+    if isinstance(default.arg, str):
+        return f" DEFAULT '{default.arg}'"
+    return f" DEFAULT {default.arg.compile(dialect=dialect)}"
+
+def _agregar_columnas_faltantes(conn, inspector) -> list:
+    """ALTER TABLE ... ADD COLUMN para columnas nuevas de tablas ya existentes"""
+    preparer = conn.dialect.identifier_preparer
+    agregadas = []
+    for tabla in Base.metadata.sorted_tables:
+        existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name in existentes:
+                continue
+            ddl = (
+                f"ALTER TABLE {preparer.format_table(tabla)} "
+                f"ADD COLUMN {preparer.format_column(columna)} {columna.type.compile(dialect=conn.dialect)}"
+                + _default_ddl(columna, conn.dialect)
+            )
+            # NOT NULL solo es seguro si hay default para las filas existentes
+            if not columna.nullable and columna.server_default is not None:
+                ddl += " NOT NULL"
+            conn.exec_driver_sql(ddl)
+            agregadas.append(f"{tabla.name}.{columna.name}")
+    return agregadas
+
+def _crear_indices_faltantes(conn, inspector) -> list:
+    creados = []
+    for tabla in Base.metadata.sorted_tables:
+        existentes = {i["name"] for i in inspector.get_indexes(tabla.name)}
+        for indice in tabla.indexes:
+            if indice.name not in existentes:
+                indice.create(conn)
+                creados.append(indice.name)
+    return creados
+
+def actualizar_esquema() -> dict:
+    """Crear tablas, columnas e índices faltantes y registrar la versión"""
+    with engine.begin() as conn:
+        anterior = version_instalada(conn) if inspect(conn).has_table("schema_version") else None
+        tablas_previas = set(inspect(conn).get_table_names())
+        Base.metadata.create_all(bind=conn)
+
+        inspector = inspect(conn)
+        columnas = _agregar_columnas_faltantes(conn, inspector)
+        indices = _crear_indices_faltantes(conn, inspector)
+        tablas_creadas = sorted(set(inspector.get_table_names()) - tablas_previas)
+        if models.VentaDiaria.__tablename__ in tablas_creadas:
+            # Facturas previas al resumen diario
+            resumen_ventas.reconstruir(conn)
+
+        if anterior is None:
+            conn.execute(models.SchemaVersion.__table__.insert().values(id=1, version=SCHEMA_VERSION))
+        else:
+            conn.execute(
+                update(models.SchemaVersion).where(models.SchemaVersion.id == 1).values(version=SCHEMA_VERSION)
+            )
+
+    return {
+        "version_anterior": anterior,
+        "version": SCHEMA_VERSION,
+        "tablas_creadas": tablas_creadas,
+        "columnas_agregadas": columnas,
+        "indices_creados": indices
+    }
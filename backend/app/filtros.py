@@ -0,0 +1,75 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import or_
+
+# =============================================
+# FILTROS DE FECHA
+# =============================================
+
+# func.date(columna) >= :fecha obliga a calcular DATE() en cada fila y el
+# motor no puede usar el índice de la columna. Los rangos se expresan sobre el
+# valor guardado: [desde 00:00, día siguiente a hasta 00:00).
+
+def inicio_dia(dia: date) -> datetime:
+    return datetime.combine(dia, time.min)
+
+
+def rango_fechas(columna, desde: date = None, hasta: date = None) -> list:
+    """Condiciones para desde <= DATE(columna) <= hasta; cualquiera de los extremos es opcional"""
+    condiciones = []
+    if desde:
+        condiciones.append(columna >= inicio_dia(desde))
+    if hasta:
+        condiciones.append(columna < inicio_dia(hasta + timedelta(days=1)))
+    return condiciones
+
+
+def en_fecha(columna, dia: date) -> list:
+    """Condiciones para DATE(columna) == dia"""
+    return rango_fechas(columna, dia, dia)
+
+
+# =============================================
+# CONSTRUCTOR DE FILTROS
+# =============================================
+
+class Filtros:
+    """Acumula condiciones WHERE opcionales; los valores None se ignoran.
+
+    Cada método retorna la misma instancia para encadenar llamadas y
+    aplicar() las agrega a un Query del ORM o a un select().
+    """
+
+    def __init__(self):
+        self.condiciones = []
+
+    def agregar(self, *condiciones):
+        self.condiciones.extend(condiciones)
+        return self
+
+    def igual(self, columna, valor):
+        if valor is not None:
+            self.condiciones.append(columna == valor)
+        return self
+
+    def minimo(self, columna, valor):
+        if valor is not None:
+            self.condiciones.append(columna >= valor)
+        return self
+
+    def maximo(self, columna, valor):
+        if valor is not None:
+            self.condiciones.append(columna <= valor)
+        return self
+
+    def fechas(self, columna, desde: date = None, hasta: date = None):
+        self.condiciones.extend(rango_fechas(columna, desde, hasta))
+        return self
+
+    def contiene(self, texto: str, *columnas):
+        """Texto contenido en cualquiera de las columnas"""
+        if texto:
+            self.condiciones.append(or_(*(columna.contains(texto) for columna in columnas)))
+        return self
+
+    def aplicar(self, query):
+        return query.filter(*self.condiciones) if self.condiciones else query
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+
+
+class PoolSaturadoError(Exception):
+    """La cola del pool de hashing está llena"""
+    pass
+
+
+class LatencyStats:
+    """Contadores de latencia con percentiles sobre las últimas muestras"""
+
+    def __init__(self, muestras: int = 1000):
+        self._muestras = deque(maxlen=muestras)
+        self._lock = threading.Lock()
+        self.total = 0
+        self.max_ms = 0.0
+
+    def registrar(self, ms: float):
+        with self._lock:
+            self._muestras.append(ms)
+            self.total += 1
+            self.max_ms = max(self.max_ms, ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            ordenadas = sorted(self._muestras)
+            total = self.total
+            max_ms = self.max_ms
+
+        def percentil(p):
+            if not ordenadas:
+                return None
+            return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))], 2)
+
+        return {
+            "llamadas": total,
+            "promedio_ms": round(sum(ordenadas) / len(ordenadas), 2) if ordenadas else None,
+            "p50_ms": percentil(0.50),
+            "p95_ms": percentil(0.95),
+            "p99_ms": percentil(0.99),
+            "max_ms": round(max_ms, 2)
+        }
+
+
+class HashingPool:
+    """Ejecutor dedicado para bcrypt.
+
+    Mantiene el hashing fuera del threadpool de FastAPI para que una ráfaga de
+    logins no deje sin hilos al resto de endpoints. Si hay más operaciones
+    pendientes que workers + profundidad de cola, se rechaza la nueva operación
+    con PoolSaturadoError en lugar de encolarla sin límite.
+    """
+
+    def __init__(self, workers: int, profundidad_cola: int):
+        self.workers = workers
+        self.profundidad_cola = profundidad_cola
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self.rechazadas = 0
+        self.latencias = {"hash": LatencyStats(), "verify": LatencyStats()}
+        self.esperas = LatencyStats()
+
+    def _reservar(self):
+        with self._lock:
+            if self._pendientes >= self.workers + self.profundidad_cola:
+                self.rechazadas += 1
+                raise PoolSaturadoError("Hashing pool saturado")
+            self._pendientes += 1
+
+    def _liberar(self):
+        with self._lock:
+            self._pendientes -= 1
+
+    def _ejecutar(self, operacion: str, encolado: float, fn, *args):
+        inicio = time.perf_counter()
+        self.esperas.registrar((inicio - encolado) * 1000)
+        try:
+            return fn(*args)
+        finally:
+            self.latencias[operacion].registrar((time.perf_counter() - inicio) * 1000)
+
+    def _enviar(self, operacion: str, fn, *args):
+        """Encolar fn en el executor; el cupo se libera cuando el trabajo termina.
+
+        Si quien espera se cancela, bcrypt sigue corriendo en el hilo, así que
+        el cupo no se puede devolver antes que eso.
+        """
+        self._reservar()
+        try:
+            future = self._executor.submit(self._ejecutar, operacion, time.perf_counter(), fn, *args)
+        except BaseException:
+            self._liberar()
+            raise
+        future.add_done_callback(lambda _: self._liberar())
+        return future
+
+    async def run(self, operacion: str, fn, *args):
+        """Ejecutar fn en el pool sin bloquear el event loop"""
+        return await asyncio.wrap_future(self._enviar(operacion, fn, *args))
+
+    def run_sync(self, operacion: str, fn, *args):
+        """Ejecutar fn en el pool esperando el resultado (código síncrono)"""
+        return self._enviar(operacion, fn, *args).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pendientes = self._pendientes
+        return {
+            "workers": self.workers,
+            "profundidad_cola": self.profundidad_cola,
+            "pendientes": pendientes,
+            "rechazadas": self.rechazadas,
+            "espera_cola": self.esperas.stats(),
+            "hash": self.latencias["hash"].stats(),
+            "verify": self.latencias["verify"].stats()
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+hashing_pool = HashingPool(
+    workers=config('HASH_WORKERS', default=2, cast=int),
+    profundidad_cola=config('HASH_QUEUE_DEPTH', default=32, cast=int)
+)
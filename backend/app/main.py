@@ -1,9 +1,31 @@
-from fastapi import FastAPI
+import time
+# Referencia para medir el arranque de cada worker, incluida la importación de módulos
+_inicio_proceso = time.perf_counter()
+import os
+import logging
+from fastapi import Depends, FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 from decouple import config
-from database import init_db
+import database
+import schemas
+from database import engine, estado_pool, estado_replica, iniciar_validacion_pool, validacion_pool
+from hashing import hashing_pool
+from ultimo_acceso import registro_ultimo_acceso
+from auth import barrido_tokens, require_admin
+from esquema import verificar_esquema, actualizar_esquema
+from conciliacion import conciliacion_totales, iniciar_conciliacion
+from reservas import barrido_reservas
+from paginacion import CABECERA_CURSOR
 from routers import auth, clientes, servicios, inventario, tickets, facturas, cotizaciones
 
+# Se usa el logger de uvicorn para que el mensaje salga junto a su salida de arranque
+logger = logging.getLogger("uvicorn.error")
+
+# En desarrollo se puede aplicar el esquema al arrancar; en producción se usa manage_db.py
+DB_AUTO_UPGRADE = config('DB_AUTO_UPGRADE', default=False, cast=bool)
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title=config('PROJECT_NAME', default='Sistema Taller Mecánico'),
@@ -27,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CABECERA_CURSOR],
 )
 
 #app.add_middleware(
@@ -38,6 +61,11 @@ app.add_middleware(
 #)
 
 # Incluir todos los routers
+if database.ASYNC_DB_ENABLED:
+    # Registrado primero para que sus rutas tengan prioridad sobre las síncronas
+    from routers import lecturas_async
+    app.include_router(lecturas_async.router, prefix="/api/v1", tags=["lecturas"])
+
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["autenticación"])
 app.include_router(clientes.router, prefix="/api/v1", tags=["clientes"])
 app.include_router(servicios.router, prefix="/api/v1", tags=["servicios"])
@@ -49,8 +77,36 @@ app.include_router(cotizaciones.router, prefix="/api/v1", tags=["cotizaciones"])
 # Evento de inicio de la aplicación
 @app.on_event("startup")
 async def startup_event():
-    """Inicializar la base de datos al iniciar la aplicación"""
-    init_db()
+    """Verificar el esquema e iniciar las tareas de segundo plano"""
+    inicio = time.perf_counter()
+    if DB_AUTO_UPGRADE:
+        version = actualizar_esquema()["version"]
+    else:
+        version = verificar_esquema()
+    ms_esquema = (time.perf_counter() - inicio) * 1000
+
+    registro_ultimo_acceso.iniciar()
+    barrido_tokens.iniciar()
+    iniciar_validacion_pool()
+    iniciar_conciliacion()
+    barrido_reservas.iniciar()
+
+    logger.info(
+        "Worker %s listo en %.0f ms (esquema v%s verificado en %.1f ms)",
+        os.getpid(), (time.perf_counter() - _inicio_proceso) * 1000, version, ms_esquema
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Liberar recursos de segundo plano"""
+    barrido_reservas.detener()
+    conciliacion_totales.detener()
+    validacion_pool.detener()
+    barrido_tokens.detener()
+    registro_ultimo_acceso.detener()
+    hashing_pool.shutdown()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
 
 # Endpoint raíz
 @app.get("/")
@@ -67,6 +123,33 @@ def read_root():
 def health_check():
     return {"status": "healthy", "service": "taller-api"}
 
+@app.get("/health/db")
+def health_db():
+    """Estado de la base de datos; sin autenticación, no expone detalles del error"""
+    inicio = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        logger.exception("Health check de la base de datos falló")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unhealthy"}
+        )
+    
+    return {
+        "status": "healthy",
+        "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2)
+    }
+
+@app.get("/health/db/detalle")
+def health_db_detalle(current_user: schemas.UsuarioSesion = Depends(require_admin)):
+    """Estado del pool de conexiones y de la réplica (Solo administrador)"""
+    return {
+        "pool": estado_pool(),
+        "replica": estado_replica.snapshot()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,52 @@
+# manage_db.py
+# Administración del esquema fuera del arranque de la API.
+# Uso: python manage_db.py [upgrade|check|rebuild-ventas]
+#   upgrade  crea tablas, columnas e índices faltantes y registra SCHEMA_VERSION
+#   check    muestra la versión instalada y la requerida (sale con 1 si difieren)
+#   rebuild-ventas [desde hasta]
+#            recalcula ventas_diarias desde las facturas (fechas YYYY-MM-DD;
+#            sin fechas, todo el historial). Ejecutar con la API detenida.
+import sys
+import time
+from datetime import date
+from database import engine
+from esquema import SCHEMA_VERSION, actualizar_esquema, version_instalada
+import resumen_ventas
+
+
+def upgrade():
+    inicio = time.perf_counter()
+    resultado = actualizar_esquema()
+    print(f"Esquema: v{resultado['version_anterior']} -> v{resultado['version']} "
+          f"({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    for clave in ("tablas_creadas", "columnas_agregadas", "indices_creados"):
+        if resultado[clave]:
+            print(f"  {clave}: {', '.join(resultado[clave])}")
+
+
+def check() -> int:
+    with engine.connect() as conn:
+        version = version_instalada(conn)
+    print(f"Versión instalada: {version} | requerida: {SCHEMA_VERSION}")
+    return 0 if version == SCHEMA_VERSION else 1
+
+
+def rebuild_ventas(desde: date = None, hasta: date = None):
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        filas = resumen_ventas.reconstruir(conn, desde, hasta)
+    rango = f"{desde or 'inicio'} a {hasta or 'hoy'}" if desde or hasta else "todo el historial"
+    print(f"ventas_diarias: {filas} filas para {rango} ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if comando == "upgrade":
+        upgrade()
+    elif comando == "check":
+        sys.exit(check())
+    elif comando == "rebuild-ventas":
+        rebuild_ventas(*[date.fromisoformat(a) for a in sys.argv[2:4]])
+    else:
+        print("Uso: python manage_db.py [upgrade|check|rebuild-ventas [desde hasta]]")
+        sys.exit(1)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DECIMAL, DateTime, Boolean, Date, Enum, ForeignKey, TIMESTAMP, Float
+from sqlalchemy import Column, Integer, String, Text, DECIMAL, DateTime, Boolean, Date, Enum, ForeignKey, TIMESTAMP, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -92,11 +92,26 @@ class Usuario(Base):
     id_rol = Column(Integer, ForeignKey("roles.id_rol"))
     activo = Column(Boolean, default=True)
     ultimo_acceso = Column(TIMESTAMP)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     fecha_creacion = Column(TIMESTAMP, server_default=func.current_timestamp())
     
     # Relaciones
     empleado = relationship("Empleado", back_populates="usuario")
     rol = relationship("Rol", back_populates="usuarios")
+    refresh_tokens = relationship("RefreshToken", back_populates="usuario")
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id_refresh_token = Column(Integer, primary_key=True, autoincrement=True)
+    id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    fecha_expiracion = Column(DateTime, nullable=False)
+    revocado = Column(Boolean, default=False)
+    fecha_creacion = Column(TIMESTAMP, server_default=func.current_timestamp())
+    
+    # Relaciones
+    usuario = relationship("Usuario", back_populates="refresh_tokens")
 
 # =============================================
 # MÓDULO DE CLIENTES
@@ -115,6 +130,10 @@ class Cliente(Base):
     fecha_registro = Column(TIMESTAMP, server_default=func.current_timestamp())
     cotizaciones = relationship("Cotizacion", back_populates="cliente")
     
+    __table_args__ = (
+        Index("ix_clientes_fecha_registro_id", "fecha_registro", "id_cliente"),
+    )
+    
     # Relaciones
     vehiculos = relationship("Vehiculo", back_populates="cliente")
     citas = relationship("Cita", back_populates="cliente")
@@ -137,6 +156,10 @@ class Vehiculo(Base):
     activo = Column(Boolean, default=True)
     fecha_registro = Column(TIMESTAMP, server_default=func.current_timestamp())
     
+    __table_args__ = (
+        Index("ix_vehiculos_cliente", "id_cliente"),
+    )
+    
     # Relaciones
     cliente = relationship("Cliente", back_populates="vehiculos")
     citas = relationship("Cita", back_populates="vehiculo")
@@ -212,15 +235,50 @@ class Repuesto(Base):
     precio_venta = Column(DECIMAL(10, 2), nullable=False)
     stock_minimo = Column(Integer, default=5)
     stock_actual = Column(Integer, default=0)
+    # Unidades apartadas por reservas activas; disponible = actual - reservado
+    stock_reservado = Column(Integer, nullable=False, default=0, server_default="0")
     ubicacion_almacen = Column(String(100))
     activo = Column(Boolean, default=True)
+    # Se incrementa en cada cambio de stock (control optimista de concurrencia)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     fecha_creacion = Column(TIMESTAMP, server_default=func.current_timestamp())
     
+    __table_args__ = (
+        # Inventario activo, opcionalmente por categoría
+        Index("ix_repuestos_activo_categoria", "activo", "id_categoria_repuesto"),
+    )
+    
     # Relaciones
     categoria = relationship("CategoriaRepuesto", back_populates="repuestos")
     proveedor = relationship("Proveedor", back_populates="repuestos")
     ticket_repuestos = relationship("TicketRepuesto", back_populates="repuesto")
     movimientos = relationship("MovimientoInventario", back_populates="repuesto")
+    reservas = relationship("ReservaStock", back_populates="repuesto")
+    
+    @property
+    def stock_disponible(self):
+        return (self.stock_actual or 0) - (self.stock_reservado or 0)
+
+class ReservaStock(Base):
+    __tablename__ = "reservas_stock"
+    
+    id_reserva = Column(Integer, primary_key=True, autoincrement=True)
+    id_repuesto = Column(Integer, ForeignKey("repuestos.id_repuesto"), nullable=False)
+    id_ticket = Column(Integer, ForeignKey("tickets_atencion.id_ticket"), nullable=False)
+    cantidad = Column(Integer, nullable=False)
+    activa = Column(Boolean, nullable=False, default=True)
+    fecha_expiracion = Column(DateTime, nullable=False)
+    id_empleado = Column(Integer, ForeignKey("empleados.id_empleado"))
+    fecha_creacion = Column(TIMESTAMP, server_default=func.current_timestamp())
+    
+    __table_args__ = (
+        # Barrido de vencidas y búsqueda de reservas de un ticket
+        Index("ix_reservas_stock_activa_expiracion", "activa", "fecha_expiracion"),
+        Index("ix_reservas_stock_ticket_repuesto", "id_ticket", "id_repuesto"),
+    )
+    
+    # Relaciones
+    repuesto = relationship("Repuesto", back_populates="reservas")
 
 # =============================================
 # MÓDULO OPERATIVO
@@ -251,6 +309,11 @@ class Cita(Base):
     estado_cita = Column(Enum(EstadoCita), default=EstadoCita.programada)
     fecha_creacion = Column(TIMESTAMP, server_default=func.current_timestamp())
     
+    __table_args__ = (
+        Index("ix_citas_fecha_cita", "fecha_cita"),
+        Index("ix_citas_estado_fecha", "estado_cita", "fecha_cita"),
+    )
+    
     # Relaciones
     cliente = relationship("Cliente", back_populates="citas")
     vehiculo = relationship("Vehiculo", back_populates="citas")
@@ -280,6 +343,16 @@ class TicketAtencion(Base):
     total_general = Column(DECIMAL(10, 2), default=0)
     fecha_actualizacion = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
     
+    __table_args__ = (
+        # Orden de los listados paginados por cursor (paginacion.py)
+        Index("ix_tickets_atencion_fecha_ingreso_id", "fecha_ingreso", "id_ticket"),
+        # Listado filtrado por estado o por cliente, más reciente primero
+        Index("ix_tickets_atencion_estado_fecha", "id_estado", "fecha_ingreso"),
+        Index("ix_tickets_atencion_cliente_fecha", "id_cliente", "fecha_ingreso"),
+        # Cubre crud.get_estadisticas_tickets: por estado y rango de ingreso sin leer la tabla
+        Index("ix_tickets_atencion_estadisticas", "id_estado", "fecha_ingreso", "id_empleado_asignado", "fecha_entrega_real"),
+    )
+    
     # Relaciones
     cliente = relationship("Cliente", back_populates="tickets")
     vehiculo = relationship("Vehiculo", back_populates="tickets")
@@ -303,6 +376,12 @@ class TicketServicio(Base):
     observaciones = Column(Text)
     fecha_aplicacion = Column(TIMESTAMP, server_default=func.current_timestamp())
     
+    __table_args__ = (
+        # Carga de las líneas de cada ticket y reportes por servicio
+        Index("ix_ticket_servicios_ticket", "id_ticket"),
+        Index("ix_ticket_servicios_servicio", "id_servicio"),
+    )
+    
     # Relaciones
     ticket = relationship("TicketAtencion", back_populates="servicios")
     servicio = relationship("Servicio", back_populates="ticket_servicios")
@@ -318,6 +397,11 @@ class TicketRepuesto(Base):
     subtotal = Column(DECIMAL(10, 2), nullable=False)
     fecha_aplicacion = Column(TIMESTAMP, server_default=func.current_timestamp())
     
+    __table_args__ = (
+        Index("ix_ticket_repuestos_ticket", "id_ticket"),
+        Index("ix_ticket_repuestos_repuesto", "id_repuesto"),
+    )
+    
     # Relaciones
     ticket = relationship("TicketAtencion", back_populates="repuestos")
     repuesto = relationship("Repuesto", back_populates="ticket_repuestos")
@@ -356,6 +440,14 @@ class Factura(Base):
     id_empleado_factura = Column(Integer, ForeignKey("empleados.id_empleado"), nullable=False)
     fecha_vencimiento = Column(Date)
     
+    __table_args__ = (
+        Index("ix_facturas_fecha_factura_id", "fecha_factura", "id_factura"),
+        # Pendientes por vencimiento, facturas de un cliente y factura de un ticket
+        Index("ix_facturas_estado_vencimiento", "estado_pago", "fecha_vencimiento"),
+        Index("ix_facturas_cliente_fecha", "id_cliente", "fecha_factura"),
+        Index("ix_facturas_ticket", "id_ticket"),
+    )
+    
     # Relaciones
     ticket = relationship("TicketAtencion", back_populates="facturas")
     cliente = relationship("Cliente", back_populates="facturas")
@@ -375,9 +467,29 @@ class DetalleFactura(Base):
     precio_unitario = Column(DECIMAL(10, 2), nullable=False)
     subtotal = Column(DECIMAL(10, 2), nullable=False)
     
+    __table_args__ = (
+        Index("ix_detalle_facturas_factura", "id_factura"),
+    )
+    
     # Relaciones
     factura = relationship("Factura", back_populates="detalles")
 
+class VentaDiaria(Base):
+    """Facturación acumulada por día, forma de pago, estado de pago y tipo.
+
+    tipo 'factura' cuenta facturas y suma su total; 'servicio' y 'repuesto'
+    cuentan unidades y suman los subtotales del detalle. La mantiene
+    resumen_ventas.py al escribir facturas.
+    """
+    __tablename__ = "ventas_diarias"
+
+    fecha = Column(Date, primary_key=True)
+    id_forma_pago = Column(Integer, primary_key=True)
+    estado_pago = Column(Enum(EstadoPago), primary_key=True)
+    tipo = Column(String(10), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    monto = Column(DECIMAL(14, 2), nullable=False, default=0)
+
 # =============================================
 # MÓDULO DE INVENTARIO
 # =============================================
@@ -409,6 +521,12 @@ class MovimientoInventario(Base):
     id_empleado = Column(Integer, ForeignKey("empleados.id_empleado"), nullable=False)
     fecha_movimiento = Column(TIMESTAMP, server_default=func.current_timestamp())
     
+    __table_args__ = (
+        Index("ix_movimientos_inventario_fecha_id", "fecha_movimiento", "id_movimiento"),
+        # Historial (kardex) de un repuesto
+        Index("ix_movimientos_inventario_repuesto_fecha", "id_repuesto", "fecha_movimiento"),
+    )
+    
     # Relaciones
     repuesto = relationship("Repuesto", back_populates="movimientos")
     tipo_movimiento = relationship("TipoMovimientoInventario", back_populates="movimientos")
@@ -446,3 +564,25 @@ class DetalleCotizacion(Base):
     subtotal = Column(Float)
 
     cotizacion = relationship("Cotizacion", back_populates="detalles")
+
+# =============================================
+# CONTROL DE ESQUEMA
+# =============================================
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    fecha_aplicacion = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+# =============================================
+# SECUENCIAS DE NUMERACIÓN
+# =============================================
+
+class SecuenciaDiaria(Base):
+    __tablename__ = "secuencias_diarias"
+
+    prefijo = Column(String(10), primary_key=True)
+    fecha = Column(Date, primary_key=True)
+    ultimo = Column(Integer, nullable=False, default=0)
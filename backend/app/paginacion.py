@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, String, and_, literal, or_
+from sqlalchemy.types import TypeDecorator
+
+# Paginación por cursor (keyset) sobre (fecha, id). El cliente recibe en la
+# cabecera X-Next-Cursor un token opaco con la fecha e id de la última fila de
+# la página y lo devuelve en ?cursor= para pedir la siguiente; la consulta
+# continúa desde ese punto con un WHERE sobre el índice en vez de recorrer y
+# descartar las filas de un OFFSET. skip sigue funcionando cuando no hay cursor.
+CABECERA_CURSOR = "X-Next-Cursor"
+
+
+class CursorInvalidoError(ValueError):
+    pass
+
+
+class FechaCursor(TypeDecorator):
+    """Fecha del cursor con el mismo formato que quedó guardada en la columna.
+
+    SQLite guarda las fechas como texto y las compara como texto: el
+    CURRENT_TIMESTAMP del servidor queda sin fracción ("2024-01-01 10:00:00")
+    y las fechas escritas por SQLAlchemy con microsegundos. Comparar contra el
+    formato con microsegundos saltaba o repetía filas del mismo segundo; se
+    envía sin fracción cuando no tiene microsegundos. En MySQL y PostgreSQL se
+    compara como fecha.
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "sqlite":
+            return value
+        return value.isoformat(" ", "microseconds" if value.microsecond else "seconds")
+
+
+def codificar_cursor(fecha: datetime, id_: int) -> str:
+    datos = json.dumps({"f": fecha.isoformat() if fecha else None, "i": id_}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    """Retorna (fecha, id) o lanza CursorInvalidoError"""
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        fecha = datetime.fromisoformat(datos["f"]) if datos["f"] else None
+        return fecha, int(datos["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorInvalidoError("Cursor de paginación inválido") from e
+
+
+def paginar(query, columna_fecha, columna_id, skip: int = 0, limit: int = 100, cursor: str = None, descendente: bool = True):
+    """Ordena por (fecha, id) y aplica el cursor, o skip si no se envió cursor.
+
+    Funciona igual con Query del ORM y con select().
+    """
+    if descendente:
+        orden = (columna_fecha.desc(), columna_id.desc())
+    else:
+        orden = (columna_fecha.asc(), columna_id.asc())
+    query = query.order_by(*orden)
+
+    if not cursor:
+        return query.offset(skip).limit(limit)
+
+    fecha, id_ = decodificar_cursor(cursor)
+    if fecha is not None:
+        fecha = literal(fecha, FechaCursor())
+    if fecha is None:
+        # Filas sin fecha: solo se compara el id entre ellas
+        condicion = and_(columna_fecha.is_(None), columna_id < id_ if descendente else columna_id > id_)
+    elif descendente:
+        # La cota simple sobre la fecha es la que permite el recorrido por rango del índice
+        condicion = and_(columna_fecha <= fecha, or_(columna_fecha < fecha, columna_id < id_))
+    else:
+        condicion = and_(columna_fecha >= fecha, or_(columna_fecha > fecha, columna_id > id_))
+    return query.filter(condicion).limit(limit)
+
+
+def siguiente_cursor(items, campo_fecha: str, campo_id: str, limit: int):
+    """Cursor de la página siguiente, o None si esta fue la última"""
+    if len(items) < limit:
+        return None
+    ultimo = items[-1]
+    return codificar_cursor(getattr(ultimo, campo_fecha), getattr(ultimo, campo_id))
+
+
+def agregar_cursor(response, items, campo_fecha: str, campo_id: str, limit: int):
+    """Publica el cursor de la página siguiente en la cabecera de la respuesta"""
+    cursor = siguiente_cursor(items, campo_fecha, campo_id, limit)
+    if cursor:
+        response.headers[CABECERA_CURSOR] = cursor
+    return items
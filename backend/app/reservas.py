@@ -0,0 +1,31 @@
+import logging
+from datetime import datetime, timedelta
+from decouple import config
+from database import SessionLocal
+from tareas import TareaPeriodica
+import crud
+
+logger = logging.getLogger(__name__)
+
+# Vigencia por defecto de una reserva y frecuencia/tamaño del barrido de vencidas
+RESERVA_TTL_MINUTES = config('RESERVA_TTL_MINUTES', default=240, cast=int)
+RESERVA_SWEEP_SECONDS = config('RESERVA_SWEEP_SECONDS', default=60, cast=float)
+RESERVA_SWEEP_BATCH = config('RESERVA_SWEEP_BATCH', default=500, cast=int)
+
+
+def fecha_expiracion(ttl_minutos: int = None) -> datetime:
+    return datetime.utcnow() + timedelta(minutes=ttl_minutos or RESERVA_TTL_MINUTES)
+
+
+def barrer_reservas_vencidas() -> int:
+    db = SessionLocal()
+    try:
+        liberadas = crud.liberar_reservas_vencidas(db, lote=RESERVA_SWEEP_BATCH)
+    finally:
+        db.close()
+    if liberadas:
+        logger.info("Reservas de stock vencidas liberadas: %s", liberadas)
+    return liberadas
+
+
+barrido_reservas = TareaPeriodica("barrido-reservas", RESERVA_SWEEP_SECONDS, barrer_reservas_vencidas)
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from typing import Optional
 from database import get_db
 from auth import (
-    authenticate_user, create_access_token, get_current_active_user,
-    create_user, change_password, reset_password, require_admin
+    authenticate_user, create_user_token, get_current_active_user,
+    create_user, change_password, reset_password, require_admin,
+    token_version_cache, create_refresh_token, rotate_refresh_token, logout_user,
+    tokens_revocados
 )
+from hashing import hashing_pool
+from ultimo_acceso import registro_ultimo_acceso
 import schemas
 import crud
 
@@ -18,9 +23,9 @@ security = HTTPBearer()
 # =============================================
 
 @router.post("/login", response_model=schemas.TokenResponse)
-def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db)):
     """Iniciar sesión y obtener token"""
-    user = authenticate_user(db, login_data.username, login_data.password)
+    user = await authenticate_user(db, login_data.username, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -28,10 +33,11 @@ def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    return await run_in_threadpool(_build_token_response, db, user)
+
+def _build_token_response(db: Session, user) -> schemas.TokenResponse:
+    access_token = create_user_token(user)
+    refresh_token = create_refresh_token(db, user)
     
     # Cargar datos completos del usuario
     user_complete = crud.get_usuario_by_username(db, user.username)
@@ -39,18 +45,48 @@ def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db)):
     return schemas.TokenResponse(
         access_token=access_token,
         token_type="bearer",
+        refresh_token=refresh_token,
         user_info=schemas.UsuarioResponse.from_orm(user_complete)
     )
 
+@router.post("/refresh", response_model=schemas.RefreshResponse)
+def refresh(refresh_data: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Renovar access token con un refresh token (no vuelve a verificar el password)"""
+    user, refresh_token = rotate_refresh_token(db, refresh_data.refresh_token)
+    return schemas.RefreshResponse(
+        access_token=create_user_token(user),
+        token_type="bearer",
+        refresh_token=refresh_token
+    )
+
 @router.post("/logout")
-def logout(current_user: schemas.UsuarioResponse = Depends(get_current_active_user)):
+def logout(
+    logout_data: Optional[schemas.LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user)
+):
     """Cerrar sesión"""
+    logout_user(db, credentials.credentials, logout_data.refresh_token if logout_data else None)
     return {"message": "Successfully logged out"}
 
 @router.get("/me", response_model=schemas.UsuarioResponse)
-def get_current_user_info(current_user: schemas.UsuarioResponse = Depends(get_current_active_user)):
+def get_current_user_info(
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user)
+):
     """Obtener información del usuario actual"""
-    return current_user
+    return crud.get_usuario_by_username(db, current_user.username)
+
+@router.get("/metricas")
+def get_metricas_auth(current_user: schemas.UsuarioSesion = Depends(require_admin)):
+    """Métricas de autenticación (Solo administrador)"""
+    return {
+        "cache_version_token": token_version_cache.stats(),
+        "hashing": hashing_pool.stats(),
+        "ultimo_acceso_pendientes": registro_ultimo_acceso.pendientes(),
+        "tokens_revocados": len(tokens_revocados)
+    }
 
 # =============================================
 # GESTIÓN DE USUARIOS (Solo Admin)
@@ -76,28 +112,28 @@ def create_new_user(
     return create_user(db, user_data)
 
 @router.put("/users/{user_id}/reset-password")
-def reset_user_password(
+async def reset_user_password(
     user_id: int,
     new_password: str,
     db: Session = Depends(get_db),
-    #current_user: schemas.UsuarioResponse = Depends(require_admin)
+    current_user: schemas.UsuarioResponse = Depends(require_admin)
 ):
     """Resetear password de usuario (Solo administrador)"""
-    return reset_password(db, user_id, new_password, current_user)
+    return await reset_password(db, user_id, new_password, current_user)
 
 # =============================================
 # CAMBIO DE PASSWORD
 # =============================================
 
 @router.put("/change-password")
-def change_user_password(
+async def change_user_password(
     old_password: str,
     new_password: str,
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Cambiar password del usuario actual"""
-    return change_password(db, current_user.id_usuario, old_password, new_password)
+    return await change_password(db, current_user.id_usuario, old_password, new_password)
 
 # =============================================
 # ROLES Y PERMISOS
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import Optional
 from database import get_db
 from auth import get_current_active_user
 import schemas
 import crud
+from paginacion import agregar_cursor
 
 router = APIRouter()
 
@@ -28,14 +29,23 @@ router = APIRouter()
 
 @router.get("/clientes", response_model=list[schemas.ClienteResponse])
 def get_clientes(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None, description="Buscar por nombre, cédula o teléfono"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior; reemplaza a skip"),
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener lista de clientes con búsqueda opcional"""
-    return crud.get_clientes(db, skip=skip, limit=limit, search=search)
+    try:
+        clientes = crud.get_clientes(db, skip=skip, limit=limit, search=search, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return agregar_cursor(response, clientes, "fecha_registro", "id_cliente", limit)
 
 @router.get("/clientes/{cliente_id}", response_model=schemas.ClienteResponse)
 def get_cliente(
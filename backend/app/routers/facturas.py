@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import Optional
-from datetime import date, datetime
-from database import get_db
+from datetime import date, datetime, timedelta
+from database import get_db, get_read_db, leer_con_respaldo
 from auth import get_current_active_user, require_admin_or_jefe
 import schemas
 import crud
+from paginacion import agregar_cursor
+from filtros import rango_fechas
 
 router = APIRouter()
 
@@ -25,29 +27,33 @@ def get_formas_pago(
 # FACTURAS
 # =============================================
 
-@router.get("/facturas", response_model=list[schemas.FacturaResponse])
+@router.get("/facturas", response_model=list[schemas.FacturaListItem])
 def get_facturas(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     fecha_inicio: Optional[date] = Query(None, description="Filtrar desde fecha"),
     fecha_fin: Optional[date] = Query(None, description="Filtrar hasta fecha"),
     estado_pago: Optional[schemas.EstadoPagoEnum] = Query(None, description="Filtrar por estado de pago"),
     cliente_id: Optional[int] = Query(None, description="Filtrar por cliente"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior; reemplaza a skip"),
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener lista de facturas con filtros"""
-    facturas = crud.get_facturas(db, skip=skip, limit=limit, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-    
-    if estado_pago:
-        facturas = [f for f in facturas if f.estado_pago == estado_pago]
-    
-    if cliente_id:
-        facturas = [f for f in facturas if f.id_cliente == cliente_id]
-    
-    return facturas
+    try:
+        facturas = crud.get_facturas(
+            db, skip=skip, limit=limit, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+            cursor=cursor, estado_pago=estado_pago, cliente_id=cliente_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return agregar_cursor(response, facturas, "fecha_factura", "id_factura", limit)
 
-@router.get("/facturas/{factura_id}", response_model=schemas.FacturaResponse)
+@router.get("/facturas/{factura_id:int}", response_model=schemas.FacturaResponse)
 def get_factura(
     factura_id: int,
     db: Session = Depends(get_db),
@@ -149,7 +155,13 @@ def update_factura(
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Actualizar factura (principalmente estado de pago)"""
-    factura = crud.update_factura(db, factura_id, factura_update)
+    try:
+        factura = crud.update_factura(db, factura_id, factura_update)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not factura:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -231,7 +243,8 @@ def generar_factura_desde_ticket(
 def get_reporte_ventas(
     fecha_inicio: date = Query(..., description="Fecha inicio del reporte"),
     fecha_fin: date = Query(..., description="Fecha fin del reporte"),
-    db: Session = Depends(get_db),
+    granularidad: Optional[schemas.GranularidadEnum] = Query(None, description="Desglose por día o por semana"),
+    db: Session = Depends(get_read_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Generar reporte de ventas por período"""
@@ -242,7 +255,7 @@ def get_reporte_ventas(
         )
     
     try:
-        return crud.get_reporte_ventas(db, fecha_inicio, fecha_fin)
+        return leer_con_respaldo(db, lambda sesion: crud.get_reporte_ventas(sesion, fecha_inicio, fecha_fin, granularidad))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -255,6 +268,8 @@ def get_estadisticas_generales(
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener estadísticas generales del sistema"""
+    # Primaria: el resultado queda en contadores_cache, que se invalida con los
+    # commits de la primaria; leído de una réplica atrasada quedaría viejo
     try:
         return crud.get_estadisticas_generales(db)
     except Exception as e:
@@ -264,74 +279,91 @@ def get_estadisticas_generales(
         )
 
 
+NOMBRES_MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+                 "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
 @router.get("/reportes/ventas-mensuales")
 def get_ventas_mensuales(
-    año: int = Query(..., description="Año para el reporte"),
-    db: Session = Depends(get_db),
+    año: int = Query(..., description="Año para el reporte (o primer año del rango)"),
+    año_fin: Optional[int] = Query(None, description="Último año del rango; por defecto igual a año"),
+    por_estado: bool = Query(False, description="Desglosar cada mes por estado de pago"),
+    db: Session = Depends(get_read_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
-    """Obtener ventas mensuales por año"""
-    ventas_mensuales = []
+    """Obtener ventas mensuales por año o rango de años"""
+    año_fin = año_fin or año
+    if año_fin < año or año_fin - año >= 20:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El rango de años debe ser creciente y de máximo 20 años"
+        )
     
-    for mes in range(1, 13):
-        fecha_inicio = date(año, mes, 1)
-        if mes == 12:
-            fecha_fin = date(año + 1, 1, 1)
-        else:
-            fecha_fin = date(año, mes + 1, 1)
-        
-        # Obtener facturas del mes
-        facturas_mes = db.query(crud.models.Factura).filter(
-            crud.func.date(crud.models.Factura.fecha_factura) >= fecha_inicio,
-            crud.func.date(crud.models.Factura.fecha_factura) < fecha_fin
-        ).all()
-        
-        total_mes = sum(f.total for f in facturas_mes)
-        cantidad_facturas = len(facturas_mes)
-        
-        ventas_mensuales.append({
-            "mes": mes,
-            "nombre_mes": ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-                          "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"][mes-1],
-            "total_ventas": float(total_mes),
-            "cantidad_facturas": cantidad_facturas
-        })
+    filas = leer_con_respaldo(
+        db, lambda sesion: crud.get_ventas_mensuales(sesion, date(año, 1, 1), date(año_fin, 12, 31), por_estado=por_estado)
+    )
     
-    return {
+    # Los meses sin facturas no vienen en la consulta y se reportan en cero
+    ventas = {
+        (a, m): {
+            "año": a,
+            "mes": m,
+            "nombre_mes": NOMBRES_MESES[m - 1],
+            "total_ventas": 0.0,
+            "cantidad_facturas": 0,
+            **({"por_estado": {e.value: {"total_ventas": 0.0, "cantidad_facturas": 0} for e in schemas.EstadoPagoEnum}} if por_estado else {})
+        }
+        for a in range(año, año_fin + 1) for m in range(1, 13)
+    }
+    for a, m, estado_pago, cantidad, total in filas:
+        mes = ventas[(a, m)]
+        mes["total_ventas"] += float(total)
+        mes["cantidad_facturas"] += cantidad
+        if estado_pago:
+            mes["por_estado"][estado_pago] = {"total_ventas": float(total), "cantidad_facturas": cantidad}
+    
+    ventas_mensuales = list(ventas.values())
+    total = sum(v["total_ventas"] for v in ventas_mensuales)
+    respuesta = {
         "año": año,
         "ventas_mensuales": ventas_mensuales,
-        "total_anual": sum(v["total_ventas"] for v in ventas_mensuales)
+        "total_anual": total
     }
+    if año_fin != año:
+        respuesta["año_fin"] = año_fin
+        respuesta["totales_anuales"] = {
+            a: sum(v["total_ventas"] for v in ventas_mensuales if v["año"] == a) for a in range(año, año_fin + 1)
+        }
+    return respuesta
 
 @router.get("/reportes/top-servicios")
 def get_top_servicios(
     limite: int = Query(10, ge=1, le=50, description="Cantidad de servicios top"),
     fecha_inicio: Optional[date] = Query(None, description="Filtrar desde fecha"),
     fecha_fin: Optional[date] = Query(None, description="Filtrar hasta fecha"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener servicios más vendidos"""
-    query = db.query(
-        crud.models.Servicio.nombre_servicio,
-        crud.func.count(crud.models.TicketServicio.id_servicio).label('cantidad_vendida'),
-        crud.func.sum(crud.models.TicketServicio.subtotal).label('total_ingresos')
-    ).join(
-        crud.models.TicketServicio, crud.models.Servicio.id_servicio == crud.models.TicketServicio.id_servicio
-    ).join(
-        crud.models.TicketAtencion, crud.models.TicketServicio.id_ticket == crud.models.TicketAtencion.id_ticket
-    )
+    def consultar(sesion):
+        query = sesion.query(
+            crud.models.Servicio.nombre_servicio,
+            crud.func.count(crud.models.TicketServicio.id_servicio).label('cantidad_vendida'),
+            crud.func.sum(crud.models.TicketServicio.subtotal).label('total_ingresos')
+        ).join(
+            crud.models.TicketServicio, crud.models.Servicio.id_servicio == crud.models.TicketServicio.id_servicio
+        ).join(
+            crud.models.TicketAtencion, crud.models.TicketServicio.id_ticket == crud.models.TicketAtencion.id_ticket
+        )
+    
+        query = query.filter(*rango_fechas(crud.models.TicketAtencion.fecha_ingreso, fecha_inicio, fecha_fin))
     
-    if fecha_inicio:
-        query = query.filter(crud.func.date(crud.models.TicketAtencion.fecha_ingreso) >= fecha_inicio)
-    if fecha_fin:
-        query = query.filter(crud.func.date(crud.models.TicketAtencion.fecha_ingreso) <= fecha_fin)
+        return query.group_by(
+            crud.models.Servicio.id_servicio
+        ).order_by(
+            crud.func.count(crud.models.TicketServicio.id_servicio).desc()
+        ).limit(limite).all()
     
-    top_servicios = query.group_by(
-        crud.models.Servicio.id_servicio
-    ).order_by(
-        crud.func.count(crud.models.TicketServicio.id_servicio).desc()
-    ).limit(limite).all()
+    top_servicios = leer_con_respaldo(db, consultar)
     
     return [
         {
@@ -347,30 +379,30 @@ def get_top_repuestos(
     limite: int = Query(10, ge=1, le=50, description="Cantidad de repuestos top"),
     fecha_inicio: Optional[date] = Query(None, description="Filtrar desde fecha"),
     fecha_fin: Optional[date] = Query(None, description="Filtrar hasta fecha"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener repuestos más vendidos"""
-    query = db.query(
-        crud.models.Repuesto.nombre_repuesto,
-        crud.func.sum(crud.models.TicketRepuesto.cantidad).label('cantidad_vendida'),
-        crud.func.sum(crud.models.TicketRepuesto.subtotal).label('total_ingresos')
-    ).join(
-        crud.models.TicketRepuesto, crud.models.Repuesto.id_repuesto == crud.models.TicketRepuesto.id_repuesto
-    ).join(
-        crud.models.TicketAtencion, crud.models.TicketRepuesto.id_ticket == crud.models.TicketAtencion.id_ticket
-    )
+    def consultar(sesion):
+        query = sesion.query(
+            crud.models.Repuesto.nombre_repuesto,
+            crud.func.sum(crud.models.TicketRepuesto.cantidad).label('cantidad_vendida'),
+            crud.func.sum(crud.models.TicketRepuesto.subtotal).label('total_ingresos')
+        ).join(
+            crud.models.TicketRepuesto, crud.models.Repuesto.id_repuesto == crud.models.TicketRepuesto.id_repuesto
+        ).join(
+            crud.models.TicketAtencion, crud.models.TicketRepuesto.id_ticket == crud.models.TicketAtencion.id_ticket
+        )
+    
+        query = query.filter(*rango_fechas(crud.models.TicketAtencion.fecha_ingreso, fecha_inicio, fecha_fin))
     
-    if fecha_inicio:
-        query = query.filter(crud.func.date(crud.models.TicketAtencion.fecha_ingreso) >= fecha_inicio)
-    if fecha_fin:
-        query = query.filter(crud.func.date(crud.models.TicketAtencion.fecha_ingreso) <= fecha_fin)
+        return query.group_by(
+            crud.models.Repuesto.id_repuesto
+        ).order_by(
+            crud.func.sum(crud.models.TicketRepuesto.cantidad).desc()
+        ).limit(limite).all()
     
-    top_repuestos = query.group_by(
-        crud.models.Repuesto.id_repuesto
-    ).order_by(
-        crud.func.sum(crud.models.TicketRepuesto.cantidad).desc()
-    ).limit(limite).all()
+    top_repuestos = leer_con_respaldo(db, consultar)
     
     return [
         {
@@ -393,19 +425,19 @@ def marcar_factura_pagada(
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Marcar factura como pagada"""
-    factura = crud.get_factura(db, factura_id)
+    try:
+        factura = crud.marcar_factura_pagada(db, factura_id, observaciones)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not factura:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Factura no encontrada"
         )
     
-    factura.estado_pago = schemas.EstadoPagoEnum.pagada
-    if observaciones:
-        factura.observaciones = (factura.observaciones or "") + f"\nPago registrado: {observaciones}"
-    
-    db.commit()
-    
     return {"message": "Factura marcada como pagada"}
 
 @router.put("/facturas/{factura_id}/anular")
@@ -416,24 +448,19 @@ def anular_factura(
     current_user: schemas.UsuarioResponse = Depends(require_admin_or_jefe)
 ):
     """Anular factura (Solo Admin/Jefe)"""
-    factura = crud.get_factura(db, factura_id)
+    try:
+        factura = crud.anular_factura(db, factura_id, motivo)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not factura:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Factura no encontrada"
         )
     
-    if factura.estado_pago == schemas.EstadoPagoEnum.pagada:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No se puede anular una factura pagada"
-        )
-    
-    factura.estado_pago = schemas.EstadoPagoEnum.anulada
-    factura.observaciones = (factura.observaciones or "") + f"\nAnulada el {datetime.now().strftime('%Y-%m-%d %H:%M')}: {motivo}"
-    
-    db.commit()
-    
     return {"message": "Factura anulada correctamente"}
 
 # =============================================
@@ -453,33 +480,10 @@ def buscar_facturas(
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Búsqueda avanzada de facturas"""
-    query = db.query(crud.models.Factura).options(
-        crud.joinedload(crud.models.Factura.cliente),
-        crud.joinedload(crud.models.Factura.forma_pago)
+    return crud.buscar_facturas(
+        db, q=q, estado_pago=estado_pago, forma_pago_id=forma_pago_id,
+        monto_min=monto_min, monto_max=monto_max, skip=skip, limit=limit
     )
-    
-    if q:
-        query = query.filter(
-            crud.or_(
-                crud.models.Factura.numero_factura.contains(q),
-                crud.models.Cliente.nombres.contains(q),
-                crud.models.Cliente.apellidos.contains(q)
-            )
-        ).join(crud.models.Cliente)
-    
-    if estado_pago:
-        query = query.filter(crud.models.Factura.estado_pago == estado_pago)
-    
-    if forma_pago_id:
-        query = query.filter(crud.models.Factura.id_forma_pago == forma_pago_id)
-    
-    if monto_min is not None:
-        query = query.filter(crud.models.Factura.total >= monto_min)
-    
-    if monto_max is not None:
-        query = query.filter(crud.models.Factura.total <= monto_max)
-    
-    return query.order_by(crud.models.Factura.fecha_factura.desc()).offset(skip).limit(limit).all()
 
 @router.get("/facturas/pendientes", response_model=list[schemas.FacturaResponse])
 def get_facturas_pendientes(
@@ -496,7 +500,7 @@ def get_facturas_pendientes(
     )
     
     if dias_vencidas is not None:
-        fecha_limite = datetime.now().date() - crud.timedelta(days=dias_vencidas)
+        fecha_limite = datetime.now().date() - timedelta(days=dias_vencidas)
         query = query.filter(
             crud.models.Factura.fecha_vencimiento <= fecha_limite
         )
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import date
-from database import get_db
+from database import get_db, get_read_db, leer_con_respaldo
 from auth import get_current_active_user, require_admin_or_jefe
 import schemas
 import crud
+from paginacion import agregar_cursor
 
 router = APIRouter()
 
@@ -87,7 +88,7 @@ def get_repuestos(
     
     return crud.get_repuestos(db, skip=skip, limit=limit, search=search, categoria_id=categoria_id)
 
-@router.get("/repuestos/{repuesto_id}", response_model=schemas.RepuestoResponse)
+@router.get("/repuestos/{repuesto_id:int}", response_model=schemas.RepuestoResponse)
 def get_repuesto(
     repuesto_id: int,
     db: Session = Depends(get_db),
@@ -167,40 +168,76 @@ def update_stock_repuesto(
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioResponse = Depends(require_admin_or_jefe)
 ):
-    """Actualizar stock de repuesto manualmente"""
-    repuesto = crud.get_repuesto(db, repuesto_id)
-    if not repuesto:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Repuesto no encontrado"
-        )
+    """Actualizar stock de repuesto manualmente.
+
+    tipo_movimiento "entrada" o "salida" suma o resta cantidad; "ajuste" fija
+    el stock en cantidad (conteo físico).
+    """
+    if stock_data.tipo_movimiento == "ajuste":
+        return _ajustar_stock_absoluto(db, repuesto_id, stock_data, current_user)
     
     # Determinar tipo de movimiento
     tipo_movimiento_id = 1 if stock_data.tipo_movimiento == "entrada" else 2
-    nueva_cantidad = repuesto.stock_actual + stock_data.cantidad if stock_data.tipo_movimiento == "entrada" else repuesto.stock_actual - stock_data.cantidad
-    
-    if nueva_cantidad < 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Stock no puede ser negativo"
-        )
+    delta = stock_data.cantidad if stock_data.tipo_movimiento == "entrada" else -stock_data.cantidad
     
     try:
-        updated_repuesto = crud.actualizar_stock_repuesto(
+        nuevo_stock = crud.ajustar_stock_repuesto(
             db, 
             repuesto_id, 
-            nueva_cantidad, 
+            delta, 
             tipo_movimiento_id, 
             current_user.id_empleado,
             stock_data.observaciones
         )
-        return {"message": "Stock actualizado correctamente", "nuevo_stock": updated_repuesto.stock_actual}
+        return {"message": "Stock actualizado correctamente", "nuevo_stock": nuevo_stock}
+    except crud.StockInsuficienteError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Stock no puede ser negativo"
+        )
+    except ValueError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Repuesto no encontrado"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error al actualizar stock: {str(e)}"
         )
 
+def _ajustar_stock_absoluto(db: Session, repuesto_id: int, stock_data: schemas.StockUpdate, current_user):
+    if stock_data.cantidad < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Stock no puede ser negativo"
+        )
+    
+    try:
+        repuesto = crud.actualizar_stock_repuesto(
+            db, repuesto_id, stock_data.cantidad, current_user.id_empleado, stock_data.observaciones
+        )
+    except crud.ConflictoVersionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if repuesto is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Repuesto no encontrado"
+        )
+    return {"message": "Stock actualizado correctamente", "nuevo_stock": repuesto.stock_actual}
+
 @router.get("/repuestos/stock-bajo", response_model=list[schemas.RepuestoResponse])
 def get_stock_bajo(
     db: Session = Depends(get_db),
@@ -215,16 +252,27 @@ def get_stock_bajo(
 
 @router.get("/movimientos-inventario", response_model=list[schemas.MovimientoInventarioResponse])
 def get_movimientos_inventario(
+    response: Response,
     repuesto_id: Optional[int] = Query(None, description="Filtrar por repuesto"),
     fecha_inicio: Optional[date] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
     fecha_fin: Optional[date] = Query(None, description="Fecha fin (YYYY-MM-DD)"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior; reemplaza a skip"),
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener historial de movimientos de inventario. Se pueden filtrar por repuesto y rango de fechas."""
-    return crud.get_movimientos_inventario(db, repuesto_id=repuesto_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, skip=skip, limit=limit)
+    try:
+        movimientos = crud.get_movimientos_inventario(
+            db, repuesto_id=repuesto_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return agregar_cursor(response, movimientos, "fecha_movimiento", "id_movimiento", limit)
 
 @router.get("/tipos-movimiento", response_model=list[schemas.TipoMovimientoInventarioResponse])
 def get_tipos_movimiento(
@@ -260,20 +308,33 @@ def create_movimiento_inventario(
 
 @router.get("/inventario/resumen")
 def get_resumen_inventario(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener resumen del inventario"""
-    total_repuestos = db.query(crud.models.Repuesto).filter(crud.models.Repuesto.activo == True).count()
-    stock_bajo = len(crud.get_repuestos_stock_bajo(db))
+    R = crud.models.Repuesto
+    
+    def consultar(sesion):
+        total_repuestos = sesion.query(R).filter(R.activo == True).count()
+        stock_bajo = sesion.query(crud.func.count(R.id_repuesto)).filter(*crud.condiciones_stock_bajo()).scalar()
+        sumas = sesion.query(
+            crud.func.sum(R.stock_actual * R.precio_compra),
+            crud.func.sum(R.stock_actual),
+            crud.func.sum(R.stock_reservado),
+            crud.func.sum(R.stock_reservado * R.precio_compra)
+        ).filter(R.activo == True).one()
+        return total_repuestos, stock_bajo, *sumas
     
-    valor_total_inventario = db.query(
-        crud.func.sum(crud.models.Repuesto.stock_actual * crud.models.Repuesto.precio_compra)
-    ).filter(crud.models.Repuesto.activo == True).scalar() or 0
+    (total_repuestos, stock_bajo, valor_total_inventario, unidades_actuales,
+     unidades_reservadas, valor_reservado) = leer_con_respaldo(db, consultar)
     
     return {
         "total_repuestos": total_repuestos,
         "repuestos_stock_bajo": stock_bajo,
-        "valor_total_inventario": float(valor_total_inventario),
+        "valor_total_inventario": float(valor_total_inventario or 0),
+        "unidades_en_stock": int(unidades_actuales or 0),
+        "unidades_reservadas": int(unidades_reservadas or 0),
+        "unidades_disponibles": int((unidades_actuales or 0) - (unidades_reservadas or 0)),
+        "valor_reservado": float(valor_reservado or 0),
         "fecha_reporte": crud.datetime.now().isoformat()
     }
\ No newline at end of file
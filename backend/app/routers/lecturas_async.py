@@ -0,0 +1,119 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date
+from database import get_async_db
+from auth import get_current_active_user_async
+import schemas
+import crud_async
+from paginacion import agregar_cursor
+
+# Versiones async def de los listados más consultados. main.py registra este
+# router antes que los síncronos solo cuando ASYNC_DB_ENABLED=True; las rutas
+# y parámetros son los mismos que en clientes, inventario, tickets y facturas.
+router = APIRouter()
+
+async def _serializar(db: AsyncSession, schema, items):
+    # run_sync permite cualquier carga diferida que no cubran las opciones de la consulta
+    return await db.run_sync(lambda _: [schema.model_validate(item) for item in items])
+
+@router.get("/clientes", response_model=list[schemas.ClienteResponse])
+async def get_clientes(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = Query(None, description="Buscar por nombre, cédula o teléfono"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior; reemplaza a skip"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user_async)
+):
+    """Obtener lista de clientes con búsqueda opcional"""
+    try:
+        clientes = await crud_async.get_clientes(db, skip=skip, limit=limit, search=search, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    agregar_cursor(response, clientes, "fecha_registro", "id_cliente", limit)
+    return await _serializar(db, schemas.ClienteResponse, clientes)
+
+@router.get("/repuestos", response_model=list[schemas.RepuestoResponse])
+async def get_repuestos(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = Query(None, description="Buscar por código o nombre"),
+    categoria_id: Optional[int] = Query(None, description="Filtrar por categoría"),
+    proveedor_id: Optional[int] = Query(None, description="Filtrar por proveedor"),
+    stock_bajo: bool = Query(False, description="Solo repuestos con stock bajo"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user_async)
+):
+    """Obtener inventario de repuestos con filtros"""
+    if stock_bajo:
+        repuestos = await crud_async.get_repuestos_stock_bajo(db)
+    else:
+        repuestos = await crud_async.get_repuestos(db, skip=skip, limit=limit, search=search, categoria_id=categoria_id)
+    return await _serializar(db, schemas.RepuestoResponse, repuestos)
+
+@router.get("/tickets", response_model=None)
+async def get_tickets(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    estado_id: Optional[int] = Query(None, description="Filtrar por estado"),
+    cliente_id: Optional[int] = Query(None, description="Filtrar por cliente"),
+    empleado_id: Optional[int] = Query(None, description="Filtrar por empleado asignado"),
+    fecha_inicio: Optional[date] = Query(None, description="Filtrar desde fecha"),
+    view: schemas.VistaListadoEnum = Query(schemas.VistaListadoEnum.full, description="summary: TicketListItem | full: TicketResponse"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior; reemplaza a skip"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user_async)
+) -> list[schemas.TicketListItem] | list[schemas.TicketResponse]:
+    """Obtener lista de tickets de atención"""
+    try:
+        if view == schemas.VistaListadoEnum.summary:
+            tickets = await crud_async.get_tickets_resumen(db, skip=skip, limit=limit, estado_id=estado_id, cliente_id=cliente_id, cursor=cursor)
+        else:
+            tickets = await crud_async.get_tickets(db, skip=skip, limit=limit, estado_id=estado_id, cliente_id=cliente_id, cursor=cursor)
+            tickets = await _serializar(db, schemas.TicketResponse, tickets)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return agregar_cursor(response, tickets, "fecha_ingreso", "id_ticket", limit)
+
+@router.get("/facturas", response_model=list[schemas.FacturaListItem])
+async def get_facturas(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    fecha_inicio: Optional[date] = Query(None, description="Filtrar desde fecha"),
+    fecha_fin: Optional[date] = Query(None, description="Filtrar hasta fecha"),
+    estado_pago: Optional[schemas.EstadoPagoEnum] = Query(None, description="Filtrar por estado de pago"),
+    cliente_id: Optional[int] = Query(None, description="Filtrar por cliente"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior; reemplaza a skip"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user_async)
+):
+    """Obtener lista de facturas con filtros"""
+    try:
+        facturas = await crud_async.get_facturas(
+            db, skip=skip, limit=limit, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+            cursor=cursor, estado_pago=estado_pago, cliente_id=cliente_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    agregar_cursor(response, facturas, "fecha_factura", "id_factura", limit)
+    return await _serializar(db, schemas.FacturaListItem, facturas)
+
+@router.get("/dashboard")
+async def get_dashboard_data(
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user_async)
+):
+    """Obtener datos para dashboard principal"""
+    return await crud_async.get_dashboard(date.today())
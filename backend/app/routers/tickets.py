@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import date, datetime
-from database import get_db
+from database import get_db, get_read_db, leer_con_respaldo
 from auth import get_current_active_user, require_admin_or_jefe
 import schemas
 import crud
+from reservas import fecha_expiracion
+from paginacion import agregar_cursor
 
 router = APIRouter()
 
@@ -50,12 +52,7 @@ def get_citas(
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener lista de citas"""
-    citas = crud.get_citas(db, skip=skip, limit=limit, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-    
-    if estado:
-        citas = [cita for cita in citas if cita.estado_cita == estado]
-    
-    return citas
+    return crud.get_citas(db, skip=skip, limit=limit, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, estado=estado)
 
 @router.get("/citas/{cita_id}", response_model=schemas.CitaResponse)
 def get_cita(
@@ -150,21 +147,46 @@ def get_estados_ticket(
 # TICKETS DE ATENCIÓN
 # =============================================
 
-@router.get("/tickets", response_model=list[schemas.TicketResponse])
+@router.get(
+    "/tickets",
+    response_model=None,
+    responses={200: {
+        "model": list[schemas.TicketListItem] | list[schemas.TicketResponse],
+        "description": "view=summary: lista de TicketListItem; view=full: lista de TicketResponse"
+    }}
+)
 def get_tickets(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     estado_id: Optional[int] = Query(None, description="Filtrar por estado"),
     cliente_id: Optional[int] = Query(None, description="Filtrar por cliente"),
     empleado_id: Optional[int] = Query(None, description="Filtrar por empleado asignado"),
     fecha_inicio: Optional[date] = Query(None, description="Filtrar desde fecha"),
+    view: schemas.VistaListadoEnum = Query(schemas.VistaListadoEnum.full, description="summary: TicketListItem | full: TicketResponse"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior; reemplaza a skip"),
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
-):
+) -> list[schemas.TicketListItem] | list[schemas.TicketResponse]:
     """Obtener lista de tickets de atención"""
-    return crud.get_tickets(db, skip=skip, limit=limit, estado_id=estado_id, cliente_id=cliente_id)
+    # Se valida aquí y no con response_model: una unión de listas validaría los
+    # tickets completos como TicketListItem.
+    try:
+        if view == schemas.VistaListadoEnum.summary:
+            tickets = crud.get_tickets_resumen(db, skip=skip, limit=limit, estado_id=estado_id, cliente_id=cliente_id, cursor=cursor)
+        else:
+            tickets = [
+                schemas.TicketResponse.model_validate(ticket)
+                for ticket in crud.get_tickets(db, skip=skip, limit=limit, estado_id=estado_id, cliente_id=cliente_id, cursor=cursor)
+            ]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return agregar_cursor(response, tickets, "fecha_ingreso", "id_ticket", limit)
 
-@router.get("/tickets/{ticket_id}", response_model=schemas.TicketResponse)
+@router.get("/tickets/{ticket_id:int}", response_model=schemas.TicketResponse)
 def get_ticket(
     ticket_id: int,
     db: Session = Depends(get_db),
@@ -241,6 +263,12 @@ def update_ticket_estado(
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Cambiar estado del ticket"""
+    # Bloquear el ticket para que no se aparte stock mientras cambia de estado
+    if crud.bloquear_ticket(db, ticket_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ticket no encontrado"
+        )
     ticket = crud.get_ticket(db, ticket_id)
     if not ticket:
         raise HTTPException(
@@ -267,6 +295,10 @@ def update_ticket_estado(
     if estado.nombre_estado.lower() == "entregado":
         ticket.fecha_entrega_real = datetime.now()
     
+    # Un ticket entregado o cerrado ya no va a consumir sus reservas
+    if nuevo_estado_id not in crud.ESTADOS_TICKET_ABIERTO:
+        crud.liberar_reservas_ticket(db, ticket_id)
+    
     db.commit()
     
     return {"message": f"Estado cambiado a: {estado.nombre_estado}"}
@@ -284,8 +316,7 @@ def add_servicio_to_ticket(
 ):
     """Agregar servicio a un ticket"""
     # Verificar que el ticket existe
-    ticket = crud.get_ticket(db, ticket_id)
-    if not ticket:
+    if not crud.ticket_existe(db, ticket_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ticket no encontrado"
@@ -336,8 +367,7 @@ def add_repuesto_to_ticket(
 ):
     """Agregar repuesto a un ticket"""
     # Verificar que el ticket existe
-    ticket = crud.get_ticket(db, ticket_id)
-    if not ticket:
+    if not crud.ticket_existe(db, ticket_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ticket no encontrado"
@@ -380,6 +410,101 @@ def get_repuestos_ticket(
     
     return ticket.repuestos
 
+# =============================================
+# RESERVAS DE STOCK
+# =============================================
+
+@router.post("/tickets/{ticket_id}/reservas", response_model=schemas.ReservaStockResponse, status_code=status.HTTP_201_CREATED)
+def reservar_repuesto(
+    ticket_id: int,
+    reserva_data: schemas.ReservaStockCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user)
+):
+    """Apartar stock de un repuesto para un ticket abierto"""
+    if not crud.ticket_existe(db, ticket_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ticket no encontrado"
+        )
+    
+    try:
+        return crud.reservar_stock(
+            db, ticket_id, reserva_data.id_repuesto, reserva_data.cantidad,
+            fecha_expiracion(reserva_data.ttl_minutos), current_user.id_empleado
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/tickets/{ticket_id}/reservas", response_model=list[schemas.ReservaStockResponse])
+def get_reservas_ticket(
+    ticket_id: int,
+    solo_activas: bool = Query(True, description="Solo reservas vigentes"),
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user)
+):
+    """Obtener reservas de stock de un ticket"""
+    return crud.get_reservas_ticket(db, ticket_id, solo_activas)
+
+@router.delete("/tickets/{ticket_id}/reservas/{reserva_id}", response_model=schemas.ReservaStockResponse)
+def liberar_reserva(
+    ticket_id: int,
+    reserva_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user)
+):
+    """Liberar una reserva de stock"""
+    reserva = crud.liberar_reserva(db, ticket_id, reserva_id)
+    if not reserva:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reserva activa no encontrada"
+        )
+    return reserva
+
+# =============================================
+# LÍNEAS EN LOTE
+# =============================================
+
+@router.post("/tickets/{ticket_id}/lineas", response_model=schemas.TicketLineasResponse, status_code=status.HTTP_201_CREATED)
+def add_lineas_to_ticket(
+    ticket_id: int,
+    lineas: schemas.TicketLineasCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioSesion = Depends(get_current_active_user)
+):
+    """Agregar servicios y repuestos a un ticket en una sola operación"""
+    if not lineas.servicios and not lineas.repuestos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe incluir al menos un servicio o repuesto"
+        )
+
+    # Los movimientos de inventario de los repuestos exigen un empleado
+    if lineas.repuestos and current_user.id_empleado is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="El usuario no tiene un empleado asociado para registrar movimientos de inventario"
+        )
+
+    if not crud.ticket_existe(db, ticket_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ticket no encontrado"
+        )
+
+    try:
+        return crud.add_lineas_to_ticket(db, ticket_id, lineas, current_user.id_empleado)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 # =============================================
 # REPORTES Y ESTADÍSTICAS
 # =============================================
@@ -388,38 +513,17 @@ def get_repuestos_ticket(
 def get_estadisticas_tickets(
     fecha_inicio: Optional[date] = Query(None, description="Filtrar desde fecha"),
     fecha_fin: Optional[date] = Query(None, description="Filtrar hasta fecha"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
-    """Obtener estadísticas de tickets"""
-    query = db.query(crud.models.TicketAtencion)
-    
-    if fecha_inicio:
-        query = query.filter(crud.func.date(crud.models.TicketAtencion.fecha_ingreso) >= fecha_inicio)
-    if fecha_fin:
-        query = query.filter(crud.func.date(crud.models.TicketAtencion.fecha_ingreso) <= fecha_fin)
-    
-    tickets = query.all()
-    
-    # Estadísticas por estado
-    estados_count = {}
-    for ticket in tickets:
-        estado_nombre = ticket.estado.nombre_estado
-        estados_count[estado_nombre] = estados_count.get(estado_nombre, 0) + 1
-    
-    # Tiempo promedio de resolución
-    tickets_completados = [t for t in tickets if t.fecha_entrega_real and t.fecha_ingreso]
-    tiempo_promedio = None
-    
-    if tickets_completados:
-        tiempos = [(t.fecha_entrega_real - t.fecha_ingreso).total_seconds() / 3600 for t in tickets_completados]
-        tiempo_promedio = sum(tiempos) / len(tiempos)
-    
+    """Obtener estadísticas de tickets.
+
+    tiempo_p50_horas y tiempo_p90_horas son aproximados: salen de un
+    histograma por hora entera, interpolando dentro de la hora y sin salir
+    de los tiempos observados en ella.
+    """
     return {
-        "total_tickets": len(tickets),
-        "tickets_por_estado": estados_count,
-        "tiempo_promedio_horas": tiempo_promedio,
-        "tickets_completados": len(tickets_completados),
+        **leer_con_respaldo(db, lambda sesion: crud.get_estadisticas_tickets(sesion, fecha_inicio, fecha_fin)),
         "fecha_reporte": datetime.now().isoformat()
     }
 
@@ -429,28 +533,4 @@ def get_dashboard_data(
     current_user: schemas.UsuarioResponse = Depends(get_current_active_user)
 ):
     """Obtener datos para dashboard principal"""
-    today = date.today()
-    
-    # Citas de hoy
-    citas_hoy = len(crud.get_citas_by_fecha(db, today))
-    
-    # Tickets activos (no completados)
-    tickets_activos = db.query(crud.models.TicketAtencion).filter(
-        crud.models.TicketAtencion.id_estado.in_([1, 2, 3, 4])  # Estados activos
-    ).count()
-    
-    # Tickets de hoy
-    tickets_hoy = db.query(crud.models.TicketAtencion).filter(
-        crud.func.date(crud.models.TicketAtencion.fecha_ingreso) == today
-    ).count()
-    
-    # Stock bajo
-    stock_bajo = len(crud.get_repuestos_stock_bajo(db))
-    
-    return {
-        "citas_hoy": citas_hoy,
-        "tickets_activos": tickets_activos,
-        "tickets_hoy": tickets_hoy,
-        "repuestos_stock_bajo": stock_bajo,
-        "fecha": today.isoformat()
-    }
\ No newline at end of file
+    return crud.get_dashboard(db, date.today())
\ No newline at end of file
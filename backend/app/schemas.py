@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional, List
 from datetime import datetime, date
 from decimal import Decimal
@@ -114,6 +114,14 @@ class UsuarioResponse(UsuarioBase):
     class Config:
         from_attributes = True
 
+class UsuarioSesion(BaseModel):
+    """Datos mínimos del usuario autenticado, tomados de los claims del token"""
+    id_usuario: int
+    username: str
+    id_empleado: Optional[int] = None
+    nombre_rol: Optional[str] = None
+    activo: bool = True
+
 class LoginRequest(BaseModel):
     username: str
     password: str
@@ -121,8 +129,20 @@ class LoginRequest(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
     user_info: UsuarioResponse
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+class RefreshResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    refresh_token: str
+
 # =============================================
 # CLIENTES Y VEHÍCULOS
 # =============================================
@@ -279,6 +299,8 @@ class RepuestoResponse(RepuestoBase):
     id_repuesto: int
     id_categoria_repuesto: Optional[int] = None
     id_proveedor: Optional[int] = None
+    stock_reservado: int = 0
+    stock_disponible: int = 0
     fecha_creacion: datetime
     categoria: Optional[CategoriaRepuestoResponse] = None
     proveedor: Optional[ProveedorResponse] = None
@@ -291,6 +313,23 @@ class StockUpdate(BaseModel):
     tipo_movimiento: str
     observaciones: Optional[str] = None
 
+class ReservaStockCreate(BaseModel):
+    id_repuesto: int
+    cantidad: int = Field(gt=0)
+    ttl_minutos: Optional[int] = Field(default=None, ge=1)
+
+class ReservaStockResponse(BaseModel):
+    id_reserva: int
+    id_repuesto: int
+    id_ticket: int
+    cantidad: int
+    activa: bool
+    fecha_expiracion: datetime
+    fecha_creacion: datetime
+    
+    class Config:
+        from_attributes = True
+
 # =============================================
 # CITAS Y TICKETS
 # =============================================
@@ -362,7 +401,7 @@ class TicketUpdate(BaseModel):
     id_estado: Optional[int] = None
 
 class TicketServicioBase(BaseModel):
-    cantidad: int = 1
+    cantidad: int = Field(default=1, gt=0)
     observaciones: Optional[str] = None
 
 class TicketServicioCreate(TicketServicioBase):
@@ -382,7 +421,7 @@ class TicketServicioResponse(TicketServicioBase):
         from_attributes = True
 
 class TicketRepuestoBase(BaseModel):
-    cantidad: int
+    cantidad: int = Field(gt=0)
 
 class TicketRepuestoCreate(TicketRepuestoBase):
     id_repuesto: int
@@ -400,6 +439,41 @@ class TicketRepuestoResponse(TicketRepuestoBase):
     class Config:
         from_attributes = True
 
+class TicketLineasCreate(BaseModel):
+    servicios: List[TicketServicioCreate] = []
+    repuestos: List[TicketRepuestoCreate] = []
+
+class TicketLineasResponse(BaseModel):
+    id_ticket: int
+    servicios_agregados: int
+    repuestos_agregados: int
+    total_servicios: Decimal
+    total_repuestos: Decimal
+    total_general: Decimal
+
+class TicketListItem(BaseModel):
+    id_ticket: int
+    numero_ticket: str
+    fecha_ingreso: datetime
+    fecha_estimada_entrega: Optional[datetime] = None
+    id_estado: int
+    nombre_estado: Optional[str] = None
+    id_cliente: int
+    cliente_nombres: Optional[str] = None
+    cliente_apellidos: Optional[str] = None
+    id_vehiculo: int
+    placa: Optional[str] = None
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    id_empleado_asignado: Optional[int] = None
+    empleado_nombres: Optional[str] = None
+    empleado_apellidos: Optional[str] = None
+    total_general: Decimal
+
+class VistaListadoEnum(str, enum.Enum):
+    summary = "summary"
+    full = "full"
+
 class TicketResponse(TicketBase):
     id_ticket: int
     numero_ticket: str
@@ -499,6 +573,20 @@ class FacturaResponse(FacturaBase):
     class Config:
         from_attributes = True
 
+class TicketFacturaResumen(BaseModel):
+    id_ticket: int
+    numero_ticket: str
+    id_estado: int
+    total_general: Decimal
+    estado: Optional[EstadoTicketResponse] = None
+    
+    class Config:
+        from_attributes = True
+
+class FacturaListItem(FacturaResponse):
+    """Fila de GET /facturas: el ticket completo se consulta en /facturas/{id}"""
+    ticket: Optional[TicketFacturaResumen] = None
+
 # =============================================
 # INVENTARIO Y MOVIMIENTOS
 # =============================================
@@ -544,6 +632,19 @@ class MovimientoInventarioResponse(MovimientoInventarioBase):
 # REPORTES Y ESTADÍSTICAS
 # =============================================
 
+class GranularidadEnum(str, enum.Enum):
+    dia = "dia"
+    semana = "semana"
+
+class ReporteVentasPeriodo(BaseModel):
+    periodo: date  # Día, o lunes de la semana
+    total_facturas: int
+    total_ventas: Decimal
+    total_servicios: Decimal
+    total_repuestos: Decimal
+    facturas_pendientes: int
+    facturas_pagadas: int
+
 class ReporteVentas(BaseModel):
     fecha_inicio: date
     fecha_fin: date
@@ -553,6 +654,8 @@ class ReporteVentas(BaseModel):
     total_repuestos: Decimal
     facturas_pendientes: int
     facturas_pagadas: int
+    granularidad: Optional[GranularidadEnum] = None
+    periodos: Optional[List[ReporteVentasPeriodo]] = None
 
 class EstadisticasGenerales(BaseModel):
     total_clientes: int
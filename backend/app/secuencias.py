@@ -0,0 +1,83 @@
+import threading
+from datetime import date
+from decouple import config
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from database import engine
+import models
+
+# Tamaño del bloque de números que cada proceso reserva por viaje a la base de
+# datos. Los números de un bloque que no se lleguen a usar (reinicio del
+# worker, cambio de día) quedan como huecos en la numeración.
+SECUENCIA_BLOQUE_TICKETS = config('SECUENCIA_BLOQUE_TICKETS', default=20, cast=int)
+SECUENCIA_BLOQUE_FACTURAS = config('SECUENCIA_BLOQUE_FACTURAS', default=1, cast=int)
+
+
+class AsignadorSecuencia:
+    """Números diarios PREFIJOyyyymmdd-NNN sin colisiones entre procesos.
+
+    El contador vive en secuencias_diarias y se incrementa con un UPDATE
+    atómico en su propia transacción; dentro del proceso se reparten los
+    números del bloque reservado sin volver a la base de datos.
+    """
+
+    def __init__(self, prefijo: str, ancho: int, tamano_bloque: int, columna):
+        self.prefijo = prefijo
+        self.ancho = ancho
+        self.tamano_bloque = max(1, tamano_bloque)
+        self.columna = columna
+        self._lock = threading.Lock()
+        self._fecha = None
+        self._siguiente = 0
+        self._fin = 0
+        self.reservas = 0
+
+    def _semilla(self, conn, fecha: date) -> int:
+        """Último número ya usado ese día (tablas con datos previos al contador)"""
+        patron = f"{self.prefijo}{fecha.strftime('%Y%m%d')}-%"
+        ultimo = conn.execute(
+            select(self.columna).where(self.columna.like(patron))
+            .order_by(func.length(self.columna).desc(), self.columna.desc()).limit(1)
+        ).scalar()
+        return int(ultimo.rsplit("-", 1)[1]) if ultimo else 0
+
+    def _reservar_bloque(self, fecha: date) -> int:
+        """Incrementar el contador del día y retornar el último número reservado"""
+        t = models.SecuenciaDiaria
+        condicion = (t.prefijo == self.prefijo) & (t.fecha == fecha)
+        for _ in range(3):
+            try:
+                with engine.begin() as conn:
+                    actualizadas = conn.execute(
+                        update(t).where(condicion).values(ultimo=t.ultimo + self.tamano_bloque)
+                    ).rowcount
+                    if not actualizadas:
+                        conn.execute(insert(t).values(
+                            prefijo=self.prefijo, fecha=fecha,
+                            ultimo=self._semilla(conn, fecha) + self.tamano_bloque
+                        ))
+                    return conn.execute(select(t.ultimo).where(condicion)).scalar_one()
+            except IntegrityError:
+                # Otro proceso creó la fila del día al mismo tiempo; reintentar el UPDATE
+                continue
+        raise RuntimeError(f"No se pudo reservar la secuencia {self.prefijo} del {fecha}")
+
+    def siguiente(self, fecha: date = None) -> int:
+        fecha = fecha or date.today()
+        with self._lock:
+            if fecha != self._fecha or self._siguiente > self._fin:
+                self._fin = self._reservar_bloque(fecha)
+                self._siguiente = self._fin - self.tamano_bloque + 1
+                self._fecha = fecha
+                self.reservas += 1
+            numero = self._siguiente
+            self._siguiente += 1
+        return numero
+
+    def siguiente_numero(self, fecha: date = None) -> str:
+        fecha = fecha or date.today()
+        return f"{self.prefijo}{fecha.strftime('%Y%m%d')}-{str(self.siguiente(fecha)).zfill(self.ancho)}"
+
+
+secuencia_tickets = AsignadorSecuencia("TK", 3, SECUENCIA_BLOQUE_TICKETS, models.TicketAtencion.numero_ticket)
+secuencia_facturas = AsignadorSecuencia("FC", 4, SECUENCIA_BLOQUE_FACTURAS, models.Factura.numero_factura)
@@ -0,0 +1,35 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TareaPeriodica:
+    """Ejecuta una función cada cierto intervalo en un hilo de fondo"""
+
+    def __init__(self, nombre: str, intervalo: float, funcion):
+        self.nombre = nombre
+        self.intervalo = intervalo
+        self.funcion = funcion
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def _loop(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.funcion()
+            except Exception:
+                logger.exception("Error en tarea periódica %s", self.nombre)
+
+    def iniciar(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._loop, name=self.nombre, daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
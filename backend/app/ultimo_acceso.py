@@ -0,0 +1,68 @@
+import threading
+from datetime import datetime
+from sqlalchemy import update
+from decouple import config
+from database import SessionLocal
+from models import Usuario
+from tareas import TareaPeriodica
+
+
+class RegistroUltimoAcceso:
+    """Acumula en memoria el último acceso de cada usuario y lo escribe en lote.
+
+    Varios logins del mismo usuario entre dos escrituras se combinan en uno, y
+    todos los pendientes se guardan con un solo UPDATE por lote.
+    """
+
+    def __init__(self, intervalo: float):
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._tarea = TareaPeriodica("ultimo-acceso", intervalo, self.flush)
+        self.escrituras = 0
+
+    def registrar(self, id_usuario: int, fecha: datetime = None):
+        with self._lock:
+            self._pendientes[id_usuario] = fecha or datetime.utcnow()
+
+    def pendientes(self) -> int:
+        with self._lock:
+            return len(self._pendientes)
+
+    def flush(self) -> int:
+        """Escribir los accesos acumulados; retorna cuántos usuarios se actualizaron"""
+        with self._lock:
+            lote, self._pendientes = self._pendientes, {}
+        if not lote:
+            return 0
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Usuario),
+                [{"id_usuario": id_usuario, "ultimo_acceso": fecha} for id_usuario, fecha in lote.items()]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Devolver el lote sin pisar accesos más recientes
+            with self._lock:
+                for id_usuario, fecha in lote.items():
+                    self._pendientes.setdefault(id_usuario, fecha)
+            raise
+        finally:
+            db.close()
+
+        self.escrituras += 1
+        return len(lote)
+
+    def iniciar(self):
+        self._tarea.iniciar()
+
+    def detener(self):
+        self._tarea.detener()
+        self.flush()
+
+
+registro_ultimo_acceso = RegistroUltimoAcceso(
+    intervalo=config('ULTIMO_ACCESO_FLUSH_SECONDS', default=10, cast=float)
+)
@@ -0,0 +1,80 @@
+# benchmark_dashboard.py
+# Lanza peticiones concurrentes a crud.get_dashboard y
+# crud.get_estadisticas_generales con la cache de contadores vacía y luego
+# caliente. Con la cache vacía las peticiones simultáneas deben ejecutar una
+# sola sentencia (single-flight); con la cache caliente, ninguna. Además el
+# valor servido desde la cache debe ser igual al recién calculado.
+# Uso: python benchmark_dashboard.py [hilos]
+import os
+import sys
+import time
+import threading
+from datetime import date
+from sqlalchemy import event
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal, engine
+from contadores import contadores_cache
+import crud
+
+
+def concurrentes(funcion, hilos: int):
+    """Ejecutar funcion(db) en varios hilos a la vez; retorna (ms, sentencias)"""
+    sentencias = [0]
+    lock = threading.Lock()
+
+    def contar(*_):
+        with lock:
+            sentencias[0] += 1
+
+    def trabajo():
+        db = SessionLocal()
+        try:
+            barrera.wait()
+            funcion(db)
+        finally:
+            db.close()
+
+    barrera = threading.Barrier(hilos)
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        trabajadores = [threading.Thread(target=trabajo) for _ in range(hilos)]
+        inicio = time.perf_counter()
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+        return (time.perf_counter() - inicio) * 1000, sentencias[0]
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+
+def ejecutar(hilos: int = 20):
+    hoy = date.today()
+    resultado = 0
+    for nombre, funcion in (
+        ("dashboard", lambda db: crud.get_dashboard(db, hoy)),
+        ("estadisticas generales", crud.get_estadisticas_generales),
+    ):
+        contadores_cache.clear()
+        for estado in ("vacía", "caliente"):
+            ms, sentencias = concurrentes(funcion, hilos)
+            print(f"{nombre:>22} | cache {estado:8} | {hilos} peticiones | {sentencias} sentencias | {ms:8.1f} ms")
+            if sentencias > (1 if estado == "vacía" else 0):
+                resultado = 1
+        db = SessionLocal()
+        try:
+            cacheado = funcion(db)
+            contadores_cache.clear()
+            iguales = funcion(db) == cacheado
+        finally:
+            db.close()
+        print(f"{nombre:>22} | mismo valor que sin cache: {iguales}")
+        if not iguales:
+            resultado = 1
+    print(contadores_cache.stats())
+    return resultado
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar(*[int(a) for a in sys.argv[1:2]]))
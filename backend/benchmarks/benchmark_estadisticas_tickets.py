@@ -0,0 +1,98 @@
+# benchmark_estadisticas_tickets.py
+# Mide crud.get_estadisticas_tickets (una consulta agrupada) para distintos
+# rangos de fecha de ingreso, y el historial completo. Con "comparar" calcula
+# también las estadísticas cargando los tickets (método anterior) y verifica
+# conteos, promedio y percentiles (del mismo histograma por hora). Siempre
+# verifica que un rango más amplio no cuente menos tickets, que los mecánicos
+# no sumen más que el total y que p50 <= p90; con "comparar", además, que p90
+# no supere el mayor tiempo de entrega.
+# Para datos de prueba ver "sembrar" en benchmark_planes_listados.py.
+# Uso: python benchmark_estadisticas_tickets.py [comparar]
+import os
+import sys
+import time
+from datetime import date, timedelta
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal
+from filtros import rango_fechas
+import crud
+import models
+
+RANGOS_DIAS = [7, 30, 365, None]
+
+
+def cargando_tickets(db, fecha_inicio: date, fecha_fin: date):
+    tickets = db.query(models.TicketAtencion).filter(
+        *rango_fechas(models.TicketAtencion.fecha_ingreso, fecha_inicio, fecha_fin)
+    ).all()
+    por_estado = {}
+    for ticket in tickets:
+        por_estado[ticket.estado.nombre_estado] = por_estado.get(ticket.estado.nombre_estado, 0) + 1
+    tiempos = [
+        (t.fecha_entrega_real - t.fecha_ingreso).total_seconds() / 3600
+        for t in tickets if t.fecha_entrega_real and t.fecha_ingreso
+    ]
+    if not tiempos:
+        return por_estado, None, None, None, None
+    histograma = {}
+    for horas in tiempos:
+        crud._acumular_hora(histograma, int(horas), 1, horas, horas)
+    return (por_estado, sum(tiempos) / len(tiempos), crud._percentil(histograma, 0.5),
+            crud._percentil(histograma, 0.9), max(tiempos))
+
+
+def coinciden(anterior, actual) -> bool:
+    por_estado, promedio, p50, p90, maximo = anterior
+    if por_estado != actual["tickets_por_estado"] or promedio is None:
+        return por_estado == actual["tickets_por_estado"] and actual["tiempo_promedio_horas"] is None
+    return actual["tiempo_p90_horas"] <= maximo + 0.01 and all(abs(a - b) < 0.01 for a, b in (
+        (promedio, actual["tiempo_promedio_horas"]), (p50, actual["tiempo_p50_horas"]), (p90, actual["tiempo_p90_horas"])
+    ))
+
+
+def consistentes(estadisticas, total_anterior: int) -> bool:
+    """total_anterior: tickets del rango más corto ya medido"""
+    p50, p90 = estadisticas["tiempo_p50_horas"], estadisticas["tiempo_p90_horas"]
+    return (
+        estadisticas["total_tickets"] >= total_anterior
+        and sum(m["total_tickets"] for m in estadisticas["por_mecanico"]) <= estadisticas["total_tickets"]
+        and (p50 is None or p50 <= p90)
+    )
+
+
+def ejecutar(comparar: bool = False):
+    hoy = date.today()
+    resultado = 0
+    total_anterior = 0
+    db = SessionLocal()
+    try:
+        for dias in RANGOS_DIAS:
+            desde = hoy - timedelta(days=dias - 1) if dias else None
+            hasta = hoy if dias else None
+            inicio = time.perf_counter()
+            estadisticas = crud.get_estadisticas_tickets(db, desde, hasta)
+            ms = (time.perf_counter() - inicio) * 1000
+            nombre = f"{dias} días" if dias else "todo"
+            print(f"{nombre:>9} | {estadisticas['total_tickets']:8d} tickets | "
+                  f"{len(estadisticas['por_mecanico'])} mecánicos | {ms:8.1f} ms")
+            if not consistentes(estadisticas, total_anterior):
+                print(f"{nombre:>9} | estadísticas inconsistentes")
+                resultado = 1
+            total_anterior = estadisticas["total_tickets"]
+            if comparar:
+                inicio = time.perf_counter()
+                anterior = cargando_tickets(db, desde, hasta)
+                ms = (time.perf_counter() - inicio) * 1000
+                iguales = coinciden(anterior, estadisticas)
+                print(f"{nombre:>9} | anterior | {ms:8.1f} ms | mismos resultados: {iguales}")
+                db.expunge_all()
+                if not iguales:
+                    resultado = 1
+    finally:
+        db.close()
+    return resultado
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar(comparar="comparar" in sys.argv[1:]))
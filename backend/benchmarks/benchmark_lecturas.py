@@ -0,0 +1,72 @@
+# benchmark_lecturas.py
+# Carga concurrente sobre los listados de lectura para comparar el servidor
+# con ASYNC_DB_ENABLED=False y ASYNC_DB_ENABLED=True. Termina con código 1 si
+# alguna petición falla o no responde 200.
+# Uso: python benchmark_lecturas.py <base_url> <usuario> <password> [concurrencias] [peticiones]
+#   ej: python benchmark_lecturas.py http://localhost:8000 admin secreto 50,200,1000 5000
+import asyncio
+import sys
+import time
+import httpx
+
+RUTAS = ["/api/v1/tickets", "/api/v1/facturas", "/api/v1/repuestos", "/api/v1/clientes", "/api/v1/dashboard"]
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+async def obtener_token(cliente: httpx.AsyncClient, usuario: str, password: str) -> str:
+    respuesta = await cliente.post("/api/v1/auth/login", json={"username": usuario, "password": password})
+    respuesta.raise_for_status()
+    return respuesta.json()["access_token"]
+
+
+async def ejecutar(cliente: httpx.AsyncClient, concurrencia: int, peticiones: int, headers: dict):
+    """Retorna (peticiones/s, p50 ms, p99 ms, errores) para una concurrencia"""
+    latencias = []
+    errores = 0
+    pendientes = iter(range(peticiones))
+
+    async def trabajador():
+        nonlocal errores
+        for i in pendientes:
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.get(RUTAS[i % len(RUTAS)], headers=headers)
+                if respuesta.status_code != 200:
+                    errores += 1
+            except httpx.HTTPError:
+                errores += 1
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    total = time.perf_counter() - inicio
+    return peticiones / total, percentil(latencias, 50), percentil(latencias, 99), errores
+
+
+async def main(base_url: str, usuario: str, password: str, concurrencias: list, peticiones: int) -> int:
+    limites = httpx.Limits(max_connections=max(concurrencias), max_keepalive_connections=max(concurrencias))
+    async with httpx.AsyncClient(base_url=base_url, limits=limites, timeout=60) as cliente:
+        headers = {"Authorization": f"Bearer {await obtener_token(cliente, usuario, password)}"}
+
+        print(f"{'conc':>6} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errores':>8}")
+        total_errores = 0
+        for concurrencia in concurrencias:
+            rps, p50, p99, errores = await ejecutar(cliente, concurrencia, peticiones, headers)
+            print(f"{concurrencia:>6} {rps:>10.1f} {p50:>10.1f} {p99:>10.1f} {errores:>8}")
+            total_errores += errores
+    return 0 if total_errores == 0 else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Uso: python benchmark_lecturas.py <base_url> <usuario> <password> [concurrencias] [peticiones]")
+        sys.exit(1)
+    concurrencias = [int(c) for c in (sys.argv[4] if len(sys.argv) > 4 else "50,200,1000").split(",")]
+    peticiones = int(sys.argv[5]) if len(sys.argv) > 5 else 2000
+    sys.exit(asyncio.run(main(sys.argv[1], sys.argv[2], sys.argv[3], concurrencias, peticiones)))
@@ -0,0 +1,75 @@
+# benchmark_lineas.py
+# Compara agregar N líneas a un ticket una por una (POST /servicios y /repuestos)
+# contra una sola llamada a POST /tickets/{id}/lineas. Usar contra una base de
+# pruebas: crea tickets y descuenta stock del repuesto indicado. Termina con
+# código 1 si los dos métodos no dejan el mismo total en el ticket.
+# Uso: python benchmark_lineas.py <base_url> <usuario> <password> <id_cliente> <id_vehiculo> <id_servicio> <id_repuesto> [lineas] [repeticiones]
+import sys
+import time
+import httpx
+
+
+def crear_ticket(cliente: httpx.Client, id_cliente: int, id_vehiculo: int) -> int:
+    respuesta = cliente.post("/api/v1/tickets", json={
+        "descripcion_problema": "Benchmark de líneas",
+        "id_cliente": id_cliente,
+        "id_vehiculo": id_vehiculo
+    })
+    respuesta.raise_for_status()
+    return respuesta.json()["id_ticket"]
+
+
+def lineas(n: int, id_servicio: int, id_repuesto: int):
+    """Mitad servicios, mitad repuestos"""
+    servicios = [{"id_servicio": id_servicio, "cantidad": 1, "precio_unitario": "10.00"} for _ in range(n - n // 2)]
+    repuestos = [{"id_repuesto": id_repuesto, "cantidad": 1, "precio_unitario": "5.00"} for _ in range(n // 2)]
+    return servicios, repuestos
+
+
+def por_linea(cliente: httpx.Client, ticket_id: int, servicios: list, repuestos: list):
+    for servicio in servicios:
+        cliente.post(f"/api/v1/tickets/{ticket_id}/servicios", json=servicio).raise_for_status()
+    for repuesto in repuestos:
+        cliente.post(f"/api/v1/tickets/{ticket_id}/repuestos", json=repuesto).raise_for_status()
+
+
+def en_lote(cliente: httpx.Client, ticket_id: int, servicios: list, repuestos: list):
+    cliente.post(f"/api/v1/tickets/{ticket_id}/lineas", json={
+        "servicios": servicios, "repuestos": repuestos
+    }).raise_for_status()
+
+
+def total_ticket(cliente: httpx.Client, ticket_id: int) -> str:
+    respuesta = cliente.get(f"/api/v1/tickets/{ticket_id}")
+    respuesta.raise_for_status()
+    return respuesta.json()["total_general"]
+
+
+def ejecutar(base_url, usuario, password, id_cliente, id_vehiculo, id_servicio, id_repuesto, n=50, repeticiones=5):
+    with httpx.Client(base_url=base_url, timeout=60) as cliente:
+        login = cliente.post("/api/v1/auth/login", json={"username": usuario, "password": password})
+        login.raise_for_status()
+        cliente.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+        servicios, repuestos = lineas(n, id_servicio, id_repuesto)
+        print(f"{n} líneas por ticket, {repeticiones} repeticiones")
+        totales = set()
+        for nombre, funcion in (("por línea", por_linea), ("en lote", en_lote)):
+            tiempos = []
+            for _ in range(repeticiones):
+                ticket_id = crear_ticket(cliente, id_cliente, id_vehiculo)
+                inicio = time.perf_counter()
+                funcion(cliente, ticket_id, servicios, repuestos)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                totales.add(float(total_ticket(cliente, ticket_id)))
+            print(f"{nombre:>10}: promedio {sum(tiempos) / len(tiempos):8.1f} ms | mínimo {min(tiempos):8.1f} ms")
+    print(f"Mismo total por ticket: {len(totales) == 1}")
+    return 0 if len(totales) == 1 else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 8:
+        print("Uso: python benchmark_lineas.py <base_url> <usuario> <password> <id_cliente> <id_vehiculo> "
+              "<id_servicio> <id_repuesto> [lineas] [repeticiones]")
+        sys.exit(1)
+    sys.exit(ejecutar(sys.argv[1], sys.argv[2], sys.argv[3], *[int(a) for a in sys.argv[4:10]]))
@@ -0,0 +1,73 @@
+# benchmark_listado_tickets.py
+# Cuenta las sentencias SQL y el tiempo de serializar una página de tickets en
+# cada vista (summary / full). La cantidad de sentencias no debe depender del
+# tamaño de la página, salvo por los lotes de crud.SELECTIN_LOTE tickets en que
+# selectinload parte la vista full (1 + k sentencias por lote), y ambas vistas
+# deben listar los mismos tickets. Usar contra una base con al menos <limite
+# máximo> tickets.
+# Uso: python benchmark_listado_tickets.py [limite1 limite2 ...]
+import os
+import sys
+import time
+from sqlalchemy import event
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal, engine
+import crud
+import schemas
+
+sentencias = 0
+
+
+def contar(*_):
+    global sentencias
+    sentencias += 1
+
+
+def vista_resumen(db, limite: int):
+    return crud.get_tickets_resumen(db, limit=limite)
+
+
+def vista_completa(db, limite: int):
+    return [schemas.TicketResponse.model_validate(t) for t in crud.get_tickets(db, limit=limite)]
+
+
+def lotes_resumen(filas: int) -> int:
+    return 1
+
+
+def lotes_completa(filas: int) -> int:
+    return max(1, -(-filas // crud.SELECTIN_LOTE))
+
+
+def ejecutar(limites):
+    global sentencias
+    event.listen(engine, "before_cursor_execute", contar)
+    resultado = 0
+    ids = {}
+    for nombre, funcion, lotes in (("summary", vista_resumen, lotes_resumen), ("full", vista_completa, lotes_completa)):
+        conteos = set()
+        for limite in limites:
+            db = SessionLocal()
+            try:
+                sentencias = 0
+                inicio = time.perf_counter()
+                filas = funcion(db, limite)
+                ms = (time.perf_counter() - inicio) * 1000
+                ids.setdefault(limite, []).append([t.id_ticket for t in filas])
+            finally:
+                db.close()
+            # Sentencias por lote: la consulta principal más las de cada lote
+            conteos.add(1 + (sentencias - 1) / lotes(len(filas)))
+            print(f"{nombre:>8} | limit {limite:5d} | filas {len(filas):5d} | sentencias {sentencias:3d} | {ms:8.1f} ms")
+        if len(conteos) > 1:
+            print(f"  {nombre}: la cantidad de sentencias por lote cambia con el tamaño de página")
+            resultado = 1
+    if any(resumen != completa for resumen, completa in ids.values()):
+        print("  summary y full no listan los mismos tickets")
+        resultado = 1
+    return resultado
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar([int(a) for a in sys.argv[1:]] or [10, 100, 1000]))
@@ -0,0 +1,59 @@
+# benchmark_paginacion.py
+# Compara el tiempo de leer una página de tickets con skip (OFFSET) contra el
+# cursor (keyset) en la página 1 y en una página profunda. Usar contra una base
+# con suficientes tickets: página * limite filas como mínimo. Termina con
+# código 1 si skip y cursor no devuelven las mismas filas.
+# Uso: python benchmark_paginacion.py [pagina_profunda] [limite] [repeticiones]
+import os
+import sys
+import time
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal
+from paginacion import codificar_cursor
+import crud
+import models
+
+
+def cursor_de_pagina(db, pagina: int, limite: int):
+    """Cursor que apunta al inicio de la página indicada (1 = primera)"""
+    if pagina <= 1:
+        return None
+    T = models.TicketAtencion
+    fila = db.query(T.fecha_ingreso, T.id_ticket).order_by(
+        T.fecha_ingreso.desc(), T.id_ticket.desc()
+    ).offset((pagina - 1) * limite - 1).limit(1).first()
+    if fila is None:
+        raise SystemExit(f"No hay suficientes tickets para llegar a la página {pagina}")
+    return codificar_cursor(fila.fecha_ingreso, fila.id_ticket)
+
+
+def medir(funcion, repeticiones: int):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return filas, sum(tiempos) / len(tiempos)
+
+
+def ejecutar(pagina_profunda: int = 5000, limite: int = 100, repeticiones: int = 5):
+    resultado = 0
+    db = SessionLocal()
+    try:
+        for pagina in (1, pagina_profunda):
+            cursor = cursor_de_pagina(db, pagina, limite)
+            skip = (pagina - 1) * limite
+            por_skip, ms_skip = medir(lambda: crud.get_tickets_resumen(db, skip=skip, limit=limite), repeticiones)
+            por_cursor, ms_cursor = medir(lambda: crud.get_tickets_resumen(db, limit=limite, cursor=cursor), repeticiones)
+            iguales = [t.id_ticket for t in por_skip] == [t.id_ticket for t in por_cursor]
+            print(f"página {pagina:6d} | skip {ms_skip:8.1f} ms | cursor {ms_cursor:8.1f} ms | mismas filas: {iguales}")
+            if not iguales:
+                resultado = 1
+    finally:
+        db.close()
+    return resultado
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar(*[int(a) for a in sys.argv[1:4]]))
@@ -0,0 +1,62 @@
+# benchmark_planes_fecha.py
+# Muestra el plan (EXPLAIN) de los filtros por rango de fechas de filtros.py
+# y falla si alguno recorre la tabla completa en vez de usar el índice de la
+# columna. Con tablas casi vacías MySQL/PostgreSQL pueden preferir el recorrido
+# completo: usar contra una base con datos representativos.
+# Uso: python benchmark_planes_fecha.py [dias_del_rango]
+import os
+import sys
+from datetime import date, timedelta
+from sqlalchemy import select
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import engine
+from filtros import rango_fechas
+import models
+
+COLUMNAS = [
+    models.Cita.fecha_cita,
+    models.TicketAtencion.fecha_ingreso,
+    models.Factura.fecha_factura,
+    models.MovimientoInventario.fecha_movimiento,
+]
+
+
+def explicar(conn, consulta):
+    """Retorna (lineas del plan, recorre la tabla completa)"""
+    sql = str(consulta.compile(engine, compile_kwargs={"literal_binds": True}))
+    dialecto = engine.dialect.name
+    if dialecto == "sqlite":
+        filas = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()
+        lineas = [fila[-1] for fila in filas]
+        return lineas, any(l.startswith("SCAN") and "INDEX" not in l for l in lineas)
+    if dialecto == "mysql":
+        filas = conn.exec_driver_sql("EXPLAIN " + sql).mappings().all()
+        lineas = [f"{f['table']}: type={f['type']} key={f['key']} rows={f['rows']}" for f in filas]
+        return lineas, any(f["type"] == "ALL" for f in filas)
+    lineas = [fila[0] for fila in conn.exec_driver_sql("EXPLAIN " + sql).all()]
+    return lineas, any("Seq Scan" in l for l in lineas)
+
+
+def ejecutar(dias: int = 7):
+    hasta = date.today()
+    desde = hasta - timedelta(days=dias)
+    completos = []
+    with engine.connect() as conn:
+        for columna in COLUMNAS:
+            clave = columna.table.primary_key.columns.values()[0]
+            consulta = select(clave).where(*rango_fechas(columna, desde, hasta))
+            lineas, completo = explicar(conn, consulta)
+            print(f"{columna.table.name}.{columna.name}: {'RECORRIDO COMPLETO' if completo else 'índice'}")
+            for linea in lineas:
+                print(f"    {linea}")
+            if completo:
+                completos.append(f"{columna.table.name}.{columna.name}")
+    if completos:
+        print(f"Sin índice: {', '.join(completos)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar(*[int(a) for a in sys.argv[1:2]]))
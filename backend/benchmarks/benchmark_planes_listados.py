@@ -0,0 +1,179 @@
+# benchmark_planes_listados.py
+# Ejecuta las consultas reales de los listados (crud) capturando cada sentencia
+# SQL, muestra su plan con EXPLAIN y falla si alguna recorre completa una de
+# las tablas que crecen con la operación. Catálogos y maestros pequeños
+# (estados, puestos, servicios, repuestos...) pueden recorrerse.
+#
+# Con "sembrar" carga datos sintéticos y reconstruye ventas_diarias antes de
+# revisar los planes; requiere los catálogos básicos (id 1 de estado, forma de
+# pago, servicio, repuesto, empleado y tipo de movimiento). Usar SOLO contra
+# una base de pruebas.
+# Uso: python benchmark_planes_listados.py [sembrar <tickets>]
+import os
+import re
+import sys
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import event, insert, select, func
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal, engine
+from paginacion import codificar_cursor
+import resumen_ventas
+import crud
+import models
+import schemas
+
+TABLAS_GRANDES = {
+    "tickets_atencion", "ticket_servicios", "ticket_repuestos", "facturas", "detalle_facturas",
+    "movimientos_inventario", "citas", "clientes", "vehiculos", "reservas_stock",
+}
+LOTE = 10000
+
+
+def sembrar(tickets: int):
+    """Carga clientes, vehículos, tickets con líneas, facturas con detalle y movimientos"""
+    hoy = datetime.now()
+    clientes = max(1, tickets // 20)
+    with engine.begin() as conn:
+        inicio_cliente = conn.execute(select(func.coalesce(func.max(models.Cliente.id_cliente), 0))).scalar()
+        conn.execute(insert(models.Cliente), [
+            {"nombres": f"Cliente {i}", "apellidos": "Prueba", "telefono": str(i)} for i in range(clientes)
+        ])
+        conn.execute(insert(models.Vehiculo), [
+            {"id_cliente": inicio_cliente + i + 1, "marca": "M", "modelo": "X", "placa": f"S{inicio_cliente + i}"}
+            for i in range(clientes)
+        ])
+        inicio_ticket = conn.execute(select(func.coalesce(func.max(models.TicketAtencion.id_ticket), 0))).scalar()
+        for desde in range(0, tickets, LOTE):
+            inicio_factura = conn.execute(select(func.coalesce(func.max(models.Factura.id_factura), 0))).scalar()
+            filas = range(desde, min(desde + LOTE, tickets))
+            fechas = {i: hoy - timedelta(minutes=random.randint(0, 525600)) for i in filas}
+            conn.execute(insert(models.TicketAtencion), [{
+                "numero_ticket": f"SEM{inicio_ticket + i}",
+                "id_cliente": inicio_cliente + i % clientes + 1,
+                "id_vehiculo": inicio_cliente + i % clientes + 1,
+                "descripcion_problema": "Datos sintéticos",
+                "id_empleado_recepcion": 1,
+                "id_estado": random.randint(1, 6),
+                "fecha_ingreso": fechas[i],
+                "total_servicios": Decimal("10.00"),
+                "total_general": Decimal("10.00"),
+            } for i in filas])
+            conn.execute(insert(models.TicketServicio), [{
+                "id_ticket": inicio_ticket + i + 1, "id_servicio": 1, "cantidad": 1,
+                "precio_unitario": Decimal("10.00"), "subtotal": Decimal("10.00"),
+            } for i in filas])
+            conn.execute(insert(models.Factura), [{
+                "numero_factura": f"SEM{inicio_ticket + i}",
+                "id_ticket": inicio_ticket + i + 1,
+                "id_cliente": inicio_cliente + i % clientes + 1,
+                "fecha_factura": fechas[i],
+                "subtotal": Decimal("15.00"), "total": Decimal("15.00"),
+                "id_forma_pago": 1, "id_empleado_factura": 1,
+                "estado_pago": random.choice(list(models.EstadoPago)),
+                "fecha_vencimiento": (fechas[i] + timedelta(days=30)).date(),
+            } for i in filas if i % 2 == 0])
+            facturas = len(range(desde + desde % 2, min(desde + LOTE, tickets), 2))
+            conn.execute(insert(models.DetalleFactura), [{
+                "id_factura": inicio_factura + n // 2 + 1,
+                "tipo_item": models.TipoItem.servicio if n % 2 == 0 else models.TipoItem.repuesto,
+                "id_item": 1, "descripcion": "Detalle sintético", "cantidad": 1,
+                "precio_unitario": Decimal("10.00") if n % 2 == 0 else Decimal("5.00"),
+                "subtotal": Decimal("10.00") if n % 2 == 0 else Decimal("5.00"),
+            } for n in range(facturas * 2)])
+            conn.execute(insert(models.MovimientoInventario), [{
+                "id_repuesto": 1, "id_tipo_movimiento": 1, "cantidad": 1,
+                "stock_anterior": 0, "stock_nuevo": 1, "id_empleado": 1, "fecha_movimiento": fechas[i],
+            } for i in filas])
+            print(f"  {min(desde + LOTE, tickets)} / {tickets} tickets")
+        # Los INSERT masivos no pasan por crud.create_factura
+        resumen_ventas.reconstruir(conn)
+
+
+def consultas(db):
+    """Llamadas de listado a revisar; cada una ejecuta una o más sentencias"""
+    hoy = date.today()
+    cursor = codificar_cursor(datetime.now(), 2 ** 31)
+    return {
+        "tickets": lambda: crud.get_tickets(db, limit=100),
+        "tickets por estado": lambda: crud.get_tickets(db, limit=100, estado_id=1),
+        "tickets por cliente": lambda: crud.get_tickets_resumen(db, limit=100, cliente_id=1),
+        "tickets con cursor": lambda: crud.get_tickets_resumen(db, limit=100, cursor=cursor),
+        "facturas por fecha": lambda: crud.get_facturas(db, limit=100, fecha_inicio=hoy - timedelta(days=30), fecha_fin=hoy),
+        "facturas con cursor": lambda: crud.get_facturas(db, limit=100, cursor=cursor),
+        "facturas pendientes": lambda: db.query(models.Factura).filter(
+            models.Factura.estado_pago == schemas.EstadoPagoEnum.pendiente,
+            models.Factura.fecha_vencimiento <= hoy
+        ).order_by(models.Factura.fecha_vencimiento.asc()).limit(100).all(),
+        "movimientos de un repuesto": lambda: crud.get_movimientos_inventario(db, repuesto_id=1, limit=100),
+        "movimientos por fecha": lambda: crud.get_movimientos_inventario(db, fecha_inicio=hoy - timedelta(days=7), fecha_fin=hoy),
+        "repuestos": lambda: crud.get_repuestos(db, limit=100),
+        "clientes": lambda: crud.get_clientes(db, limit=100),
+        "vehículos de un cliente": lambda: crud.get_vehiculos_by_cliente(db, 1),
+        "citas por fecha": lambda: crud.get_citas(db, fecha_inicio=hoy, fecha_fin=hoy + timedelta(days=7)),
+    }
+
+
+def tabla_grande(nombre: str) -> bool:
+    # Los joinedload usan alias como clientes_1
+    return re.sub(r"_\d+$", "", nombre or "") in TABLAS_GRANDES
+
+
+def explicar_sentencia(statement: str, parameters):
+    prefijo = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        resultado = conn.exec_driver_sql(prefijo + statement, parameters)
+        if engine.dialect.name == "mysql":
+            filas = resultado.mappings().all()
+            lineas = [f"{f['table']}: type={f['type']} key={f['key']} rows={f['rows']}" for f in filas]
+            return lineas, any(f["type"] == "ALL" and tabla_grande(f["table"]) for f in filas)
+        if engine.dialect.name == "sqlite":
+            lineas = [fila[-1] for fila in resultado]
+            completo = [l.split()[1] for l in lineas if l.startswith("SCAN ") and "INDEX" not in l]
+        else:
+            lineas = [fila[0] for fila in resultado]
+            completo = [m.group(1) for m in (re.search(r"Seq Scan on (\w+)", l) for l in lineas) if m]
+        return lineas, any(tabla_grande(t) for t in completo)
+
+
+def ejecutar():
+    capturadas = []
+    capturar = [False]
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        if capturar[0]:
+            capturadas.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", registrar)
+    db = SessionLocal()
+    fallas = []
+    try:
+        for nombre, funcion in consultas(db).items():
+            capturadas.clear()
+            capturar[0] = True
+            funcion()
+            capturar[0] = False
+            print(f"{nombre}:")
+            for statement, parameters in capturadas:
+                lineas, completo = explicar_sentencia(statement, parameters)
+                for linea in lineas:
+                    print(f"    {linea}")
+                if completo:
+                    fallas.append(nombre)
+            db.expunge_all()
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+        db.close()
+    if fallas:
+        print(f"Con recorrido completo: {', '.join(sorted(set(fallas)))}")
+        return 1
+    print("Ningún listado recorre tablas completas")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "sembrar":
+        sembrar(int(sys.argv[2]))
+    sys.exit(ejecutar())
@@ -0,0 +1,74 @@
+# benchmark_reporte_ventas.py
+# Mide crud.get_reporte_ventas para rangos de distinto tamaño: lee ventas_diarias,
+# así el tiempo depende de los días del rango y no de la cantidad de facturas.
+# Verifica que los periodos por día y por semana sumen los totales del reporte.
+# Con "comparar" calcula también el reporte recorriendo factura.detalles (el
+# método anterior) y verifica que los totales coincidan.
+# Uso: python benchmark_reporte_ventas.py [comparar]
+import os
+import sys
+import time
+from datetime import date, timedelta
+from sqlalchemy import event
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal, engine
+from filtros import rango_fechas
+import crud
+import models
+import schemas
+
+RANGOS_DIAS = [7, 30, 90, 365]
+
+
+def recorriendo_detalles(db, fecha_inicio: date, fecha_fin: date):
+    facturas = db.query(models.Factura).filter(
+        *rango_fechas(models.Factura.fecha_factura, fecha_inicio, fecha_fin)
+    ).all()
+    servicios = sum(d.subtotal for f in facturas for d in f.detalles if d.tipo_item == 'servicio')
+    repuestos = sum(d.subtotal for f in facturas for d in f.detalles if d.tipo_item != 'servicio')
+    return len(facturas), sum(f.total for f in facturas), servicios, repuestos
+
+
+def periodos_cuadran(reporte) -> bool:
+    """Los periodos del desglose suman lo mismo que los totales del reporte"""
+    campos = ("total_facturas", "total_ventas", "total_servicios", "total_repuestos", "facturas_pendientes", "facturas_pagadas")
+    return all(sum(getattr(p, campo) for p in reporte.periodos) == getattr(reporte, campo) for campo in campos)
+
+
+def ejecutar(comparar: bool = False):
+    sentencias = [0]
+    event.listen(engine, "before_cursor_execute", lambda *_: sentencias.__setitem__(0, sentencias[0] + 1))
+    hoy = date.today()
+    resultado = 0
+    db = SessionLocal()
+    try:
+        for dias in RANGOS_DIAS:
+            desde = hoy - timedelta(days=dias - 1)
+            for granularidad in (None, schemas.GranularidadEnum.dia, schemas.GranularidadEnum.semana):
+                sentencias[0] = 0
+                inicio = time.perf_counter()
+                reporte = crud.get_reporte_ventas(db, desde, hoy, granularidad)
+                ms = (time.perf_counter() - inicio) * 1000
+                print(f"{dias:4d} días | {granularidad.value if granularidad else 'total':>6} | "
+                      f"{reporte.total_facturas:8d} facturas | {sentencias[0]} sentencias | {ms:8.1f} ms")
+                if granularidad and not periodos_cuadran(reporte):
+                    print(f"{dias:4d} días | {granularidad.value:>6} | los periodos no suman los totales")
+                    resultado = 1
+            if comparar:
+                inicio = time.perf_counter()
+                anterior = recorriendo_detalles(db, desde, hoy)
+                ms = (time.perf_counter() - inicio) * 1000
+                actual = (reporte.total_facturas, reporte.total_ventas, reporte.total_servicios, reporte.total_repuestos)
+                iguales = anterior[0] == actual[0] and all(abs(a - b) < 0.01 for a, b in zip(anterior[1:], actual[1:]))
+                print(f"{dias:4d} días | anterior | {sentencias[0]} sentencias | {ms:8.1f} ms | mismos totales: {iguales}")
+                db.expunge_all()
+                if not iguales:
+                    resultado = 1
+    finally:
+        db.close()
+    return resultado
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar(comparar="comparar" in sys.argv[1:]))
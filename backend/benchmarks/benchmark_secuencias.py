@@ -0,0 +1,58 @@
+# benchmark_secuencias.py
+# Crea tickets en paralelo con crud.create_ticket y verifica que ningún
+# numero_ticket se repita. Usar contra una base de datos de pruebas.
+# Uso: python benchmark_secuencias.py [tickets] [hilos] [id_cliente] [id_vehiculo] [id_empleado]
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal
+from secuencias import secuencia_tickets
+import crud
+import schemas
+
+
+def crear_ticket(id_cliente: int, id_vehiculo: int, id_empleado: int):
+    """Retorna (numero_ticket, None) o (None, error)"""
+    db = SessionLocal()
+    try:
+        ticket = crud.create_ticket(db, schemas.TicketCreate(
+            descripcion_problema="Prueba de concurrencia de secuencias",
+            id_cliente=id_cliente,
+            id_vehiculo=id_vehiculo
+        ), id_empleado)
+        return ticket.numero_ticket, None
+    except Exception as e:
+        db.rollback()
+        return None, f"{e.__class__.__name__}: {e}"
+    finally:
+        db.close()
+
+
+def ejecutar(tickets: int = 1000, hilos: int = 32, id_cliente: int = 1, id_vehiculo: int = 1, id_empleado: int = 1):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        resultados = list(executor.map(
+            lambda _: crear_ticket(id_cliente, id_vehiculo, id_empleado), range(tickets)
+        ))
+    segundos = time.perf_counter() - inicio
+
+    numeros = [numero for numero, _ in resultados if numero]
+    errores = [error for _, error in resultados if error]
+    repetidos = {numero: n for numero, n in Counter(numeros).items() if n > 1}
+
+    print(f"Tickets: {tickets} | hilos: {hilos} | bloque: {secuencia_tickets.tamano_bloque}")
+    print(f"Creados: {len(numeros)} en {segundos:.2f} s ({len(numeros) / segundos:.1f} tickets/s)")
+    print(f"Reservas de bloque: {secuencia_tickets.reservas}")
+    print(f"Números repetidos: {len(repetidos)} | errores: {len(errores)}")
+    for error in errores[:5]:
+        print(f"  {error}")
+    return 0 if not repetidos and not errores else 1
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:6]]
+    sys.exit(ejecutar(*argumentos))
@@ -0,0 +1,78 @@
+# benchmark_stock.py
+# Prueba de estrés de descuentos de stock concurrentes: varios hilos intentan
+# vender el mismo repuesto más veces de las que alcanza el stock y se verifica
+# que nunca quede negativo ni se venda de más, ni se rechace una venta mientras
+# quedaba stock. Usar contra una base de pruebas.
+# Uso: python benchmark_stock.py <id_repuesto> [stock_inicial] [hilos] [intentos_por_hilo] [id_empleado]
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import OperationalError
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal
+import crud
+import models
+
+
+def vender(id_repuesto: int, intentos: int, id_empleado: int):
+    """Retorna (ventas aplicadas, rechazos por stock, errores de base de datos)"""
+    ventas = rechazos = errores = 0
+    db = SessionLocal()
+    try:
+        for _ in range(intentos):
+            try:
+                crud.ajustar_stock_repuesto(db, id_repuesto, -1, 2, id_empleado, "benchmark_stock")
+                ventas += 1
+            except crud.StockInsuficienteError:
+                db.rollback()
+                rechazos += 1
+            except OperationalError:
+                db.rollback()
+                errores += 1
+    finally:
+        db.close()
+    return ventas, rechazos, errores
+
+
+def ejecutar(id_repuesto: int, stock_inicial: int = 100, hilos: int = 32, intentos: int = 10, id_empleado: int = 1):
+    db = SessionLocal()
+    try:
+        actual = db.query(models.Repuesto.stock_actual, models.Repuesto.version).filter(
+            models.Repuesto.id_repuesto == id_repuesto
+        ).one()
+        crud.establecer_stock(db, id_repuesto, stock_inicial, actual.version)
+        db.commit()
+    finally:
+        db.close()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        resultados = list(executor.map(lambda _: vender(id_repuesto, intentos, id_empleado), range(hilos)))
+    segundos = time.perf_counter() - inicio
+
+    ventas = sum(r[0] for r in resultados)
+    rechazos = sum(r[1] for r in resultados)
+    errores = sum(r[2] for r in resultados)
+
+    db = SessionLocal()
+    try:
+        stock_final = db.query(models.Repuesto.stock_actual).filter(models.Repuesto.id_repuesto == id_repuesto).scalar()
+    finally:
+        db.close()
+
+    # Cada intento sin error de BD debe vender mientras quede stock
+    esperadas = min(stock_inicial, hilos * intentos - errores)
+    correcto = stock_final >= 0 and stock_final == stock_inicial - ventas and ventas == esperadas
+    print(f"Intentos: {hilos * intentos} ({hilos} hilos) | stock inicial: {stock_inicial}")
+    print(f"Ventas: {ventas} | rechazos por stock: {rechazos} | errores de BD: {errores}")
+    print(f"Stock final: {stock_final} | {'OK' if correcto else 'INCONSISTENTE'} | {hilos * intentos / segundos:.1f} operaciones/s")
+    return 0 if correcto else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python benchmark_stock.py <id_repuesto> [stock_inicial] [hilos] [intentos_por_hilo] [id_empleado]")
+        sys.exit(1)
+    sys.exit(ejecutar(*[int(a) for a in sys.argv[1:6]]))
@@ -0,0 +1,61 @@
+# benchmark_ventas_mensuales.py
+# Compara el reporte de ventas mensuales calculado cargando las facturas de
+# cada mes (método anterior: 12 consultas y un objeto ORM por factura) contra
+# crud.get_ventas_mensuales (una consulta GROUP BY sobre ventas_diarias). Para
+# datos de prueba ver "sembrar" en benchmark_planes_listados.py (genera una
+# factura cada 2 tickets y reconstruye ventas_diarias).
+# Uso: python benchmark_ventas_mensuales.py [año] [repeticiones]
+import os
+import sys
+import time
+from datetime import date, timedelta
+# Los módulos de la aplicación están en backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+from database import SessionLocal
+from filtros import rango_fechas
+import crud
+import models
+
+
+def por_mes_en_python(db, año: int):
+    resultado = []
+    for mes in range(1, 13):
+        inicio = date(año, mes, 1)
+        fin = date(año + 1, 1, 1) if mes == 12 else date(año, mes + 1, 1)
+        facturas = db.query(models.Factura).filter(
+            *rango_fechas(models.Factura.fecha_factura, inicio, fin - timedelta(days=1))
+        ).all()
+        resultado.append((mes, len(facturas), sum(f.total for f in facturas)))
+        db.expunge_all()
+    return resultado
+
+
+def agrupado(db, año: int):
+    filas = crud.get_ventas_mensuales(db, date(año, 1, 1), date(año, 12, 31))
+    por_mes = {m: (c, t) for _, m, _, c, t in filas}
+    return [(m, *por_mes.get(m, (0, 0))) for m in range(1, 13)]
+
+
+def ejecutar(año: int = None, repeticiones: int = 3):
+    año = año or date.today().year
+    db = SessionLocal()
+    try:
+        resultados = {}
+        for nombre, funcion in (("por mes en Python", por_mes_en_python), ("GROUP BY", agrupado)):
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                resultados[nombre] = funcion(db, año)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            facturas = sum(c for _, c, _ in resultados[nombre])
+            print(f"{nombre:>18}: {facturas} facturas | promedio {sum(tiempos) / len(tiempos):9.1f} ms | mínimo {min(tiempos):9.1f} ms")
+        a, b = resultados.values()
+        iguales = all(x[0] == y[0] and x[1] == y[1] and abs(x[2] - y[2]) < 0.01 for x, y in zip(a, b))
+        print(f"Mismos totales: {iguales}")
+        return 0 if iguales else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar(*[int(a) for a in sys.argv[1:3]]))
@@ -46,10 +46,13 @@ export const AuthProvider = ({ children }) => {
         password
       });
 
-      const { access_token, user_info } = response.data;
+      const { access_token, refresh_token, user_info } = response.data;
       
-      // Guardar token en localStorage
+      // Guardar tokens en localStorage
       localStorage.setItem('token', access_token);
+      if (refresh_token) {
+        localStorage.setItem('refresh_token', refresh_token);
+      }
       
       // Configurar cabecera de autorización
       api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
@@ -65,8 +68,15 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
-    // Remover token
+    // Revocar la sesión en el servidor (sin esperar respuesta)
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (localStorage.getItem('token')) {
+      api.post('/auth/logout', refreshToken ? { refresh_token: refreshToken } : undefined).catch(() => {});
+    }
+
+    // Remover tokens
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     delete api.defaults.headers.common['Authorization'];
     
     // Limpiar usuario
@@ -36,18 +36,45 @@ api.interceptors.request.use(
   }
 );
 
+// Rutas de sesión donde un 401 no se reintenta con el refresh token
+const RUTAS_SIN_RENOVACION = ['/auth/login', '/auth/refresh', '/auth/logout'];
+
 // Interceptor para responses
 api.interceptors.response.use(
   (response) => {
     console.log(`✅ ${response.config.method?.toUpperCase()} ${response.config.url} - ${response.status}`);
     return response;
   },
-  (error) => {
+  async (error) => {
     console.error('❌ Error en response:', error.response?.data || error.message);
     
+    // Token vencido: intentar renovarlo una vez con el refresh token
+    const originalRequest = error.config;
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (
+      error.response?.status === 401 &&
+      refreshToken &&
+      originalRequest &&
+      !originalRequest._retry &&
+      !RUTAS_SIN_RENOVACION.some((ruta) => originalRequest.url?.includes(ruta))
+    ) {
+      originalRequest._retry = true;
+      try {
+        const { data } = await refreshAccessToken(refreshToken);
+        localStorage.setItem('token', data.access_token);
+        localStorage.setItem('refresh_token', data.refresh_token);
+        api.defaults.headers.common['Authorization'] = `Bearer ${data.access_token}`;
+        originalRequest.headers.Authorization = `Bearer ${data.access_token}`;
+        return api(originalRequest);
+      } catch (refreshError) {
+        console.error('❌ No se pudo renovar la sesión:', refreshError.response?.data || refreshError.message);
+      }
+    }
+    
     // Manejar errores de autenticación
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       delete api.defaults.headers.common['Authorization'];
       window.location.href = '/login';
     }
@@ -56,10 +83,25 @@ api.interceptors.response.use(
   }
 );
 
+// Las renovaciones simultáneas comparten una sola petición, porque cada
+// refresh token solo se puede canjear una vez
+let refreshPromise = null;
+function refreshAccessToken(refreshToken) {
+  if (!refreshPromise) {
+    refreshPromise = axios
+      .post(`${api.defaults.baseURL}/auth/refresh`, { refresh_token: refreshToken })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+}
+
 // Servicios de Autenticación
 export const authService = {
   login: (credentials) => api.post('/auth/login', credentials),
-  logout: () => api.post('/auth/logout'),
+  logout: (refreshToken) => api.post('/auth/logout', refreshToken ? { refresh_token: refreshToken } : undefined),
+  refresh: (refreshToken) => api.post('/auth/refresh', { refresh_token: refreshToken }),
   getMe: () => api.get('/auth/me'),
   changePassword: (data) => api.put('/auth/change-password', null, { params: data }),
   getUsers: () => api.get('/auth/users'),